@@ -0,0 +1,129 @@
+"""
+Batch jobs versus one blocking call per document, against a flaky provider.
+
+    python -m benchmarks.bench_batch --documents 40 --error-rate 0.2
+
+The stub LLM fails `--error-rate` of its requests with 429/503. For the same
+number of documents this times:
+  - sequential: /summarize then /generate-mcqs per document, one after another
+  - batch:      one POST /jobs, progress followed on /jobs/{id}/events
+  - restart:    another job, with the server restarted half way through; the
+                job must still finish with exactly one session per document
+Retries are counted from the stub's injected errors.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import free_port, start_stub, start_app, stop
+from benchmarks.bench_weights import synthetic_document
+
+
+def documents(rng, count):
+    return [synthetic_document(rng, words=400) for _ in range(count)]
+
+
+def sequential(client, base, texts):
+    started = time.perf_counter()
+    for text in texts:
+        client.post(f"{base}/summarize", json={"text": text}).raise_for_status()
+        client.post(f"{base}/generate-mcqs", json={"text": text}).raise_for_status()
+    return time.perf_counter() - started
+
+
+def submit(client, base, texts):
+    response = client.post(f"{base}/jobs", json={"items": [{"name": f"Doc {i + 1}", "text": t} for i, t in enumerate(texts)]})
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def follow(client, base, job_id, stop_after=None):
+    """Reads the job's event stream until `done` (or until `stop_after` items finished)."""
+    finished = 0
+    event = None
+    with client.stream("GET", f"{base}/jobs/{job_id}/events", params={"interval": 0.2}) as response:
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = json.loads(line[6:])
+                if event == "item" and data["status"] in ("done", "failed"):
+                    finished += 1
+                    if stop_after is not None and finished >= stop_after:
+                        return None
+                if event == "done":
+                    return data
+
+
+def count_sessions(client, base):
+    count, cursor = 0, None
+    while True:
+        page = client.get(f"{base}/history", params={"limit": 100, **({"cursor": cursor} if cursor else {})}).json()
+        count += len(page["items"])
+        cursor = page["nextCursor"]
+        if not cursor:
+            return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds per completion")
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=0, help="LLM_RATE_LIMIT_RPM for the server (0 = off)")
+    args = parser.parse_args()
+
+    rng = random.Random(14)
+    stub_port, app_port = free_port(), free_port()
+    env = {
+        "BATCH_WORKERS": str(args.workers), "BATCH_RETRY_BACKOFF": "1", "BATCH_LEASE_SECONDS": "5",
+        "BATCH_POLL_INTERVAL": "0.5", "AI_RETRY_BACKOFF": "0.2", "LLM_RATE_LIMIT_RPM": str(args.rpm),
+    }
+    results = {"documents": args.documents, "latency_s": args.latency, "error_rate": args.error_rate, "workers": args.workers}
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = start_stub(stub_port, latency=args.latency, extra_args=[
+            "--chunk-delay", "0", "--error-rate", str(args.error_rate), "--retry-after", "0.5"
+        ])
+        env["LLM_BASE_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+        app = start_app(app_port, workdir, env=env)
+        base = f"http://127.0.0.1:{app_port}"
+        try:
+            with httpx.Client(timeout=300) as client:
+                def stub_stats():
+                    return client.get(f"http://127.0.0.1:{stub_port}/stub/stats").json()
+
+                before = stub_stats()
+                results["sequential_s"] = round(sequential(client, base, documents(rng, args.documents)), 1)
+                after = stub_stats()
+                results["sequential_llm_requests"] = after.get("requests", 0) - before.get("requests", 0)
+
+                started = time.perf_counter()
+                job = follow(client, base, submit(client, base, documents(rng, args.documents)))
+                results["batch_s"] = round(time.perf_counter() - started, 1)
+                results["batch_counts"] = job["counts"]
+                before, after = after, stub_stats()
+                results["batch_llm_requests"] = after.get("requests", 0) - before.get("requests", 0)
+                results["batch_injected_errors"] = sum(v - before.get(k, 0) for k, v in after.items() if k.startswith("errors_"))
+
+                sessions_before = count_sessions(client, base)
+                started = time.perf_counter()
+                job_id = submit(client, base, documents(rng, args.documents))
+                follow(client, base, job_id, stop_after=args.documents // 2)
+                stop(app)
+                app = start_app(app_port, workdir, env=env)
+                job = follow(client, base, job_id)
+                results["restart_s"] = round(time.perf_counter() - started, 1)
+                results["restart_counts"] = job["counts"]
+                results["restart_new_sessions"] = count_sessions(client, base) - sessions_before
+        finally:
+            stop(app, stub)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Chunk stability under edits: how many per-chunk summary cache keys change
+when one chapter of a long document is edited.
+
+    python -m benchmarks.bench_chunking --sections 200 --seeds 5
+
+For each seed, builds notes with `--sections` headed sections (some spanning
+several pages), chunks them with the default budget, then appends
+`--added-sentences` sentences to one section in the middle and chunks again.
+Reported per seed: chunks before/after, cache keys that changed, and how
+many of those belong to sections other than the edited one. Exits with an
+error if any other section's chunk changed (a regression check for CI).
+"""
+import argparse
+import json
+import random
+import sys
+
+from benchmarks.bench_weights import VOCABULARY
+from benchmarks.bench_condense import sentence
+
+PAGE_BREAK = "\f"
+
+
+def sections(rng, count):
+    result = []
+    for number in range(count):
+        lines = [f"Chapter {number + 1} {rng.choice(VOCABULARY).title()} {rng.choice(VOCABULARY).title()}"]
+        for _ in range(rng.randint(1, 3)):
+            paragraph = " ".join(sentence(rng) for _ in range(rng.randint(4, 40)))
+            lines += [paragraph[i:i + 90].strip() for i in range(0, len(paragraph), 90)]
+            if rng.random() < 0.3:
+                lines.append(PAGE_BREAK)
+        result.append(lines)
+    return result
+
+
+def chunk_keys(text, chunk_text, summary_cache_key):
+    """(chunk, its summary cache key) pairs, as summarize_document_async would look them up."""
+    return [(chunk, summary_cache_key(chunk, 50, True, False, "English")) for chunk in chunk_text(text)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=200)
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument("--added-sentences", type=int, default=8)
+    args = parser.parse_args()
+
+    from server.utils.chunker import chunk_text
+    from server.utils.ai_engine import _summary_cache_key
+
+    runs, unrelated_total = [], 0
+    for seed in range(args.seeds):
+        rng = random.Random(seed)
+        original = sections(rng, args.sections)
+        edited_index = args.sections // 2
+        edited = [list(lines) for lines in original]
+        edited[edited_index].insert(2, " ".join(sentence(rng) for _ in range(args.added_sentences)))
+
+        before = chunk_keys("\n".join(line for lines in original for line in lines), chunk_text, _summary_cache_key)
+        after = chunk_keys("\n".join(line for lines in edited for line in lines), chunk_text, _summary_cache_key)
+        # Only chunks taken from the edited section may appear or disappear
+        edited_texts = ["\n".join(lines) for lines in (original[edited_index], edited[edited_index])]
+        before_keys, after_keys = {key for _, key in before}, {key for _, key in after}
+        changed = [chunk for chunk, key in after if key not in before_keys]
+        dropped = [chunk for chunk, key in before if key not in after_keys]
+        unrelated = [chunk for chunk in changed + dropped if not any(chunk in text for text in edited_texts)]
+        unrelated_total += len(unrelated)
+        runs.append({"seed": seed, "chunks_before": len(before), "chunks_after": len(after),
+                     "changed": len(changed), "changed_outside_edit": len(unrelated)})
+
+    print(json.dumps({"sections": args.sections, "runs": runs}, indent=2))
+    if unrelated_total:
+        sys.exit(f"{unrelated_total} chunks outside the edited section changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Prompt tokens and latency with and without extractive note pre-compression.
+
+    python -m benchmarks.bench_condense --documents 20 --pages 30
+
+Builds PDF-like notes (`--pages` pages with a running header, a page footer,
+headings, and paragraphs of which a `--repeat-rate` share repeat earlier ones
+almost verbatim) and sends each to /summarize twice against the local stub,
+with "compress" off and on. The stub charges `--prefill-latency` seconds per
+1000 prompt tokens. Reported per mode: prompt tokens seen by the stub, LLM
+requests, latency, and the server's promptTokens report. Key-term recall is
+the share of each document's 30 most frequent content words (by count in
+the original) still present after compression, a cheap offline quality
+proxy; headings kept is checked exactly.
+"""
+import argparse
+import json
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import free_port, start_stub, start_app, stop, percentiles
+from benchmarks.bench_weights import VOCABULARY
+
+PAGE_BREAK = "\f"
+
+
+def sentence(rng):
+    words = rng.choices(VOCABULARY, k=rng.randint(8, 22))
+    return " ".join(words).capitalize() + "."
+
+
+def document(rng, pages, repeat_rate):
+    paragraphs, lines = [], []
+    for page in range(pages):
+        lines.append("Introductory Biology - Lecture Notes 2024")
+        if page % 4 == 0:
+            lines.append(f"Chapter {page // 4 + 1} {rng.choice(VOCABULARY).title()} {rng.choice(VOCABULARY).title()}")
+        for _ in range(4):
+            if paragraphs and rng.random() < repeat_rate:
+                # Repeated slide text / copied paragraphs, with a word changed
+                words = rng.choice(paragraphs).split()
+                words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+                paragraph = " ".join(words)
+            else:
+                paragraph = " ".join(sentence(rng) for _ in range(rng.randint(3, 6)))
+                paragraphs.append(paragraph)
+            # Wrapped like extracted PDF text
+            lines += [paragraph[i:i + 90].strip() for i in range(0, len(paragraph), 90)]
+        lines += [f"Page {page + 1} of {pages}", PAGE_BREAK]
+    return "\n".join(lines[:-1])
+
+
+def key_terms(text, top=30):
+    words = [w for w in re.findall(r"[a-z]{4,}", text.lower()) if w not in ("page", "chapter")]
+    return [word for word, _ in Counter(words).most_common(top)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--repeat-rate", type=float, default=0.15)
+    parser.add_argument("--budget", type=int, default=None, help="tokenBudget sent with compressed requests")
+    parser.add_argument("--latency", type=float, default=0.3, help="stub seconds per completion")
+    parser.add_argument("--prefill-latency", type=float, default=0.1, help="stub seconds per 1000 prompt tokens")
+    args = parser.parse_args()
+
+    from server.utils.condenser import condense_text, PROMPT_TOKEN_BUDGET
+
+    rng = random.Random(20)
+    documents = [document(rng, args.pages, args.repeat_rate) for _ in range(args.documents)]
+    budget = args.budget or PROMPT_TOKEN_BUDGET
+
+    recall, headings_kept, condense_s = [], [], []
+    for text in documents:
+        started = time.perf_counter()
+        condensed, _ = condense_text(text, budget)
+        condense_s.append(time.perf_counter() - started)
+        terms = key_terms(text)
+        recall.append(sum(term in condensed for term in terms) / len(terms))
+        headings = [line for line in text.split("\n") if line.startswith("Chapter ")]
+        headings_kept.append(all(heading in condensed for heading in headings))
+
+    stub_port, app_port = free_port(), free_port()
+    results = {"documents": args.documents, "pages": args.pages, "budget_tokens": budget}
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = start_stub(stub_port, latency=args.latency,
+                          extra_args=["--chunk-delay", "0", "--prefill-latency", str(args.prefill_latency)])
+        # Near-duplicate reuse is off so both modes call the model for every document
+        app = start_app(app_port, workdir, env={"LLM_BASE_URL": f"http://127.0.0.1:{stub_port}/v1", "NEAR_DUPLICATES": "off"})
+        base = f"http://127.0.0.1:{app_port}"
+        try:
+            with httpx.Client(timeout=300) as client:
+                for name, compress in (("full", False), ("compressed", True)):
+                    before = client.get(f"http://127.0.0.1:{stub_port}/stub/stats").json()
+                    samples, reports = [], []
+                    for text in documents:
+                        payload = {"text": text, "compress": compress, "bypassCache": True}
+                        if compress and args.budget:
+                            payload["tokenBudget"] = args.budget
+                        started = time.perf_counter()
+                        response = client.post(f"{base}/summarize", json=payload)
+                        response.raise_for_status()
+                        samples.append(time.perf_counter() - started)
+                        reports.append(response.json()["promptTokens"])
+                    after = client.get(f"http://127.0.0.1:{stub_port}/stub/stats").json()
+                    results[name] = {
+                        "llm_requests": after.get("requests", 0) - before.get("requests", 0),
+                        "prompt_tokens": after.get("prompt_tokens", 0) - before.get("prompt_tokens", 0),
+                        "note_tokens_original": sum(report["originalTokens"] for report in reports),
+                        "note_tokens_sent": sum(report["tokens"] for report in reports),
+                        "per_document": percentiles(samples),
+                    }
+        finally:
+            stop(app, stub)
+
+    results["prompt_token_ratio"] = round(results["compressed"]["prompt_tokens"] / results["full"]["prompt_tokens"], 3)
+    results["condense"] = percentiles(condense_s)
+    results["key_term_recall"] = round(sum(recall) / len(recall), 3)
+    results["all_headings_kept"] = all(headings_kept)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Concept graph: merged dependencies served from the in-memory graph versus
+recomputing them from the stored summaries on every request.
+
+    python -m benchmarks.bench_graph --concepts 50000 --sessions 20000
+
+Seeds sessions whose summaries carry `--pairs` dependencies each, drawn from
+a curriculum of `--concepts` concepts (names written with varying case,
+articles and punctuation, and a `--reverse-rate` share of pairs pointing
+backwards so some close cycles). Then times:
+  - rebuild:   merging every stored summary into the graph tables (backfill)
+  - load:      a worker reading the tables and building the graph
+  - increment: saving a session and the next read that applies its edges
+  - layout / layout_cold: the full layout, cached and after a change
+  - path / subgraph: a concept's learning path and its prerequisite layout
+  - recompute: one learning path rebuilt from all summaries per request
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from collections import deque
+
+from benchmarks.common import percentiles
+
+
+def concept_name(rng, index):
+    name = f"Concept {index} of module {index % 97}"
+    variant = rng.random()
+    if variant < 0.2:
+        return name.lower()
+    if variant < 0.3:
+        return "The " + name
+    if variant < 0.4:
+        return name.replace(" ", "-")
+    return name
+
+
+def summary(rng, args):
+    dependencies = []
+    for _ in range(args.pairs):
+        after = rng.randrange(1, args.concepts)
+        before = max(0, after - rng.randint(1, args.span))
+        if rng.random() < args.reverse_rate:
+            before, after = after, before
+        dependencies.append([concept_name(rng, before), concept_name(rng, after)])
+    return {"topic": "Seeded", "dependencies": dependencies}
+
+
+def seed(args, rng):
+    from server.utils.database import engine, init_db, insert_sessions
+
+    init_db()
+
+    with engine.begin() as conn:
+        for start in range(0, args.sessions, 2000):
+            insert_sessions(conn, [
+                {"topic": "Seeded", "raw_content": f"Seeded notes {i}", "summary": summary(rng, args), "concept_titles": "[]"}
+                for i in range(start, min(args.sessions, start + 2000))
+            ])
+
+
+def recompute_path(concept):
+    """Learning path from scratch: read every summary, merge, topologically sort the prerequisites."""
+    from server.utils.concept_graph import concept_key
+    from server.utils.database import SessionLocal, StudySession, _dependency_pairs
+    from server.utils.compression import unpack_json
+
+    db = SessionLocal()
+    try:
+        predecessors = {}
+        for row in db.query(StudySession.summary_data).yield_per(1000):
+            for (before, _), (after, _) in _dependency_pairs(unpack_json(row.summary_data)):
+                predecessors.setdefault(after, set()).add(before)
+    finally:
+        db.close()
+    ancestors, queue = set(), deque([concept_key(concept)])
+    while queue:
+        for before in predecessors.get(queue.popleft(), ()):
+            if before not in ancestors:
+                ancestors.add(before)
+                queue.append(before)
+    indegree, successors = {node: 0 for node in ancestors}, {}
+    for node in ancestors:
+        for before in predecessors.get(node, ()):
+            if before in ancestors:
+                indegree[node] += 1
+                successors.setdefault(before, []).append(node)
+    order = [node for node, count in indegree.items() if count == 0]
+    for node in order:
+        for after in successors.get(node, ()):
+            indegree[after] -= 1
+            if not indegree[after]:
+                order.append(after)
+    return order
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concepts", type=int, default=50000)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--pairs", type=int, default=6, help="dependencies per summary")
+    parser.add_argument("--span", type=int, default=200, help="how far back a prerequisite may be in the curriculum")
+    parser.add_argument("--reverse-rate", type=float, default=0.01)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(19)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from server.utils import concept_graph
+        from server.utils.database import rebuild_concept_graph, save_study_session
+
+        started = time.perf_counter()
+        seed(args, rng)
+        seed_s = time.perf_counter() - started
+        rebuild_s = timed(rebuild_concept_graph)
+        load_s = timed(concept_graph.graph_overview)
+        overview = concept_graph.graph_overview()
+
+        increment = []
+        for _ in range(20):
+            started = time.perf_counter()
+            save_study_session("Seeded", "Incremental notes", summary(rng, args))
+            concept_graph.graph_overview()
+            increment.append(time.perf_counter() - started)
+
+        layout_cold = []
+        for _ in range(5):
+            save_study_session("Seeded", "Incremental notes", summary(rng, args))
+            layout_cold.append(timed(concept_graph.graph_layout))
+        layout = [timed(concept_graph.graph_layout) for _ in range(args.queries)]
+        layout_bytes = len(concept_graph.graph_layout())
+
+        full = json.loads(concept_graph.graph_layout())
+        targets = rng.choices([title for title, layer in zip(full["titles"], full["layer"]) if layer], k=args.queries)
+        path = [timed(concept_graph.learning_path, target) for target in targets]
+        subgraph = [timed(concept_graph.graph_layout, target) for target in targets]
+        lengths = [concept_graph.learning_path(target)["prerequisites"] for target in targets]
+        recompute = [timed(recompute_path, target) for target in targets[:5]]
+
+    print(json.dumps({
+        "concepts": args.concepts,
+        "sessions": args.sessions,
+        "graph": overview,
+        "seed_s": round(seed_s, 1),
+        "rebuild_s": round(rebuild_s, 2),
+        "load_s": round(load_s, 2),
+        "increment": percentiles(increment),
+        "layout_bytes": layout_bytes,
+        "layout_cold": percentiles(layout_cold),
+        "layout": percentiles(layout),
+        "median_prerequisites": sorted(lengths)[len(lengths) // 2],
+        "path": percentiles(path),
+        "subgraph": percentiles(subgraph),
+        "recompute": percentiles(recompute),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+/history page fetches against a large seeded database.
+
+    python -m benchmarks.bench_history --sessions 100000
+
+Seeds study sessions into a temporary database, then times the first page,
+pages deep into the history (following cursors) and single-session fetches.
+Keyset pagination should keep every page fetch roughly constant.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import percentiles
+
+
+def seed(sessions, raw_chars):
+    from server.utils.database import engine, init_db, insert_sessions
+
+    init_db()
+
+    summary = {
+        "topic": "Seeded Topic",
+        "concepts": [{"title": f"Concept {i}", "content": "Lorem ipsum dolor sit amet. " * 20} for i in range(4)],
+        "definitions": {"Term": "Definition"},
+    }
+    titles = json.dumps([f"Concept {i}" for i in range(4)])
+    raw = "Seeded lecture notes. " * (raw_chars // 22)
+    start = datetime.datetime(2024, 1, 1)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(sessions):
+            batch.append({
+                "topic": f"Topic {i % 500}",
+                "raw_content": raw,
+                "summary": summary,
+                "concept_titles": titles,
+                "created_at": start + datetime.timedelta(seconds=i * 37),
+            })
+            if len(batch) == 5000:
+                insert_sessions(conn, batch)
+                batch = []
+        if batch:
+            insert_sessions(conn, batch)
+
+
+def time_call(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--raw-chars", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=200, help="pages to walk through with cursors")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from server.utils.database import get_study_history, get_study_session
+
+        started = time.perf_counter()
+        seed(args.sessions, args.raw_chars)
+        seed_s = time.perf_counter() - started
+
+        first_page = [time_call(get_study_history, args.page_size)[0] for _ in range(50)]
+
+        walk, cursor = [], None
+        for _ in range(args.pages):
+            elapsed, page = time_call(get_study_history, args.page_size, cursor)
+            walk.append(elapsed)
+            cursor = page["nextCursor"]
+            if not cursor:
+                break
+
+        ids = random.sample(range(1, args.sessions + 1), 200)
+        detail = [time_call(get_study_session, session_id)[0] for session_id in ids]
+
+    print(json.dumps({
+        "sessions": args.sessions,
+        "seed_s": round(seed_s, 1),
+        "first_page": percentiles(first_page),
+        "cursor_walk_first_10_pages": percentiles(walk[:10]),
+        "cursor_walk_last_10_pages": percentiles(walk[-10:]),
+        "session_detail": percentiles(detail),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
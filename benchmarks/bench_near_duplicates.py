@@ -0,0 +1,114 @@
+"""
+Near-duplicate summary reuse: lookup cost and which edits are detected.
+
+    python -m benchmarks.bench_near_duplicates --sessions 20000
+
+Seeds a fresh database with fingerprinted synthetic sessions, then for a
+sample of stored notes submits edited copies (a typo, an added header, a
+rewritten paragraph, the same notes under other options, unrelated notes)
+and reports how often each is reused at NEAR_DUPLICATE_THRESHOLD, the
+estimated similarity and the fingerprint + lookup latency. Each reuse is
+one LLM call the exact-hash cache would have missed.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import percentiles
+from benchmarks.bench_weights import VOCABULARY, synthetic_document
+
+OPTIONS = {"length": 50, "exam_mode": True, "explain_simply": False, "language": "English", "use_cache": True}
+
+
+def seed(documents):
+    from server.utils.database import engine, init_db, SessionFingerprint, SessionLSHBucket, insert_sessions
+    from server.utils.ai_engine import summary_options_key
+    from server.utils.fingerprint import minhash_signature, lsh_buckets, signature_to_bytes
+
+    init_db()
+    options_key = summary_options_key(50, True, False, "English")
+    with engine.begin() as conn:
+        for start in range(0, len(documents), 1000):
+            batch = documents[start:start + 1000]
+            ids = [start + i + 1 for i in range(len(batch))]
+            signatures = [minhash_signature(doc) for doc in batch]
+            insert_sessions(conn, [
+                {"id": session_id, "topic": "Synthetic", "raw_content": doc, "summary": {}, "concept_titles": "[]"}
+                for session_id, doc in zip(ids, batch)
+            ])
+            conn.execute(SessionFingerprint.__table__.insert(), [
+                {"session_id": session_id, "options_key": options_key, "signature": signature_to_bytes(signature)}
+                for session_id, signature in zip(ids, signatures)
+            ])
+            conn.execute(SessionLSHBucket.__table__.insert(), [
+                {"bucket": bucket, "session_id": session_id}
+                for session_id, signature in zip(ids, signatures) for bucket in set(lsh_buckets(signature, options_key))
+            ])
+
+
+def typo(doc, rng):
+    words = doc.split(" ")
+    i = rng.randrange(len(words))
+    words[i] = words[i][::-1]
+    return " ".join(words)
+
+
+def added_header(doc, rng):
+    return f"Lecture {rng.randint(1, 20)}: Revision notes\n{doc}"
+
+
+def rewritten_paragraph(doc, rng):
+    lines = doc.split("\n")
+    i = rng.randrange(1, len(lines))
+    lines[i] = " ".join(rng.choices(VOCABULARY, k=len(lines[i].split())))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--samples", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from server.utils.fingerprint import find_reusable_summary
+        from server.utils.fingerprint import NEAR_DUPLICATE_THRESHOLD
+
+        rng = random.Random(13)
+        documents = [synthetic_document(rng) for _ in range(args.sessions)]
+        started = time.perf_counter()
+        seed(documents)
+        seed_s = time.perf_counter() - started
+
+        edits = {
+            "typo": (typo, OPTIONS),
+            "added_header": (added_header, OPTIONS),
+            "rewritten_paragraph": (rewritten_paragraph, OPTIONS),
+            "other_language": (lambda doc, rng: doc, {**OPTIONS, "language": "French"}),
+            "unrelated": (lambda doc, rng: synthetic_document(rng), OPTIONS),
+        }
+        results = {"sessions": args.sessions, "threshold": NEAR_DUPLICATE_THRESHOLD, "seed_s": round(seed_s, 1)}
+        for name, (edit, options) in edits.items():
+            reused, similarities, samples = 0, [], []
+            for doc in rng.sample(documents, args.samples):
+                submitted = edit(doc, rng)
+                started = time.perf_counter()
+                _, _, report = find_reusable_summary(submitted, options)
+                samples.append(time.perf_counter() - started)
+                reused += report["reused"]
+                if report["similarity"] is not None:
+                    similarities.append(report["similarity"])
+            results[name] = {
+                "reuse_rate": round(reused / args.samples, 3),
+                "mean_similarity": round(sum(similarities) / len(similarities), 4) if similarities else None,
+                "lookup": percentiles(samples),
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
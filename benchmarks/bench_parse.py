@@ -0,0 +1,91 @@
+"""
+PDF extraction: in-memory sequential parser versus the spooled, page-parallel one.
+
+    python -m benchmarks.bench_parse --pages 500
+
+Generates a synthetic PDF, then extracts it in a fresh process per
+implementation and reports wall time and peak RSS (parent plus workers).
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import REPO_ROOT
+
+LINE = "Mitochondria generate most of the chemical energy needed to power the cell. "
+
+
+def make_pdf(path, pages, lines_per_page=45):
+    import fitz
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        text = f"Page {number + 1}\n" + "\n".join(LINE for _ in range(lines_per_page))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def baseline(path):
+    """The original implementation: whole upload in memory, `text +=` per page."""
+    import fitz
+    with open(path, "rb") as f:
+        content = f.read()
+    text = ""
+    doc = fitz.open(stream=content, filetype="pdf")
+    for page in doc:
+        text += page.get_text()
+    doc.close()
+    return text
+
+
+def streaming(path):
+    from server.utils.file_parser import extract_text_from_path, shutdown_parse_pool
+    try:
+        return extract_text_from_path(path, "pdf")
+    finally:
+        shutdown_parse_pool(wait=True)
+
+
+def run_worker(mode, path):
+    started = time.perf_counter()
+    text = baseline(path) if mode == "baseline" else streaming(path)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is reported in KiB on Linux
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kib = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({"wall_s": round(elapsed, 3), "peak_rss_mb": round(peak_kib / 1024, 1),
+                      "peak_worker_rss_mb": round(children_kib / 1024, 1), "chars": len(text)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "synthetic.pdf")
+        make_pdf(path, args.pages)
+        results = {"pages": args.pages, "file_mb": round(os.path.getsize(path) / 1024 / 1024, 2)}
+        for mode in ("baseline", "streaming"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_parse", "--worker", mode, path],
+                cwd=REPO_ROOT, env={**os.environ, "PYTHONPATH": REPO_ROOT, "MAX_PAGES": str(args.pages)},
+                capture_output=True, text=True, check=True,
+            )
+            results[mode] = json.loads(output.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
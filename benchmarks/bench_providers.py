@@ -0,0 +1,120 @@
+"""
+Provider routing against two local stub LLMs: hedging, failover and model choice.
+
+    python -m benchmarks.bench_providers --requests 300 --slow-rate 0.02
+
+Each scenario starts the API with LLM_PROVIDERS pointing at stubs A and B
+and sends `--requests` uncached /rephrase calls, `--concurrency` at a time:
+  - single:   A only; a `--slow-rate` share of its replies take `--slow-latency`
+  - hedged:   A then B, both with that latency tail; slow calls are hedged
+              to the other stub after the p95 delay
+  - failover: A fails every request with 503, B is healthy; A's circuit
+              opens and traffic moves to B
+  - routing:  short and long notes on A, counted per model by the stub
+Latency percentiles, failed calls, per-stub request counts and the final
+/api/llm state are reported.
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import free_port, start_stub, start_app, stop, percentiles
+from benchmarks.bench_weights import synthetic_document
+
+
+async def load(base, texts, concurrency):
+    samples, failed = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client, text):
+        nonlocal failed
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(f"{base}/rephrase", json={"text": text, "bypassCache": True})
+            samples.append(time.perf_counter() - started)
+            if response.status_code != 200 or response.json()["rephrased"].startswith("Rephrase Error"):
+                failed += 1
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency + 5)) as client:
+        await asyncio.gather(*(one(client, text) for text in texts))
+    return samples, failed
+
+
+def provider(name, port):
+    return {"name": name, "base_url": f"http://127.0.0.1:{port}/v1", "api_key": "local",
+            "model": "small-model", "large_model": "large-model"}
+
+
+def scenario(args, workdir, stub_args, names, texts, warmup):
+    """Runs `texts` against stubs started with `stub_args` ({name: extra args}), using providers `names`."""
+    ports = {name: free_port() for name in stub_args}
+    stubs = {name: start_stub(ports[name], latency=args.latency, extra_args=["--chunk-delay", "0", *extra])
+             for name, extra in stub_args.items()}
+    env = {
+        "LLM_PROVIDERS": json.dumps([provider(name, ports[name]) for name in names]),
+        "AI_RETRY_BACKOFF": "0.1", "LLM_HEDGE_DELAY": str(args.slow_latency / 2), "LLM_BREAKER_COOLDOWN": "60",
+    }
+    app_port = free_port()
+    app = start_app(app_port, workdir, env=env)
+    base = f"http://127.0.0.1:{app_port}"
+    try:
+        asyncio.run(load(base, warmup, args.concurrency))
+        before = {name: httpx.get(f"http://127.0.0.1:{ports[name]}/stub/stats").json() for name in stubs}
+        started = time.perf_counter()
+        samples, failed = asyncio.run(load(base, texts, args.concurrency))
+        elapsed = time.perf_counter() - started
+        after = {name: httpx.get(f"http://127.0.0.1:{ports[name]}/stub/stats").json() for name in stubs}
+        return {
+            "latency": percentiles(samples),
+            "failed": failed,
+            "wall_s": round(elapsed, 1),
+            "stub_requests": {
+                name: {key: value - before[name].get(key, 0) for key, value in after[name].items()
+                       if key == "requests" or key.startswith(("model_", "errors_"))}
+                for name in stubs
+            },
+            "providers": httpx.get(f"{base}/api/llm").json()["providers"],
+        }
+    finally:
+        stop(app, *stubs.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="usual stub seconds per completion")
+    parser.add_argument("--slow-rate", type=float, default=0.02)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    args = parser.parse_args()
+
+    rng = random.Random(16)
+    short = [synthetic_document(rng, words=150) for _ in range(args.requests)]
+    warmup = [synthetic_document(rng, words=150) for _ in range(40)]
+    long = [synthetic_document(rng, words=4000) for _ in range(20)]
+    tail = ["--slow-rate", str(args.slow_rate), "--slow-latency", str(args.slow_latency)]
+
+    results = {"requests": args.requests, "concurrency": args.concurrency, "latency_s": args.latency,
+               "slow_rate": args.slow_rate, "slow_latency_s": args.slow_latency}
+    with tempfile.TemporaryDirectory() as workdir:
+        results["single"] = scenario(args, workdir, {"A": tail}, ["A"], short, warmup)
+        results["hedged"] = scenario(args, workdir, {"A": tail, "B": tail}, ["A", "B"], short, warmup)
+        results["failover"] = scenario(
+            args, workdir, {"A": ["--error-rate", "1", "--error-status", "503"], "B": []}, ["A", "B"], short, []
+        )
+        results["routing"] = scenario(args, workdir, {"A": []}, ["A"], short[:20] + long, [])
+    for name in ("single", "hedged", "failover"):
+        results[name]["providers"] = [
+            {key: p[key] for key in ("name", "circuit", "errorRate")} for p in results[name]["providers"]
+        ]
+    results["routing"] = results["routing"]["stub_requests"]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Spaced-repetition review queue against millions of seeded cards.
+
+    python -m benchmarks.bench_review --cards 2000000
+
+Seeds `--cards` review cards (spread over `--sessions` sessions, due dates a
+year either side of now) into a temporary database, then times:
+  - due:          the next `--limit` due cards via due_cards (due_at index)
+  - due_session:  the same for one session (session_id, due_at index)
+  - due_scan:     the same query with the index disabled (NOT INDEXED), i.e.
+                  what it costs without the due-date index
+  - answers:      record_answers for a quiz of `--quiz-size` cards (one
+                  batched UPDATE + answer insert in a transaction)
+  - answers_loop: the same cards updated and committed one at a time
+  - sm2:          the vectorized scheduler over every seeded card state
+The SQLite query plan of the due query is printed to show the index is used.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from benchmarks.common import percentiles
+
+SCAN_QUERY = (
+    "SELECT id, due_at FROM review_cards NOT INDEXED WHERE due_at <= :now "
+    "ORDER BY due_at, id LIMIT :limit"
+)
+
+
+def seed(cards, sessions, now):
+    from server.utils.database import engine, init_db, insert_sessions
+
+    init_db()
+
+    rng = random.Random(18)
+    with engine.begin() as conn:
+        insert_sessions(conn, [
+            {"topic": f"Topic {i % 50}", "raw_content": f"Seeded notes {i}", "summary": {"topic": f"Topic {i % 50}"},
+             "concept_titles": "[]"}
+            for i in range(sessions)
+        ])
+        mcq = json.dumps({"question": "Seeded question?", "options": ["a", "b", "c", "d"], "correct": 0})
+        insert = text(
+            "INSERT INTO review_cards (session_id, question_hash, mcq_json, ease, interval_days, repetitions, lapses, "
+            "due_at, created_at) VALUES (:session_id, :question_hash, :mcq_json, :ease, :interval_days, "
+            ":repetitions, :lapses, :due_at, :created_at)"
+        )
+        batch = []
+        for i in range(cards):
+            batch.append({
+                "session_id": i % sessions + 1, "question_hash": f"{i:032x}", "mcq_json": mcq,
+                "ease": round(rng.uniform(1.3, 3.0), 2), "interval_days": rng.choice((0.0, 1.0, 6.0, 15.0, 40.0)),
+                "repetitions": rng.randint(0, 6), "lapses": rng.randint(0, 2),
+                "due_at": now + datetime.timedelta(minutes=rng.randint(-525600, 525600)), "created_at": now,
+            })
+            if len(batch) == 20000:
+                conn.execute(insert, batch)
+                batch = []
+        if batch:
+            conn.execute(insert, batch)
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def answers_loop(card_ids, now):
+    """One UPDATE + commit per answered card, as a naive per-question write would do."""
+    from server.utils.database import SessionLocal, ReviewCard, ReviewAnswer
+    from server.utils.review import sm2
+
+    db = SessionLocal()
+    try:
+        for card_id in card_ids:
+            card = db.get(ReviewCard, card_id)
+            ease, interval, repetitions, lapses = sm2([card.ease], [card.interval_days], [card.repetitions],
+                                                      [card.lapses], [4])
+            card.ease, card.interval_days = float(ease[0]), float(interval[0])
+            card.repetitions, card.lapses = int(repetitions[0]), int(lapses[0])
+            card.due_at, card.last_reviewed_at = now + datetime.timedelta(days=float(interval[0])), now
+            db.add(ReviewAnswer(card_id=card_id, quality=4, answered_at=now))
+            db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=2000000)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--quiz-size", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from server.utils.database import engine
+        from server.utils.review import due_cards, record_answers, sm2
+
+        now = datetime.datetime.utcnow()
+        started = time.perf_counter()
+        seed(args.cards, args.sessions, now)
+        seed_s = time.perf_counter() - started
+
+        rng = random.Random(5)
+        sessions = [rng.randint(1, args.sessions) for _ in range(args.runs)]
+        with engine.connect() as conn:
+            plan = [row[-1] for row in conn.execute(
+                text("EXPLAIN QUERY PLAN SELECT id FROM review_cards WHERE due_at <= :now ORDER BY due_at, id LIMIT 20"),
+                {"now": now})]
+            scan = [timed(conn.execute, text(SCAN_QUERY), {"now": now, "limit": args.limit})
+                    for _ in range(max(3, args.runs // 10))]
+            due_count = conn.execute(text("SELECT COUNT(*) FROM review_cards WHERE due_at <= :now"), {"now": now}).scalar()
+            states = conn.execute(text("SELECT ease, interval_days, repetitions, lapses FROM review_cards")).fetchall()
+
+        due = [timed(due_cards, args.limit, now=now) for _ in range(args.runs)]
+        due_session = [timed(due_cards, args.limit, session_id) for session_id in sessions]
+
+        card_ids = rng.sample(range(1, args.cards + 1), args.runs * args.quiz_size * 2)
+        quizzes = [card_ids[i:i + args.quiz_size] for i in range(0, len(card_ids), args.quiz_size)]
+        answers = [timed(record_answers, None, [{"cardId": card_id, "quality": 4} for card_id in quiz], now=now)
+                   for quiz in quizzes[:args.runs]]
+        loop = [timed(answers_loop, quiz, now) for quiz in quizzes[args.runs:]]
+
+        ease, interval, repetitions, lapses = (np.array(column) for column in zip(*states))
+        quality = np.random.default_rng(1).integers(0, 6, len(ease))
+        sm2_s = timed(sm2, ease, interval, repetitions, lapses, quality)
+
+    print(json.dumps({
+        "cards": args.cards,
+        "sessions": args.sessions,
+        "due_now": due_count,
+        "seed_s": round(seed_s, 1),
+        "query_plan": plan,
+        "due": percentiles(due),
+        "due_session": percentiles(due_session),
+        "due_scan": percentiles(scan),
+        "answers": percentiles(answers),
+        "answers_loop": percentiles(loop),
+        "sm2_cards_per_s": round(len(ease) / sm2_s),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
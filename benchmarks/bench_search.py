@@ -0,0 +1,107 @@
+"""
+/search latency over a large history.
+
+    python -m benchmarks.bench_search --sessions 100000
+
+Seeds a fresh database with synthetic study sessions, builds the search index
+(timed, this is the backfill path) and times keyword, semantic and hybrid
+queries. For comparison it also times what the client had to do before: an
+unindexed LIKE scan over every session's notes. Incremental indexing is
+measured as the cost of saving one more session.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import percentiles
+from benchmarks.bench_weights import VOCABULARY, synthetic_document
+
+
+def seed(sessions):
+    from server.utils.database import engine, init_db, insert_sessions
+
+    init_db()
+
+    rng = random.Random(11)
+    with engine.begin() as conn:
+        for start in range(0, sessions, 5000):
+            insert_sessions(conn, [
+                {"topic": " ".join(rng.choices(VOCABULARY[:500], k=2)).title(), "raw_content": synthetic_document(rng),
+                 "summary": {}, "concept_titles": "[]"}
+                for _ in range(start, min(start + 5000, sessions))
+            ])
+
+
+def like_scan(query):
+    """Unindexed substring match over every session's notes (the fallback without FTS5)."""
+    from server.utils import database, search
+    db = database.SessionLocal()
+    fts_enabled, database.search_fts_enabled = database.search_fts_enabled, False
+    try:
+        return search._keyword_hits(db, search._terms(query), 10)
+    finally:
+        database.search_fts_enabled = fts_enabled
+        db.close()
+
+
+def timed(func, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        func(query)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        from server.utils.database import rebuild_search_index, save_study_session
+        from server.utils.search import search_sessions, get_vector_index
+        from server.utils.database import SessionLocal
+
+        started = time.perf_counter()
+        seed(args.sessions)
+        seed_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rebuild_search_index()
+        index_s = time.perf_counter() - started
+
+        db = SessionLocal()
+        started = time.perf_counter()
+        get_vector_index(db)
+        vector_load_s = time.perf_counter() - started
+        db.close()
+
+        rng = random.Random(5)
+        queries = [" ".join(rng.choices(VOCABULARY, k=rng.randint(1, 2))) for _ in range(args.queries)]
+        results = {
+            "sessions": args.sessions,
+            "seed_s": round(seed_s, 1),
+            "index_build_s": round(index_s, 1),
+            "vector_load_s": round(vector_load_s, 2),
+            "keyword": percentiles(timed(lambda q: search_sessions(q, "keyword"), queries)),
+            "semantic": percentiles(timed(lambda q: search_sessions(q, "semantic"), queries)),
+            "hybrid": percentiles(timed(lambda q: search_sessions(q, "hybrid"), queries)),
+            "hybrid_page_5": percentiles(timed(lambda q: search_sessions(q, "hybrid", limit=10, offset=40), queries)),
+            "like_scan_baseline": percentiles(timed(like_scan, queries[:10])),
+            "save_session": percentiles(timed(
+                lambda q: save_study_session("Bench", synthetic_document(rng), {"concepts": []}), queries[:20]
+            )),
+            "hybrid_after_saves": percentiles(timed(lambda q: search_sessions(q, "hybrid"), queries[:20])),
+            "db_mb": round(os.path.getsize(os.path.join(workdir, "study_mate.db")) / 1024 / 1024, 1),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
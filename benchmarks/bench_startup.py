@@ -0,0 +1,133 @@
+"""
+Worker cold start: import time and memory of server.main, and time until a
+fresh uvicorn process answers.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --max-import-ms 1500  # fail above a budget (CI)
+
+Each run is a new interpreter in an empty directory. Reported (medians):
+  - import:   `import server.main` wall time and RSS afterwards, with the
+              modules that are loaded on first use still absent
+  - eager:    the same followed by preload_modules(), i.e. what every worker
+              paid when those modules were imported at startup
+  - ready:    from launching uvicorn to the first /api/health reply, on a new
+              database (schema created in the lifespan) and on an existing one
+  - slowest:  top-level modules by cumulative import time (python -X importtime)
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import REPO_ROOT, free_port, start_process, stop
+
+HEAVY_MODULES = ("sklearn", "fitz", "docx", "openai", "scipy", "pandas")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import server.main
+imported = time.perf_counter() - started
+if sys.argv[1] == "eager":
+    server.main.preload_modules()
+with open("/proc/self/status") as status:
+    rss = next(int(line.split()[1]) for line in status if line.startswith("VmRSS:"))
+print(json.dumps({
+    "seconds": time.perf_counter() - started, "import_seconds": imported, "rss_kb": rss,
+    "heavy_loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def probe(mode, workdir):
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT, "LOG_LEVEL": "WARNING"}
+    output = subprocess.run([sys.executable, "-c", PROBE, mode], env=env, cwd=workdir,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(workdir, top):
+    """Top-level imports of server.main with their cumulative microseconds, slowest first."""
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT, "LOG_LEVEL": "WARNING"}
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server.main"], env=env, cwd=workdir,
+                            capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Direct imports of server.main are indented by two spaces (after the separator's one)
+        if name.startswith("   ") and not name.startswith("    "):
+            modules.append((name.strip(), int(cumulative)))
+    return [{"module": name, "ms": round(us / 1000, 1)} for name, us in sorted(modules, key=lambda m: -m[1])[:top]]
+
+
+def time_to_ready(workdir):
+    port = free_port()
+    started = time.perf_counter()
+    proc = start_process(
+        ["-m", "uvicorn", "server.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+    )
+    try:
+        # A bare connect attempt is cheap, so polling does not slow the starting server down
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("uvicorn exited before accepting connections")
+                time.sleep(0.01)
+        httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=10).raise_for_status()
+        return time.perf_counter() - started
+    finally:
+        stop(proc)
+
+
+def summary(samples, key):
+    return round(statistics.median(sample[key] for sample in samples), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="exit with an error above this median")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        lazy = [probe("lazy", workdir) for _ in range(args.runs)]
+        eager = [probe("eager", workdir) for _ in range(args.runs)]
+        ready_new, ready_existing = [], []
+        for run in range(args.runs):
+            fresh = os.path.join(workdir, f"fresh{run}")
+            os.mkdir(fresh)
+            ready_new.append(time_to_ready(fresh))
+            ready_existing.append(time_to_ready(fresh))
+        profile = import_profile(workdir, args.top)
+
+    results = {
+        "runs": args.runs,
+        "import": {"seconds": summary(lazy, "import_seconds"), "rss_mb": round(summary(lazy, "rss_kb") / 1024, 1),
+                   "heavy_loaded": lazy[0]["heavy_loaded"]},
+        "eager": {"seconds": summary(eager, "seconds"), "rss_mb": round(summary(eager, "rss_kb") / 1024, 1),
+                  "heavy_loaded": eager[0]["heavy_loaded"]},
+        "ready_new_db_s": round(statistics.median(ready_new), 3),
+        "ready_existing_db_s": round(statistics.median(ready_existing), 3),
+        "slowest": profile,
+    }
+    print(json.dumps(results, indent=2))
+    if args.max_import_ms is not None and results["import"]["seconds"] * 1000 > args.max_import_ms:
+        sys.exit(f"import of server.main took {results['import']['seconds'] * 1000:.0f} ms (budget {args.max_import_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
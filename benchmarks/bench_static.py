@@ -0,0 +1,155 @@
+"""
+Frontend serving throughput: the previous StaticFiles mount and FileResponse
+catch-all vs the in-memory build with precompressed variants.
+
+    python -m benchmarks.bench_static --seconds 5 --concurrency 32
+
+Writes a Vite-like build (index.html, a ~500 KB JS bundle and a CSS file with
+hashed names, .vite/manifest.json) into a temporary directory and starts
+uvicorn on `legacy_app` below (a copy of the old serving code) and on
+server.main, both with that directory as dist/. Each scenario is run for
+`--seconds` by `--concurrency` clients:
+  - spa:         GET /courses/42 (a client-side route, answered with index.html)
+  - bundle:      GET of the JS bundle with Accept-Encoding: br, gzip
+  - revalidate:  the bundle with If-None-Match set to the ETag it was sent with
+  - range:       the first 64 KiB of the bundle
+Reported per app and scenario: requests per second, latency percentiles,
+status codes, bytes on the wire per response, and the response headers
+that matter for caching.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse
+
+from benchmarks.common import free_port, start_process, start_app, wait_for_http, stop, percentiles
+from benchmarks.bench_weights import VOCABULARY
+
+BUNDLE = "assets/index-4f9c2b1e.js"
+STYLES = "assets/index-a81d03c7.css"
+CACHE_HEADERS = ("cache-control", "etag", "content-encoding", "vary", "accept-ranges")
+
+# --- The serving code before in-memory assets, kept for comparison ---
+
+legacy_app = FastAPI()
+
+@legacy_app.get("/api/health")
+async def legacy_health():
+    return {"status": "online"}
+
+if os.path.exists("dist"):
+    legacy_app.mount("/assets", StaticFiles(directory="dist/assets"), name="assets")
+
+    @legacy_app.get("/{full_path:path}")
+    async def serve_frontend(full_path: str):
+        index_path = os.path.join("dist", "index.html")
+        if os.path.exists(index_path):
+            return FileResponse(index_path)
+        return {"error": "Frontend build not found. Run 'npm run build' first."}
+
+
+def write_build(dist, bundle_kb, rng):
+    """A minified-looking bundle of roughly `bundle_kb` KB, its stylesheet, index.html and the manifest."""
+    os.makedirs(os.path.join(dist, "assets"))
+    os.makedirs(os.path.join(dist, ".vite"))
+    names = [f"{rng.choice(VOCABULARY)}{rng.choice(VOCABULARY).title()}" for _ in range(400)]
+    parts, size = [], 0
+    while size < bundle_kb * 1024:
+        a, b, c = rng.sample(names, 3)
+        part = (f"function {a}(e,t){{const n={b}(e.{c}||[]);return n.length>{rng.randint(1, 99)}?"
+                f"t.map(r=>({{...r,{c}:\"{rng.choice(VOCABULARY)}\"}})):{c}(n,{rng.randint(0, 9999)})}}")
+        parts.append(part)
+        size += len(part)
+    with open(os.path.join(dist, BUNDLE), "w") as f:
+        f.write(";".join(parts))
+    with open(os.path.join(dist, STYLES), "w") as f:
+        f.write("".join(f".{name}{{margin:{rng.randint(0, 32)}px;color:#{rng.randrange(16 ** 6):06x}}}" for name in names * 4))
+    with open(os.path.join(dist, "index.html"), "w") as f:
+        f.write(f'<!doctype html><html lang="en"><head><meta charset="UTF-8"><title>Study Mate</title>'
+                f'<script type="module" crossorigin src="/{BUNDLE}"></script>'
+                f'<link rel="stylesheet" crossorigin href="/{STYLES}"></head><body><div id="root"></div></body></html>')
+    with open(os.path.join(dist, ".vite", "manifest.json"), "w") as f:
+        json.dump({"index.html": {"file": BUNDLE, "css": [STYLES], "isEntry": True, "src": "index.html"}}, f)
+
+
+async def run_scenario(base, path, headers, seconds, concurrency):
+    samples, statuses, wire_bytes = [], {}, []
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                samples.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                wire_bytes.append(response.num_bytes_downloaded)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "rps": round(len(samples) / elapsed, 1),
+        "latency": percentiles(samples),
+        "statuses": statuses,
+        "bytes_per_response": round(sum(wire_bytes) / len(wire_bytes)),
+    }
+
+
+async def measure(base, args):
+    encodings = {"accept-encoding": "br, gzip"}
+    async with httpx.AsyncClient(base_url=base) as client:
+        first = await client.get(f"/{BUNDLE}", headers=encodings)
+    scenarios = {
+        "spa": ("/courses/42", encodings),
+        "bundle": (f"/{BUNDLE}", encodings),
+        "revalidate": (f"/{BUNDLE}", {**encodings, "if-none-match": first.headers.get("etag", "")}),
+        "range": (f"/{BUNDLE}", {"range": "bytes=0-65535"}),
+    }
+    results = {"bundle_headers": {name: first.headers.get(name) for name in CACHE_HEADERS}}
+    for name, (path, headers) in scenarios.items():
+        results[name] = await run_scenario(base, path, headers, args.seconds, args.concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bundle-kb", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {"concurrency": args.concurrency, "seconds": args.seconds}
+    with tempfile.TemporaryDirectory() as workdir:
+        write_build(os.path.join(workdir, "dist"), args.bundle_kb, random.Random(23))
+        results["bundle_bytes"] = os.path.getsize(os.path.join(workdir, "dist", BUNDLE))
+        for name in ("legacy", "in_memory"):
+            port = free_port()
+            if name == "legacy":
+                proc = start_process(["-m", "uvicorn", "benchmarks.bench_static:legacy_app", "--host", "127.0.0.1",
+                                      "--port", str(port), "--log-level", "warning"], cwd=workdir)
+                wait_for_http(f"http://127.0.0.1:{port}/api/health")
+            else:
+                proc = start_app(port, workdir, env={"METRICS": "off"})
+            try:
+                results[name] = asyncio.run(measure(f"http://127.0.0.1:{port}", args))
+            finally:
+                stop(proc)
+
+    for scenario in ("spa", "bundle", "revalidate", "range"):
+        results.setdefault("rps_ratio", {})[scenario] = round(
+            results["in_memory"][scenario]["rps"] / max(results["legacy"][scenario]["rps"], 0.1), 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+/stats latency: pandas full recompute versus the materialized aggregates.
+
+    python -m benchmarks.bench_stats --scales 10000,100000,1000000
+
+For each scale a fresh database is seeded with quiz results, the aggregates
+are rebuilt (timed, this is the backfill path) and both implementations are
+timed. The two results are also compared for equality.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import REPO_ROOT, percentiles
+
+
+def legacy_analytics():
+    """The original pandas implementation of get_performance_analytics."""
+    import pandas as pd
+    from server.utils.database import SessionLocal, QuizResult, StudySession
+
+    db = SessionLocal()
+    results = db.query(QuizResult, StudySession.topic)\
+        .join(StudySession, QuizResult.session_id == StudySession.id)\
+        .all()
+    if not results:
+        db.close()
+        return {"mastery": 0, "weak_topics": [], "total_sessions": 0, "topic_breakdown": []}
+    df = pd.DataFrame([
+        {
+            "id": r[0].id,
+            "session_id": r[0].session_id,
+            "topic": r[1] or "Unknown Topic",
+            "score": r[0].score,
+            "total": r[0].total,
+            "weak_topics": r[0].weak_topics.split(",") if r[0].weak_topics else []
+        } for r in results
+    ])
+    df['percentage'] = (df['score'] / df['total']) * 100
+    avg_mastery = df['percentage'].mean()
+    all_weak_topics = [topic for sublist in df['weak_topics'] for topic in sublist if topic]
+    weak_topic_counts = pd.Series(all_weak_topics).value_counts().to_dict() if all_weak_topics else {}
+    sorted_weak_topics = sorted(weak_topic_counts.items(), key=lambda x: x[1], reverse=True)
+    topic_stats = df.groupby('topic')['percentage'].mean().reset_index()
+    topic_breakdown = [
+        {"topic": row['topic'], "mastery": round(row['percentage'], 1)}
+        for _, row in topic_stats.iterrows()
+    ]
+    db.close()
+    return {
+        "mastery": round(avg_mastery, 2),
+        "weak_topics": [topic for topic, count in sorted_weak_topics[:5]],
+        "total_sessions": len(df['session_id'].unique()),
+        "topic_breakdown": topic_breakdown
+    }
+
+
+def seed(quiz_results, sessions=2000, topics=50, weak_pool=200):
+    from server.utils.database import engine, init_db, QuizResult, insert_sessions
+
+    init_db()
+
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        insert_sessions(conn, [
+            {"topic": f"Topic {i % topics}", "raw_content": "", "summary": {}, "concept_titles": "[]"}
+            for i in range(sessions)
+        ])
+        batch = []
+        for _ in range(quiz_results):
+            total = 5
+            weak = rng.sample(range(weak_pool), rng.randint(0, 3))
+            batch.append({
+                "session_id": rng.randint(1, sessions),
+                "score": rng.randint(0, total),
+                "total": total,
+                "weak_topics": ",".join(f"Weak {w}" for w in weak),
+            })
+            if len(batch) == 20000:
+                conn.execute(QuizResult.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(QuizResult.__table__.insert(), batch)
+
+
+def timed(func, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return samples, result
+
+
+def run_scale(quiz_results, repeat):
+    from server.utils.analytics import get_performance_analytics, rebuild_analytics
+
+    seed(quiz_results)
+    started = time.perf_counter()
+    rebuild_analytics()
+    rebuild_s = time.perf_counter() - started
+
+    legacy_samples, legacy = timed(legacy_analytics, max(1, min(repeat, 3)))
+    new_samples, new = timed(get_performance_analytics, repeat)
+    # Tie order among equally weak topics is unspecified in the legacy code
+    same = {**legacy, "weak_topics": None} == {**new, "weak_topics": None}
+    return {
+        "quiz_results": quiz_results,
+        "rebuild_s": round(rebuild_s, 2),
+        "legacy_pandas": percentiles(legacy_samples),
+        "aggregates": percentiles(new_samples),
+        "results_match": same,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scale(args.worker, args.repeat)))
+        return
+
+    results = []
+    for scale in (int(s) for s in args.scales.split(",")):
+        # One process and one database per scale keeps the measurements independent
+        with tempfile.TemporaryDirectory() as workdir:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_stats", "--worker", str(scale), "--repeat", str(args.repeat)],
+                cwd=workdir, env={**os.environ, "PYTHONPATH": REPO_ROOT},
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Storage size and read/write throughput: plain TEXT columns vs compressed BLOBs.
+
+    python -m benchmarks.bench_storage --sessions 5000 --duplicate-rate 0.2
+
+Seeds the same sessions (notes of `--words` words, a `--duplicate-rate`
+share of repeat uploads, a full summary each) into:
+  - legacy: raw_content / summary_json as plain TEXT and an FTS5 search
+    index holding its own copy of every note, as before
+  - zlib / zstd / off: content_blobs + compressed summary_data and the
+    contentless search index, per codec (zstd only when the zstandard
+    package is installed)
+and reports the SQLite file size after VACUUM (and the part of it taken by
+the search index and its shadow tables), insert throughput and the
+throughput of reading one summary or one session's notes by id. Finally a
+copy of the legacy database is opened by the server to time the migration
+and check that every summary and note survived it.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.common import REPO_ROOT
+from benchmarks.bench_weights import synthetic_document
+
+LEGACY_SCHEMA = (
+    "CREATE TABLE study_sessions (id INTEGER PRIMARY KEY, topic VARCHAR, raw_content TEXT, "
+    "summary_json TEXT, concept_titles TEXT, created_at DATETIME)"
+)
+LEGACY_SEARCH_SCHEMA = (
+    "CREATE VIRTUAL TABLE study_search USING fts5("
+    "topic, concepts, definitions, content, tokenize='porter unicode61 remove_diacritics 2')"
+)
+
+
+def synthetic_summary(rng, index):
+    words = synthetic_document(rng, words=900).split()
+    chunk = len(words) // 4
+    return {
+        "topic": f"Topic {index % 200}",
+        "language": "English",
+        "concepts": [{"title": f"Concept {index}.{i}", "content": " ".join(words[i * chunk:(i + 1) * chunk]),
+                      "importance": "High"} for i in range(4)],
+        "dependencies": [[f"Concept {index}.0", f"Concept {index}.1"]],
+        "studySchedule": [{"day": d, "task": " ".join(rng.sample(words, 8)), "goal": " ".join(rng.sample(words, 5))}
+                          for d in range(1, 4)],
+        "definitions": {w: " ".join(rng.sample(words, 10)) for w in rng.sample(words, 5)},
+        "formulas": [" ".join(rng.sample(words, 6))],
+        "tips": [" ".join(rng.sample(words, 12)) for _ in range(3)],
+        "mnemonics": [" ".join(rng.sample(words, 4))],
+        "examFocus": rng.sample(words, 3),
+    }
+
+
+def dataset(args):
+    rng = random.Random(17)
+    sessions = []
+    for i in range(args.sessions):
+        if sessions and rng.random() < args.duplicate_rate:
+            raw = rng.choice(sessions)["raw_content"]
+        else:
+            raw = synthetic_document(rng, words=args.words)
+        summary = synthetic_summary(rng, i)
+        sessions.append({"id": i + 1, "topic": summary["topic"], "raw_content": raw, "summary": summary,
+                         "concept_titles": json.dumps([c["title"] for c in summary["concepts"]])})
+    return sessions
+
+
+def index_search(conn, schema, sessions):
+    """Creates the search table with `schema` and indexes every session the way the server does."""
+    from server.utils.database import _search_fields
+
+    conn.execute(text(schema))
+    conn.execute(text("INSERT INTO study_search(rowid, topic, concepts, definitions, content) "
+                      "VALUES (:id, :topic, :concepts, :definitions, :content)"), [
+        {"id": s["id"], **_search_fields(s["topic"], s["raw_content"], s["summary"])} for s in sessions
+    ])
+
+
+def vacuumed_size(path):
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def search_index_size(path):
+    """Bytes taken by the FTS5 table and its shadow tables (study_search_data, _idx, _content, ...)."""
+    conn = sqlite3.connect(path)
+    size = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = 'study_search' OR name LIKE 'study_search!_%' ESCAPE '!'").fetchone()[0]
+    conn.close()
+    return size or 0
+
+
+def read_rate(conn, query, decode, ids):
+    started = time.perf_counter()
+    for session_id in ids:
+        decode(conn.execute(text(query), {"id": session_id}).scalar())
+    return round(len(ids) / (time.perf_counter() - started))
+
+
+def legacy(path, sessions, ids):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_SCHEMA))
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO study_sessions (id, topic, raw_content, summary_json, concept_titles, created_at) "
+                          "VALUES (:id, :topic, :raw_content, :summary_json, :concept_titles, CURRENT_TIMESTAMP)"), [
+            {**{k: s[k] for k in ("id", "topic", "raw_content", "concept_titles")}, "summary_json": json.dumps(s["summary"])}
+            for s in sessions
+        ])
+        index_search(conn, LEGACY_SEARCH_SCHEMA, sessions)
+    write_s = time.perf_counter() - started
+    with engine.connect() as conn:
+        summary_reads = read_rate(conn, "SELECT summary_json FROM study_sessions WHERE id = :id", json.loads, ids)
+        note_reads = read_rate(conn, "SELECT raw_content FROM study_sessions WHERE id = :id", lambda v: v, ids)
+    engine.dispose()
+    return {"bytes": vacuumed_size(path), "search_index_bytes": search_index_size(path),
+            "writes_per_s": round(len(sessions) / write_s),
+            "summary_reads_per_s": summary_reads, "note_reads_per_s": note_reads}
+
+
+def compressed(path, sessions, ids, codec):
+    from server.utils import compression
+    from server.utils.database import Base, StudySession, ContentBlob, SEARCH_TABLE_SQL, insert_sessions
+
+    compression.STORAGE_COMPRESSION = codec
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[ContentBlob.__table__, StudySession.__table__])
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        insert_sessions(conn, sessions)
+        index_search(conn, SEARCH_TABLE_SQL, sessions)
+    write_s = time.perf_counter() - started
+    with engine.connect() as conn:
+        summary_reads = read_rate(conn, "SELECT summary_data FROM study_sessions WHERE id = :id", compression.unpack_json, ids)
+        note_reads = read_rate(conn, "SELECT b.data FROM study_sessions s JOIN content_blobs b ON b.hash = s.content_hash "
+                                     "WHERE s.id = :id", compression.unpack_text, ids)
+        blobs = conn.execute(text("SELECT COUNT(*) FROM content_blobs")).scalar()
+    engine.dispose()
+    return {"bytes": vacuumed_size(path), "search_index_bytes": search_index_size(path),
+            "writes_per_s": round(len(sessions) / write_s),
+            "summary_reads_per_s": summary_reads, "note_reads_per_s": note_reads, "content_blobs": blobs}
+
+
+MIGRATION_CHECK = """
+import json, sqlite3, sys
+from server.utils.database import get_session_summary, get_session_content
+legacy = sqlite3.connect(sys.argv[1])
+for session_id, raw, summary in legacy.execute("SELECT id, raw_content, summary_json FROM study_sessions"):
+    assert get_session_content(session_id) == raw and get_session_summary(session_id) == json.loads(summary), session_id
+"""
+
+
+def migration(legacy_path, workdir):
+    path = os.path.join(workdir, "migrated.db")
+    shutil.copy(legacy_path, path)
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT, "DATABASE_URL": f"sqlite:///{path}", "LOG_LEVEL": "WARNING"}
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "from server.utils.database import init_db; init_db()"], env=env, cwd=workdir, check=True)
+    migrate_s = time.perf_counter() - started
+    subprocess.run([sys.executable, "-c", MIGRATION_CHECK, legacy_path], env=env, cwd=workdir, check=True)
+    return {"startup_with_migration_s": round(migrate_s, 1), "verified": True,
+            "search_index_bytes": search_index_size(path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.2)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    from server.utils import compression
+
+    sessions = dataset(args)
+    ids = random.Random(5).choices(range(1, args.sessions + 1), k=args.reads)
+    codecs = ["zlib", "off"] + (["zstd"] if compression.zstandard else [])
+    results = {"sessions": args.sessions, "words": args.words, "duplicate_rate": args.duplicate_rate}
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy_path = os.path.join(workdir, "legacy.db")
+        results["legacy"] = legacy(legacy_path, sessions, ids)
+        for codec in codecs:
+            results[codec] = compressed(os.path.join(workdir, f"{codec}.db"), sessions, ids, codec)
+            results[codec]["size_vs_legacy"] = round(results[codec]["bytes"] / results["legacy"]["bytes"], 3)
+        results["migration"] = migration(legacy_path, workdir)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Time-to-first-concept: /summarize versus /summarize/stream.
+
+    python -m benchmarks.bench_streaming --runs 5 --chunk-delay 0.02
+
+The non-streaming endpoint only shows a concept once the whole completion is
+parsed; the streaming endpoint forwards each concept as soon as it closes.
+Also checks that both paths persist an identical session.
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import free_port, start_stub, start_app, stop, percentiles
+
+PAYLOAD = {"text": "Photosynthesis converts light energy into chemical energy. " * 40, "bypassCache": True}
+
+
+def blocking_run(client, base):
+    started = time.perf_counter()
+    response = client.post(f"{base}/summarize", json=PAYLOAD)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+def streaming_run(client, base):
+    started = time.perf_counter()
+    first_concept = None
+    with client.stream("POST", f"{base}/summarize/stream", json=PAYLOAD) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line == "event: concept" and first_concept is None:
+                first_concept = time.perf_counter() - started
+    return first_concept, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub time to first token, seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="stub delay between streamed chunks")
+    args = parser.parse_args()
+
+    stub_port, app_port = free_port(), free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = start_stub(stub_port, latency=args.latency, extra_args=["--chunk-delay", str(args.chunk_delay)])
+        app = start_app(app_port, workdir, env={"LLM_BASE_URL": f"http://127.0.0.1:{stub_port}/v1"})
+        base = f"http://127.0.0.1:{app_port}"
+        try:
+            with httpx.Client(timeout=120) as client:
+                blocking = [blocking_run(client, base) for _ in range(args.runs)]
+                streamed = [streaming_run(client, base) for _ in range(args.runs)]
+                items = client.get(f"{base}/history", params={"limit": 100}).json()["items"]
+                sessions = [client.get(f"{base}/history/{item['id']}").json() for item in items]
+        finally:
+            stop(app, stub)
+
+    summaries = [json.dumps(s["summary"], sort_keys=True) for s in sessions]
+    print(json.dumps({
+        "runs": args.runs,
+        "blocking_first_concept": percentiles(blocking),
+        "streaming_first_concept": percentiles([first for first, _ in streamed if first is not None]),
+        "streaming_total": percentiles([total for _, total in streamed]),
+        "persisted_sessions_identical": len(set(summaries)) == 1,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Summary + MCQs in one completion versus two separate calls.
+
+    python -m benchmarks.bench_study_pack --documents 20 --latency 0.5
+
+For the same documents this times:
+  - separate: /summarize then /generate-mcqs with the notes (two completions,
+              the notes are sent to the model twice)
+  - combined: one /summarize with includeMcqs (one completion)
+  - stored:   /generate-mcqs with the sessionId of a combined session, served
+              from the stored quiz without a completion
+LLM requests and prompt tokens are read from the stub's counters.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import free_port, start_stub, start_app, stop, percentiles
+from benchmarks.bench_weights import synthetic_document
+
+
+def separate(client, base, text):
+    client.post(f"{base}/summarize", json={"text": text}).raise_for_status()
+    client.post(f"{base}/generate-mcqs", json={"text": text}).raise_for_status()
+
+
+def combined(client, base, text):
+    response = client.post(f"{base}/summarize", json={"text": text, "includeMcqs": True})
+    response.raise_for_status()
+    result = response.json()
+    if not result.get("mcqs"):
+        raise RuntimeError("combined summary came back without MCQs")
+    return result["sessionId"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--words", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds per completion")
+    args = parser.parse_args()
+
+    rng = random.Random(15)
+    stub_port, app_port = free_port(), free_port()
+    results = {"documents": args.documents, "words": args.words, "latency_s": args.latency}
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = start_stub(stub_port, latency=args.latency, extra_args=["--chunk-delay", "0"])
+        app = start_app(app_port, workdir, env={"LLM_BASE_URL": f"http://127.0.0.1:{stub_port}/v1"})
+        base = f"http://127.0.0.1:{app_port}"
+        try:
+            with httpx.Client(timeout=300) as client:
+                def stub_stats():
+                    return client.get(f"http://127.0.0.1:{stub_port}/stub/stats").json()
+
+                session_ids = []
+                for name, run in (("separate", separate), ("combined", combined)):
+                    # Fresh notes per mode so neither the cache nor near-duplicate reuse kicks in
+                    texts = [synthetic_document(rng, words=args.words) for _ in range(args.documents)]
+                    before, samples = stub_stats(), []
+                    for text in texts:
+                        started = time.perf_counter()
+                        session_id = run(client, base, text)
+                        samples.append(time.perf_counter() - started)
+                        if session_id is not None:
+                            session_ids.append(session_id)
+                    after = stub_stats()
+                    results[name] = {
+                        "llm_requests": after.get("requests", 0) - before.get("requests", 0),
+                        "prompt_tokens": after.get("prompt_tokens", 0) - before.get("prompt_tokens", 0),
+                        "completion_tokens": after.get("completion_tokens", 0) - before.get("completion_tokens", 0),
+                        "per_document": percentiles(samples),
+                    }
+
+                before, samples = stub_stats(), []
+                for session_id in session_ids:
+                    started = time.perf_counter()
+                    client.post(f"{base}/generate-mcqs", json={"sessionId": session_id}).raise_for_status()
+                    samples.append(time.perf_counter() - started)
+                results["stored"] = {
+                    "llm_requests": stub_stats().get("requests", 0) - before.get("requests", 0),
+                    "per_request": percentiles(samples),
+                }
+        finally:
+            stop(app, stub)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
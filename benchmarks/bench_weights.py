@@ -0,0 +1,143 @@
+"""
+Exam-weight cost per /summarize request as the stored corpus grows.
+
+    python -m benchmarks.bench_weights --scales 1000,10000,100000
+
+For each scale a fresh database is seeded with synthetic study sessions and
+the term index is rebuilt (timed, this is the backfill path). Then the
+per-request weighting of one document is timed three ways:
+  - legacy:   the original one-document TfidfVectorizer fit (IDF meaningless)
+  - refit:    TF-IDF refit over every stored session per request (grows with the corpus)
+  - indexed:  the persistent hashed document-frequency index
+The cost of saving one more session (including its index update) is also reported.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import REPO_ROOT, percentiles
+
+VOCABULARY = [f"term{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}{chr(97 + i // 676 % 26)}" for i in range(20000)]
+
+
+def synthetic_document(rng, words=300):
+    lines = [" ".join(rng.choices(VOCABULARY[:200], k=2)).title()]
+    body = rng.choices(VOCABULARY, k=words)
+    lines += [" ".join(body[i:i + 15]) + "." for i in range(0, words, 15)]
+    return "\n".join(lines)
+
+
+def legacy_weights(text):
+    """The original implementation: a TfidfVectorizer fit on a one-document corpus."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    weights = {}
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=20)
+    X = vectorizer.fit_transform([text])
+    for i, name in enumerate(vectorizer.get_feature_names_out()):
+        weights[name] = float(X.toarray()[0][i])
+    for line in text.split('\n'):
+        clean_line = line.strip()
+        if 0 < len(clean_line) < 60:
+            for word in clean_line.lower().split():
+                if len(word) > 3:
+                    weights[word] = weights.get(word, 0.1) + 0.2
+    max_val = max(weights.values())
+    return {k: min(v / max_val, 1.0) for k, v in weights.items()}
+
+
+def refit_weights(text):
+    """A real corpus without an index: refit TF-IDF over every stored session."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from server.utils.database import SessionLocal, StudySession, ContentBlob
+    from server.utils.compression import unpack_text
+    db = SessionLocal()
+    corpus = [unpack_text(row.data) for row in db.query(ContentBlob.data).join(StudySession, StudySession.content_hash == ContentBlob.hash)]
+    db.close()
+    vectorizer = TfidfVectorizer(stop_words='english')
+    vectorizer.fit(corpus + [text])
+    return vectorizer.transform([text])
+
+
+def seed(sessions):
+    from server.utils.database import engine, init_db, insert_sessions
+
+    init_db()
+
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        for start in range(0, sessions, 5000):
+            insert_sessions(conn, [
+                {"topic": "Synthetic", "raw_content": synthetic_document(rng), "summary": {}, "concept_titles": "[]"}
+                for _ in range(start, min(start + 5000, sessions))
+            ])
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run_scale(sessions, repeat, refit_max):
+    from server.utils.database import rebuild_term_index, save_study_session
+    from server.utils.intelligence import calculate_exam_weights, get_term_index
+
+    seed(sessions)
+    started = time.perf_counter()
+    rebuild_term_index()
+    rebuild_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    get_term_index()
+    load_s = time.perf_counter() - started
+
+    document = synthetic_document(random.Random(99), words=3000)
+    result = {
+        "sessions": sessions,
+        "rebuild_s": round(rebuild_s, 2),
+        "index_load_s": round(load_s, 3),
+        "legacy": percentiles(timed(lambda: legacy_weights(document), repeat)),
+        "indexed": percentiles(timed(lambda: calculate_exam_weights(document), repeat)),
+    }
+    if sessions <= refit_max:
+        result["refit"] = percentiles(timed(lambda: refit_weights(document), max(1, min(repeat, 3))))
+    result["save_session"] = percentiles(timed(lambda: save_study_session("Bench", document, {"concepts": []}), repeat))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--refit-max", type=int, default=10000, help="largest corpus to time the per-request refit on")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scale(args.worker, args.repeat, args.refit_max)))
+        return
+
+    results = []
+    for scale in (int(s) for s in args.scales.split(",")):
+        # One process and one database per scale keeps the measurements independent
+        with tempfile.TemporaryDirectory() as workdir:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_weights", "--worker", str(scale),
+                 "--repeat", str(args.repeat), "--refit-max", str(args.refit_max)],
+                cwd=workdir, env={**os.environ, "PYTHONPATH": REPO_ROOT},
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
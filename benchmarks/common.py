@@ -0,0 +1,79 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import sys
+import socket
+import subprocess
+import time
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_http(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_process(args, env=None, cwd=None):
+    full_env = {**os.environ, "PYTHONPATH": REPO_ROOT, **(env or {})}
+    return subprocess.Popen([sys.executable, *args], env=full_env, cwd=cwd or REPO_ROOT)
+
+
+def start_stub(port, latency=0.5, extra_args=()):
+    """Starts benchmarks.stub_llm on `port` and waits until it accepts connections."""
+    proc = start_process(["-m", "benchmarks.stub_llm", "--port", str(port), "--latency", str(latency), *extra_args])
+    wait_for_http(f"http://127.0.0.1:{port}/docs")
+    return proc
+
+
+def start_app(port, workdir, env=None):
+    """Starts the Study Mate API with its database and caches inside `workdir`."""
+    proc = start_process(
+        ["-m", "uvicorn", "server.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        cwd=workdir,
+    )
+    wait_for_http(f"http://127.0.0.1:{port}/api/health")
+    return proc
+
+
+def stop(*procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def percentiles(samples):
+    """Summarizes latency samples (seconds) as milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
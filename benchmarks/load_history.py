@@ -0,0 +1,84 @@
+"""
+Load test: /history latency while /summarize calls are in flight.
+
+    python -m benchmarks.load_history --summaries 50 --latency 2
+
+Starts the stub LLM and the API in a temporary directory, measures /history
+on an idle server, then again while `--summaries` concurrent /summarize
+requests wait on the stub. With the blocking work moved off the event loop
+both distributions should be close.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import free_port, start_stub, start_app, stop, percentiles
+
+
+async def probe_history(client, base, stop_event, samples, interval=0.05):
+    while not stop_event.is_set():
+        started = time.perf_counter()
+        response = await client.get(f"{base}/history")
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def run(base, summaries, idle_seconds):
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=summaries + 10)) as client:
+        idle = []
+        stop_event = asyncio.Event()
+        prober = asyncio.create_task(probe_history(client, base, stop_event, idle))
+        await asyncio.sleep(idle_seconds)
+        stop_event.set()
+        await prober
+
+        loaded = []
+        stop_event = asyncio.Event()
+        prober = asyncio.create_task(probe_history(client, base, stop_event, loaded))
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post(f"{base}/summarize", json={"text": f"Lecture notes number {i}. " * 50, "bypassCache": True})
+            for i in range(summaries)
+        ])
+        summarize_wall = time.perf_counter() - started
+        stop_event.set()
+        await prober
+
+    return {
+        "summaries": summaries,
+        "summaries_ok": sum(1 for r in responses if r.status_code == 200),
+        "summarize_wall_s": round(summarize_wall, 2),
+        "history_idle": percentiles(idle),
+        "history_under_load": percentiles(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--summaries", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=2.0, help="stub LLM latency in seconds")
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    stub_port, app_port = free_port(), free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = start_stub(stub_port, latency=args.latency)
+        app = start_app(app_port, workdir, env={
+            "LLM_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+            "AI_MAX_CONCURRENCY": str(args.summaries),
+            "AI_MAX_CONNECTIONS": str(args.summaries),
+        })
+        try:
+            result = asyncio.run(run(f"http://127.0.0.1:{app_port}", args.summaries, args.idle_seconds))
+        finally:
+            stop(app, stub)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
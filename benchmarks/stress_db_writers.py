@@ -0,0 +1,96 @@
+"""
+Concurrency stress test: several processes writing sessions and quiz results.
+
+    python -m benchmarks.stress_db_writers --processes 8 --writes 200
+    python -m benchmarks.stress_db_writers --journal-mode DELETE   # pre-WAL behaviour
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.stress_db_writers
+
+Each process behaves like a uvicorn worker: it saves study sessions and quiz
+results through the normal helpers. The run reports throughput and any
+"database is locked" failures, then checks that the /stats aggregates agree
+with a full rebuild from the raw rows.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+
+def writer(worker_id, writes, results):
+    from server.utils.database import save_study_session, save_quiz_result
+
+    rng = random.Random(worker_id)
+    errors, latencies = [], []
+    session_ids = []
+    for i in range(writes):
+        started = time.perf_counter()
+        try:
+            if not session_ids or rng.random() < 0.3:
+                session_ids.append(save_study_session(
+                    f"Topic {rng.randint(0, 20)}", "Stress notes " * 50,
+                    {"topic": "Stress", "concepts": [{"title": f"C{i}", "content": "..."}]}
+                ))
+            else:
+                save_quiz_result(rng.choice(session_ids), rng.randint(0, 5), 5, rng.sample(["A", "B", "C", "D"], rng.randint(0, 2)))
+        except Exception as e:
+            errors.append(str(e).splitlines()[0])
+        latencies.append(time.perf_counter() - started)
+    results.put({"worker": worker_id, "errors": errors, "latencies": latencies})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200, help="writes per process")
+    parser.add_argument("--journal-mode", default="WAL", help="SQLite journal mode (WAL, DELETE...)")
+    args = parser.parse_args()
+
+    from benchmarks.common import percentiles
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'stress.db')}")
+        os.environ["SQLITE_JOURNAL_MODE"] = args.journal_mode
+        # Create the schema once before the writers start
+        from server.utils.database import init_db, SessionLocal, QuizResult, StudySession
+        from server.utils.analytics import get_performance_analytics, rebuild_analytics
+        init_db()
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        procs = [ctx.Process(target=writer, args=(i, args.writes, results)) for i in range(args.processes)]
+        started = time.perf_counter()
+        for proc in procs:
+            proc.start()
+        reports = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - started
+
+        incremental = get_performance_analytics()
+        rebuild_analytics()
+        rebuilt = get_performance_analytics()
+        db = SessionLocal()
+        sessions, quizzes = db.query(StudySession).count(), db.query(QuizResult).count()
+        db.close()
+
+    errors = [e for r in reports for e in r["errors"]]
+    print(json.dumps({
+        "database": os.environ["DATABASE_URL"].split(":")[0],
+        "journal_mode": args.journal_mode,
+        "processes": args.processes,
+        "writes": args.processes * args.writes,
+        "elapsed_s": round(elapsed, 2),
+        "writes_per_s": round(args.processes * args.writes / elapsed, 1),
+        "write_latency": percentiles([l for r in reports for l in r["latencies"]]),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "rows": {"study_sessions": sessions, "quiz_results": quizzes},
+        "aggregates_consistent": incremental == rebuilt,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
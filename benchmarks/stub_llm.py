@@ -0,0 +1,190 @@
+"""
+Local OpenAI-compatible stub used by the benchmarks.
+
+    python -m benchmarks.stub_llm --port 9100 --latency 0.5
+
+Only `POST /v1/chat/completions` is implemented. The reply mimics the JSON
+shapes Study Mate asks for (summary, MCQs or plain rephrasing) and waits
+`--latency` seconds before answering so concurrency can be measured.
+`--error-rate` makes that share of requests fail with one of `--error-status`
+(429 replies carry `Retry-After: --retry-after`) to exercise client retries,
+and `--slow-rate` of them wait `--slow-latency` instead (a latency tail);
+`--prefill-latency` adds that many seconds per 1000 prompt tokens (prompt
+processing time). `GET /stub/stats` counts the requests served (also per model), the errors
+injected and the (estimated) prompt and completion tokens.
+Streamed requests (`"stream": true`) receive the same reply as SSE chunks of
+`--chunk-chars` characters, `--chunk-delay` seconds apart; non-streamed
+requests wait for the same total generation time before replying.
+`--tokens-per-second` sets the chunk delay from a generation rate instead,
+and `--seed` makes injected errors and slow replies reproducible.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+LATENCY = 0.5
+CHUNK_CHARS = 16
+CHUNK_DELAY = 0.02
+ERROR_RATE = 0.0
+SLOW_RATE = 0.0
+SLOW_LATENCY = 5.0
+PREFILL_LATENCY = 0.0
+ERROR_STATUSES = (429, 503)
+RETRY_AFTER = 1.0
+
+STATS = Counter()
+
+app = FastAPI(title="Stub LLM")
+
+SUMMARY = {
+    "topic": "Stub Topic",
+    "language": "English",
+    "concepts": [
+        {"title": "First Principle", "content": "The first principle explained in detail."},
+        {"title": "Second Principle", "content": "The second principle builds on the first."},
+        {"title": "Applications", "content": "How both principles are applied in practice."}
+    ],
+    "dependencies": [["First Principle", "Second Principle"], ["Second Principle", "Applications"]],
+    "studySchedule": [
+        {"day": 1, "task": "Read the first principle", "goal": "Understand the basics"},
+        {"day": 2, "task": "Work through the second principle", "goal": "Connect the ideas"},
+        {"day": 3, "task": "Practice applications", "goal": "Exam readiness"}
+    ],
+    "definitions": {"Principle": "A fundamental truth"},
+    "formulas": ["A -> B"],
+    "tips": ["Review daily."],
+    "mnemonics": ["FSA: First, Second, Applications"],
+    "examFocus": ["Applications"]
+}
+
+MCQS = {
+    "mcqs": [
+        {"question": f"Stub question {i + 1}?", "options": ["A", "B", "C", "D"], "correct": i % 4}
+        for i in range(5)
+    ]
+}
+
+
+def reply_for(messages):
+    prompt = " ".join(m.get("content", "") for m in messages if isinstance(m.get("content"), str))
+    if "Multiple Choice" in prompt and "studySchedule" in prompt:
+        # Summary requested together with its MCQs
+        return json.dumps({**SUMMARY, **MCQS})
+    if "Multiple Choice" in prompt:
+        return json.dumps(MCQS)
+    if "JSON" in prompt:
+        return json.dumps(SUMMARY)
+    return "Stub rephrasing of the submitted text."
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    STATS["requests"] += 1
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        status = random.choice(ERROR_STATUSES)
+        STATS[f"errors_{status}"] += 1
+        headers = {"retry-after": str(RETRY_AFTER)} if status == 429 else {}
+        return JSONResponse({"error": {"message": "Injected stub error", "code": status}}, status_code=status, headers=headers)
+    STATS[f"model_{body.get('model', 'stub')}"] += 1
+    content = reply_for(body.get("messages", []))
+    usage = usage_for(body, content)
+    latency = SLOW_LATENCY if SLOW_RATE and random.random() < SLOW_RATE else LATENCY
+    await asyncio.sleep(latency + PREFILL_LATENCY * usage["prompt_tokens"] / 1000)
+    STATS["prompt_tokens"] += usage["prompt_tokens"]
+    STATS["completion_tokens"] += usage["completion_tokens"]
+    if body.get("stream"):
+        return StreamingResponse(stream_reply(body, content), media_type="text/event-stream")
+    await asyncio.sleep(CHUNK_DELAY * (len(content) // CHUNK_CHARS))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage
+    }
+
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return dict(STATS)
+
+
+def usage_for(body, content):
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    return {
+        "prompt_tokens": prompt_chars // 4,
+        "completion_tokens": len(content) // 4,
+        "total_tokens": prompt_chars // 4 + len(content) // 4
+    }
+
+
+async def stream_reply(body, content):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    for start in range(0, len(content), CHUNK_CHARS):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": {"content": content[start:start + CHUNK_CHARS]}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(CHUNK_DELAY)
+    final = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+    }
+    yield f"data: {json.dumps(final)}\n\n"
+    if (body.get("stream_options") or {}).get("include_usage"):
+        usage = {**final, "choices": [], "usage": usage_for(body, content)}
+        yield f"data: {json.dumps(usage)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def main():
+    global LATENCY, CHUNK_CHARS, CHUNK_DELAY, ERROR_RATE, ERROR_STATUSES, RETRY_AFTER, SLOW_RATE, SLOW_LATENCY, PREFILL_LATENCY
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds to wait before each reply")
+    parser.add_argument("--chunk-chars", type=int, default=CHUNK_CHARS, help="characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=CHUNK_DELAY, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE, help="share of requests that fail (0-1)")
+    parser.add_argument("--error-status", default=",".join(map(str, ERROR_STATUSES)), help="statuses of injected failures")
+    parser.add_argument("--retry-after", type=float, default=RETRY_AFTER, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--slow-rate", type=float, default=SLOW_RATE, help="share of requests answered after --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=SLOW_LATENCY, help="seconds to wait before a slow reply")
+    parser.add_argument("--prefill-latency", type=float, default=PREFILL_LATENCY, help="extra seconds per 1000 prompt tokens")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="generation rate (overrides --chunk-delay)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for error and slow-reply injection")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    LATENCY = args.latency
+    PREFILL_LATENCY = args.prefill_latency
+    SLOW_RATE = args.slow_rate
+    SLOW_LATENCY = args.slow_latency
+    ERROR_RATE = args.error_rate
+    ERROR_STATUSES = tuple(int(status) for status in args.error_status.split(","))
+    RETRY_AFTER = args.retry_after
+    CHUNK_CHARS = args.chunk_chars
+    # Replies are estimated at 4 characters per token, as in usage_for
+    CHUNK_DELAY = CHUNK_CHARS / 4 / args.tokens_per_second if args.tokens_per_second else args.chunk_delay
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
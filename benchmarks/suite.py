@@ -0,0 +1,380 @@
+"""
+End-to-end benchmark suite: the API under concurrent load against the stub LLM.
+
+    python -m benchmarks.suite --scale small --out before.json
+    python -m benchmarks.suite --scale medium --scenarios history,stats --concurrency 1,16,64
+    python -m benchmarks.suite --compare before.json after.json
+
+Each run works in a temporary directory:
+  1. synthetic lecture notes are written as PDF and DOCX files of the page
+     counts of `--scale`
+  2. the database is seeded with sessions and quiz results, and the search,
+     term and concept indexes and the /stats aggregates are rebuilt (as
+     after an import)
+  3. the stub LLM (`--latency`, `--tokens-per-second`, `--error-rate`, seeded)
+     and the API are started
+  4. every scenario sends its requests at each `--concurrency` level
+
+Scenarios: parse_pdf_<pages> and parse_docx_<pages> (POST /parse-file),
+summarize (POST /summarize, distinct notes, cache bypassed), mcq (POST
+/generate-mcqs from notes), history (GET /history first page, a cursor page
+and one session in turn) and stats (GET /stats).
+
+Reported per scenario and concurrency level: p50/p95/p99 latency,
+throughput, failed requests, LLM calls and the peak RSS of the API (the
+server process plus its PDF parsing workers, reset before each level).
+The JSON also records the commit, Python version and CPU count, so runs
+can be compared: --compare prints the relative change of latency and
+throughput from the first result to the second.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import REPO_ROOT, free_port, start_stub, start_app, stop, percentiles
+
+SCALES = {
+    "small": {"sessions": 1000, "quiz_results": 10000, "pdf_pages": [5, 50], "docx_pages": [5, 50],
+              "requests": 200, "llm_requests": 40, "parse_requests": 16},
+    "medium": {"sessions": 20000, "quiz_results": 200000, "pdf_pages": [5, 50, 300], "docx_pages": [5, 100],
+               "requests": 500, "llm_requests": 100, "parse_requests": 32},
+    "large": {"sessions": 100000, "quiz_results": 1000000, "pdf_pages": [5, 50, 300, 1000], "docx_pages": [5, 100, 500],
+              "requests": 1000, "llm_requests": 200, "parse_requests": 64},
+}
+
+SCENARIOS = ("parse", "summarize", "mcq", "history", "stats")
+
+WORDS = (
+    "cell membrane protein enzyme energy glucose mitochondria nucleus gene protein synthesis transcription "
+    "translation ribosome receptor signal pathway equilibrium gradient diffusion osmosis transport channel "
+    "molecule bond reaction catalyst substrate inhibitor regulation feedback hormone neuron synapse potential "
+    "photosynthesis chlorophyll respiration oxidation reduction electron carbon cycle nitrogen ecosystem "
+    "population evolution selection mutation allele inheritance chromosome replication division tissue organ"
+).split()
+
+
+def sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(8, 20))
+    return " ".join(words).capitalize() + "."
+
+
+def note_pages(rng, pages, paragraphs=4):
+    """Lecture notes as pages of lines: a heading, then paragraphs of random sentences."""
+    result = []
+    for number in range(pages):
+        lines = [f"{number + 1}. {rng.choice(WORDS).title()} and {rng.choice(WORDS).title()}"]
+        lines += [" ".join(sentence(rng) for _ in range(rng.randint(3, 5))) for _ in range(paragraphs)]
+        result.append(lines)
+    return result
+
+
+def make_pdf(path, pages, rng):
+    import fitz
+    doc = fitz.open()
+    for lines in note_pages(rng, pages):
+        doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), "\n\n".join(lines), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def make_docx(path, pages, rng):
+    from docx import Document
+    doc = Document()
+    for heading, *paragraphs in note_pages(rng, pages):
+        doc.add_heading(heading, level=2)
+        for paragraph in paragraphs:
+            doc.add_paragraph(paragraph)
+    doc.save(path)
+
+
+def seed(sessions, quiz_results, rng):
+    """Seeds the database of the current directory, then rebuilds what an import would need."""
+    from server.utils.database import (engine, init_db, insert_sessions, QuizResult, QuizWeakTopic,
+                                       rebuild_term_index, rebuild_search_index, rebuild_concept_graph)
+    from server.utils.analytics import rebuild_analytics
+
+    init_db()
+    start = datetime.datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        for first in range(0, sessions, 2000):
+            batch = []
+            for i in range(first, min(sessions, first + 2000)):
+                titles = rng.sample(WORDS, 4)
+                batch.append({
+                    "topic": f"Topic {i % 200}",
+                    "raw_content": "\n".join(line for page in note_pages(rng, 2, paragraphs=2) for line in page),
+                    "summary": {
+                        "topic": f"Topic {i % 200}",
+                        "concepts": [{"title": title.title(), "content": sentence(rng)} for title in titles],
+                        "dependencies": [[titles[0].title(), titles[1].title()], [titles[1].title(), titles[2].title()]],
+                    },
+                    "created_at": start + datetime.timedelta(minutes=i * 7),
+                })
+            insert_sessions(conn, batch)
+        for first in range(0, quiz_results, 20000):
+            results, weak = [], []
+            for quiz_id in range(first + 1, min(quiz_results, first + 20000) + 1):
+                session_id, topics = rng.randint(1, sessions), rng.sample(WORDS, rng.randint(0, 2))
+                created_at = start + datetime.timedelta(minutes=quiz_id)
+                results.append({"id": quiz_id, "session_id": session_id, "score": rng.randint(0, 5), "total": 5,
+                                "weak_topics": ",".join(topics), "created_at": created_at})
+                weak += [{"quiz_result_id": quiz_id, "session_id": session_id, "topic": topic, "created_at": created_at}
+                         for topic in topics]
+            conn.execute(QuizResult.__table__.insert(), results)
+            if weak:
+                conn.execute(QuizWeakTopic.__table__.insert(), weak)
+    rebuild_term_index()
+    rebuild_search_index()
+    rebuild_concept_graph()
+    rebuild_analytics()
+    engine.dispose()
+
+
+def process_tree(pid):
+    """pid and all of its descendants (the parsing pool's workers)."""
+    pids, index = [pid], 0
+    while index < len(pids):
+        try:
+            for task in os.listdir(f"/proc/{pids[index]}/task"):
+                with open(f"/proc/{pids[index]}/task/{task}/children") as children:
+                    pids += [int(child) for child in children.read().split()]
+        except OSError:
+            pass
+        index += 1
+    return pids
+
+
+def reset_peak_rss(pid):
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/clear_refs", "w") as clear_refs:
+                clear_refs.write("5")
+        except OSError:
+            pass
+
+
+def peak_rss_mb(pid):
+    """Sum of the peak RSS (VmHWM) of the process tree since the last reset, None off Linux."""
+    total = None
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/status") as status:
+                kib = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+            total = (total or 0) + kib
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1) if total is not None else None
+
+
+async def run_level(client, send, count, concurrency):
+    """Sends `count` requests with `concurrency` in flight; returns latency and throughput."""
+    samples, failed = [], 0
+    pending = iter(range(count))
+
+    async def worker():
+        nonlocal failed
+        for index in pending:
+            started = time.perf_counter()
+            try:
+                response = await send(client, index)
+                failed += response.status_code >= 400
+            except httpx.HTTPError:
+                failed += 1
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - started
+    return {**percentiles(samples), "throughput_rps": round(count / wall, 2), "failed": failed}
+
+
+def build_scenarios(args, config, files, rng):
+    """Name -> (request count, send(client, index)) for the selected scenarios."""
+    scenarios = {}
+
+    def upload(path, content_type):
+        with open(path, "rb") as f:
+            content = f.read()
+        name = os.path.basename(path)
+        return lambda client, index: client.post("/parse-file", files={"file": (name, content, content_type)})
+
+    if "parse" in args.scenarios:
+        for path, pages in files["pdf"]:
+            scenarios[f"parse_pdf_{pages}"] = (config["parse_requests"], upload(path, "application/pdf"))
+        for path, pages in files["docx"]:
+            docx_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+            scenarios[f"parse_docx_{pages}"] = (config["parse_requests"], upload(path, docx_type))
+
+    # Every LLM request gets notes of its own, so neither cache can answer it
+    body = "\n".join(line for page in note_pages(rng, args.notes_pages) for line in page)
+    numbers = itertools.count()
+    if "summarize" in args.scenarios:
+        scenarios["summarize"] = (config["llm_requests"], lambda client, index: client.post(
+            "/summarize", json={"text": f"Lecture {next(numbers)}\n{body}", "bypassCache": True}))
+    if "mcq" in args.scenarios:
+        scenarios["mcq"] = (config["llm_requests"], lambda client, index: client.post(
+            "/generate-mcqs", json={"text": f"Quiz notes {next(numbers)}\n{body}", "difficulty": "medium",
+                                    "bypassCache": True}))
+    if "history" in args.scenarios:
+        ids = [rng.randint(1, config["sessions"]) for _ in range(config["requests"])]
+        cursor = {}
+
+        async def history(client, index):
+            if index % 3 == 0:
+                response = await client.get("/history", params={"limit": 20})
+                cursor.setdefault("next", response.json().get("nextCursor"))
+                return response
+            if index % 3 == 1 and cursor.get("next"):
+                return await client.get("/history", params={"limit": 20, "cursor": cursor["next"]})
+            return await client.get(f"/history/{ids[index % len(ids)]}")
+
+        scenarios["history"] = (config["requests"], history)
+    if "stats" in args.scenarios:
+        scenarios["stats"] = (config["requests"], lambda client, index: client.get("/stats"))
+    return scenarios
+
+
+async def run_scenarios(base, stub, app_pid, scenarios, levels):
+    results = {}
+    limits = httpx.Limits(max_connections=max(levels) + 10)
+    async with httpx.AsyncClient(base_url=base, timeout=600, limits=limits) as client:
+        for name, (count, send) in scenarios.items():
+            results[name] = {}
+            for concurrency in levels:
+                # Warm up (imports on first use, connection pools) outside the measurement
+                await send(client, -1)
+                before = (await client.get(f"{stub}/stub/stats")).json()
+                reset_peak_rss(app_pid)
+                level = await run_level(client, send, max(count, concurrency), concurrency)
+                after = (await client.get(f"{stub}/stub/stats")).json()
+                level["llm_calls"] = after.get("requests", 0) - before.get("requests", 0)
+                level["peak_rss_mb"] = peak_rss_mb(app_pid)
+                results[name][str(concurrency)] = level
+                print(f"{name} x{concurrency}: p50 {level['p50_ms']} ms, p99 {level['p99_ms']} ms, "
+                      f"{level['throughput_rps']} req/s", file=sys.stderr)
+    return results
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def compare(old_path, new_path):
+    """Relative change (%) of latency and throughput for every scenario and level found in both results."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    changes = {}
+    for name, levels in new["scenarios"].items():
+        for concurrency, after in levels.items():
+            before = old["scenarios"].get(name, {}).get(concurrency)
+            if not before:
+                continue
+            changes.setdefault(name, {})[concurrency] = {
+                key: {"before": before[key], "after": after[key],
+                      "change_pct": round((after[key] - before[key]) / before[key] * 100, 1) if before[key] else None}
+                for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "peak_rss_mb")
+                if before.get(key) is not None and after.get(key) is not None
+            }
+    print(json.dumps({"before": old["meta"]["revision"], "after": new["meta"]["revision"], "changes": changes}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--sessions", type=int, help="seeded sessions (overrides the scale)")
+    parser.add_argument("--quiz-results", type=int, help="seeded quiz results (overrides the scale)")
+    parser.add_argument("--requests", type=int, help="requests per level for history/stats (overrides the scale)")
+    parser.add_argument("--notes-pages", type=int, default=4, help="pages of notes per summarize/mcq request")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds before each reply")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="stub generation rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub replies that fail with 429/503")
+    parser.add_argument("--seed", type=int, default=22)
+    parser.add_argument("--out", help="also write the JSON result to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+    config = dict(SCALES[args.scale])
+    for key in ("sessions", "quiz_results", "requests"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    rng = random.Random(args.seed)
+    meta = {
+        "revision": git_revision(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+        "config": config,
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        files = {"pdf": [], "docx": []}
+        for kind, make in (("pdf", make_pdf), ("docx", make_docx)):
+            for pages in config[f"{kind}_pages"]:
+                path = os.path.join(workdir, f"notes_{pages}.{kind}")
+                make(path, pages, rng)
+                files[kind].append((path, pages))
+
+        started = time.perf_counter()
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            seed(config["sessions"], config["quiz_results"], rng)
+        finally:
+            os.chdir(cwd)
+        meta["seed_s"] = round(time.perf_counter() - started, 1)
+
+        stub_port, app_port = free_port(), free_port()
+        stub_args = ["--tokens-per-second", str(args.tokens_per_second), "--error-rate", str(args.error_rate),
+                     "--seed", str(args.seed)]
+        stub = start_stub(stub_port, latency=args.latency, extra_args=stub_args)
+        # Near-duplicate reuse is off so every summarize/mcq request reaches the stub
+        app = start_app(app_port, workdir, env={"LLM_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+                                                "NEAR_DUPLICATES": "off", "LOG_LEVEL": "WARNING"})
+        try:
+            scenarios = build_scenarios(args, config, files, rng)
+            results = asyncio.run(run_scenarios(f"http://127.0.0.1:{app_port}", f"http://127.0.0.1:{stub_port}",
+                                                app.pid, scenarios, levels))
+        finally:
+            stop(app, stub)
+
+    output = json.dumps({"meta": meta, "scenarios": results}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+gunicorn settings for running several API workers on one host:
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py server.main:app
+
+The app is imported once in the master, which also creates or migrates the
+schema and loads the heavy modules (see server.main.preload_modules). Workers
+are forked from it, so they share that memory copy-on-write and start
+without importing or migrating anything.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    from server.main import preload_modules
+    from server.utils.database import init_db, engine
+
+    init_db()
+    preload_modules()
+    # Connections must not be shared with the forked workers
+    engine.dispose()
@@ -1,15 +1,63 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 import uvicorn
 import os
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from sqlalchemy.orm import Session
 
 # Load .env file
 load_dotenv()
 
-app = FastAPI(title="Study Mate API")
+from server.utils.logging_config import configure_logging
+from server.utils.metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+
+configure_logging()
+logger = logging.getLogger("server.main")
+
+# Import scikit-learn, PyMuPDF, python-docx, scipy and openai at startup
+# instead of on first use (see preload_modules)
+PRELOAD_MODULES = os.getenv("PRELOAD_MODULES", "off").lower() not in ("0", "off", "false", "no")
+
+def preload_modules():
+    """
+    Loads the modules that are otherwise imported by the first request that
+    needs them. gunicorn.conf.py calls this in the master process, so forked
+    workers share the loaded code copy-on-write.
+    """
+    started = time.perf_counter()
+    import fitz  # noqa: F401
+    import docx  # noqa: F401
+    import openai  # noqa: F401
+    from scipy import sparse  # noqa: F401
+    get_hashers()
+    logger.info("Preloaded modules in %.2fs", time.perf_counter() - started)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Tables and migrations are set up here rather than when the module is imported
+    await run_blocking(init_db)
+    if PRELOAD_MODULES:
+        await run_blocking(preload_modules)
+    # The frontend build is held in memory, so serving it needs no file system access
+    if frontend_available():
+        await run_blocking(load_frontend)
+    # Batch workers resume items left unfinished by a previous run
+    start_batch_workers()
+    yield
+    await stop_batch_workers()
+    # Release pooled LLM connections and the blocking-work/parsing pools
+    await close_async_client()
+    shutdown_executor()
+    shutdown_parse_pool()
+
+app = FastAPI(title="Study Mate API", lifespan=lifespan)
 
 # Enable CORS for React frontend (useful during development on separate ports)
 app.add_middleware(
@@ -18,113 +66,569 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-from server.utils.file_parser import extract_text_from_pdf, extract_text_from_docx, clean_text
-from server.utils.ai_engine import generate_exam_summary, generate_study_questions
-from server.utils.database import save_study_session, save_quiz_result, get_study_history, clear_study_history
-from server.utils.analytics import get_performance_analytics
+# Per-route latency histograms and optional Server-Timing headers
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+from server.utils.file_parser import spool_upload, extract_text_from_path, iter_pages, next_page, clean_text, split_page_breaks, join_page_breaks
+from server.utils.file_parser import FileLimitError, shutdown_parse_pool
+from server.utils.ai_engine import generate_study_questions_async, rephrase_text_async, close_async_client
+from server.utils.ai_engine import summarize_document_async, stream_document_summary, stream_study_questions, SUMMARY_PARALLELISM
+from server.utils.ai_engine import summary_events, session_mcqs_async
+from server.utils.llm_router import providers_state
+from server.utils.database import init_db, get_db, save_study_session, save_quiz_result, get_study_history, get_study_session, clear_study_history
+from server.utils.fingerprint import find_reusable_summary
+from server.utils.intelligence import get_hashers
+from server.utils.analytics import get_performance_analytics, get_top_weak_topics, get_session_weak_topics, get_topic_trend
+from server.utils.search import search_sessions
+from server.utils.review import record_answers, due_cards
+from server.utils.concept_graph import graph_overview, graph_layout, learning_path, graph_cycles
+from server.utils.jobs import create_job, get_job, cancel_job, start_batch_workers, stop_batch_workers, notify_workers
+from server.utils.jobs import BATCH_TASKS, BATCH_MAX_ITEMS, BATCH_UPLOAD_DIR
+from server.utils.cache import get_cache
+from server.utils.chunker import DEFAULT_CHUNK_TOKENS
+from server.utils.condenser import condense_notes
+from server.utils.executor import run_blocking, shutdown_executor
+from server.utils.static_assets import frontend_available, load_frontend, get_asset, choose_encoding, asset_variant, build_response
 
 @app.get("/api/health")
 async def root():
     return {"status": "online", "message": "Study Mate AI Engine Running"}
 
+@app.get("/metrics")
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache")
+async def cache_stats():
+    return await run_blocking(lambda: get_cache().stats())
+
+@app.get("/api/llm")
+async def llm_providers():
+    """Routing state of each LLM provider: circuit, recent error rate and p95 latencies."""
+    return {"providers": providers_state()}
+
+@app.delete("/api/cache")
+async def clear_cache():
+    await run_blocking(lambda: get_cache().clear())
+    return {"status": "cleared"}
+
 @app.get("/history")
-async def history():
-    return get_study_history()
+async def history(limit: int = Query(20, ge=1, le=100), cursor: str = None, db: Session = Depends(get_db)):
+    try:
+        return await run_blocking(get_study_history, limit, cursor, db=db)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+
+@app.get("/history/{session_id}")
+async def history_session(session_id: int, db: Session = Depends(get_db)):
+    session = await run_blocking(get_study_session, session_id, db=db)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Study session not found")
+    return session
 
 @app.delete("/history")
-async def clear_history_endpoint():
-    clear_study_history()
+async def clear_history_endpoint(db: Session = Depends(get_db)):
+    await run_blocking(clear_study_history, db=db)
     return {"status": "cleared"}
 
 @app.get("/stats")
-async def stats():
-    return get_performance_analytics()
+async def stats(db: Session = Depends(get_db)):
+    return await run_blocking(get_performance_analytics, db=db)
+
+@app.get("/search")
+async def search(q: str = Query(..., min_length=1, max_length=200), mode: str = Query("hybrid", pattern="^(keyword|semantic|hybrid)$"),
+                 limit: int = Query(10, ge=1, le=50), offset: int = Query(0, ge=0, le=1000), db: Session = Depends(get_db)):
+    return await run_blocking(search_sessions, q, mode, limit, offset, db=db)
+
+def _naive_utc(value):
+    # Timestamps are stored as naive UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@app.get("/graph")
+async def graph():
+    return await run_blocking(graph_overview)
+
+@app.get("/graph/layout")
+async def graph_layout_endpoint(concept: str = None):
+    layout = await run_blocking(graph_layout, concept)
+    if layout is None:
+        raise HTTPException(status_code=404, detail="Concept not found")
+    # The full layout is served as the cached, already encoded JSON
+    return Response(layout, media_type="application/json") if isinstance(layout, bytes) else layout
+
+@app.get("/graph/path")
+async def graph_path(concept: str = Query(..., min_length=1)):
+    path = await run_blocking(learning_path, concept)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Concept not found")
+    return path
+
+@app.get("/graph/cycles")
+async def graph_cycles_endpoint(limit: int = Query(50, ge=1, le=1000)):
+    return await run_blocking(graph_cycles, limit)
+
+@app.get("/weak-topics")
+async def weak_topics(since: datetime = None, until: datetime = None, limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    return await run_blocking(get_top_weak_topics, _naive_utc(since), _naive_utc(until), limit, db=db)
+
+@app.get("/weak-topics/trend")
+async def weak_topic_trend(topic: str, since: datetime = None, until: datetime = None, bucket: str = Query("day", pattern="^(day|week|month)$"), db: Session = Depends(get_db)):
+    return await run_blocking(get_topic_trend, topic, _naive_utc(since), _naive_utc(until), bucket, db=db)
+
+@app.get("/history/{session_id}/weak-topics")
+async def session_weak_topics(session_id: int, db: Session = Depends(get_db)):
+    return await run_blocking(get_session_weak_topics, session_id, db=db)
 
 @app.post("/parse-file")
-async def parse_file(file: UploadFile = File(...)):
+async def parse_file(file: UploadFile = File(...), stream: bool = False):
     name = file.filename.lower()
-    content = await file.read()
     
     if name.endswith(".pdf"):
-        text = extract_text_from_pdf(content)
+        kind = "pdf"
     elif name.endswith(".docx"):
-        text = extract_text_from_docx(content)
+        kind = "docx"
     else:
         raise HTTPException(status_code=400, detail="Unsupported file format. Please upload PDF or DOCX.")
+
+    try:
+        path = await spool_upload(file, suffix=f".{kind}")
+    except FileLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    if stream:
+        return await _stream_parsed_pages(path, kind)
+
+    try:
+        text = await run_blocking(extract_text_from_path, path, kind)
+    except FileLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        os.unlink(path)
     
-    return {"text": clean_text(text)}
+    # The page breaks kept for the chunker are not shown to the user; pageStarts keeps the boundaries
+    text, page_starts = split_page_breaks(await run_blocking(clean_text, text))
+    return {"text": text, "pageStarts": page_starts}
 
-@app.post("/summarize")
-async def summarize(payload: dict):
+async def _stream_parsed_pages(path, kind):
+    """Streams cleaned page text as SSE `page` events while extraction continues."""
+    pages = iter_pages(path, kind)
+    try:
+        # Pull the first page up front so limit errors can still become a 413
+        first = await run_blocking(next_page, pages)
+    except FileLimitError as e:
+        os.unlink(path)
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception:
+        os.unlink(path)
+        raise HTTPException(status_code=422, detail=f"Could not parse {kind.upper()} file.")
+
+    async def events():
+        count = 0
+        page = first
+        pending = None
+        try:
+            while page is not None:
+                count += 1
+                yield _sse("page", {"page": count, "text": clean_text(page)})
+                pending = asyncio.ensure_future(run_blocking(next_page, pages))
+                # Shielded: on a client disconnect the thread keeps running and is waited for below
+                page = await asyncio.shield(pending)
+            yield _sse("done", {"pages": count})
+        except Exception as e:
+            logger.warning("Error parsing %s: %s", kind.upper(), e)
+            yield _sse("error", f"Could not parse page {count + 1}.")
+        finally:
+            # Closing the generator while next_page runs in a thread would fail
+            # and leave its pool futures behind
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+                if not pending.cancelled():
+                    pending.exception()
+            pages.close()
+            os.unlink(path)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _sse(event, data):
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Bounds for the per-request chunking options; larger values are clamped
+MIN_CHUNK_TOKENS = 500
+MAX_CHUNK_TOKENS = 32000
+MAX_SUMMARY_PARALLELISM = 16
+
+def _summary_options(payload):
+    return {
+        "length": payload.get("length", 50),
+        "exam_mode": payload.get("examMode", True),
+        "explain_simply": payload.get("explainSimply", False),
+        "language": payload.get("language", "English"),
+        "use_cache": not payload.get("bypassCache", False),
+        "chunk_tokens": max(MIN_CHUNK_TOKENS, _int_option(payload, "chunkTokens", DEFAULT_CHUNK_TOKENS, maximum=MAX_CHUNK_TOKENS)),
+        "parallelism": _int_option(payload, "parallelism", SUMMARY_PARALLELISM, maximum=MAX_SUMMARY_PARALLELISM),
+    }
+
+def _int_option(payload, name, default, minimum=1, maximum=None):
+    """An integer request option within [minimum, maximum] (clamped above), or 400."""
+    value = payload.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer")
+    if value < minimum:
+        raise HTTPException(status_code=400, detail=f"{name} must be at least {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+def _notes_text(payload):
+    """
+    The request's notes. Text from /parse-file comes without its page breaks;
+    "pageStarts" (as returned there) puts them back for the chunker and condenser.
+    """
     text = payload.get("text", "")
-    length = payload.get("length", 50)
-    exam_mode = payload.get("examMode", True)
-    explain_simply = payload.get("explainSimply", False)
+    starts = payload.get("pageStarts")
+    if not starts or not text:
+        return text
+    if not isinstance(starts, list) or not all(isinstance(start, int) and not isinstance(start, bool) for start in starts) \
+            or starts != sorted(starts) or starts[0] < 0 or starts[-1] > len(text):
+        raise HTTPException(status_code=400, detail="pageStarts must be ascending offsets into text")
+    return join_page_breaks(text, starts)
+
+def _prompt_options(payload):
+    """
+    The request's (compress, tokenBudget) pair: "compress" turns
+    pre-compression on or off, "tokenBudget" sets its budget.
+    """
+    return payload.get("compress"), _int_option(payload, "tokenBudget", None)
+
+async def _prompt_notes(text, prompt):
+    """The notes as sent to the LLM and their token report."""
+    return await run_blocking(condense_notes, text, *prompt)
+
+def _mcq_difficulty(payload):
+    """The quiz difficulty when MCQs are requested together with the summary, else None."""
+    return payload.get("difficulty", "medium") if payload.get("includeMcqs") else None
+
+async def _persist_summary(text, topic, result, db=None, fingerprint=None, difficulty=None):
+    # Persist session - Use AI-detected topic if available, otherwise fallback to request topic
+    final_topic = result.get("topic", topic)
+    # MCQs generated with the summary are stored as the session's quiz for that difficulty
+    summary = {key: value for key, value in result.items() if key != "mcqs"}
+    quiz = (difficulty, result["mcqs"]) if difficulty and result.get("mcqs") else None
+    return await run_blocking(save_study_session, final_topic, text, summary, db=db, fingerprint=fingerprint, quiz=quiz)
+
+async def _with_session_mcqs(summary, near_duplicate, difficulty, use_cache, db=None):
+    """Adds the MCQs of the session a reused summary came from (stored or generated from its summary)."""
+    if not difficulty:
+        return summary
+    try:
+        mcqs, _ = await session_mcqs_async(near_duplicate["sessionId"], difficulty, use_cache, summary=summary, db=db)
+    except Exception as e:
+        logger.warning("Could not generate MCQs for a reused summary: %s", e)
+        mcqs = []
+    return {**summary, "mcqs": mcqs}
+
+async def _reused_summary_events(summary):
+    for event in summary_events(summary):
+        yield event
+    yield "summary", summary
+
+@app.post("/summarize")
+async def summarize(payload: dict, db: Session = Depends(get_db)):
+    text = _notes_text(payload)
     topic = payload.get("topic", "Extracted Material")
-    language = payload.get("language", "English")
     
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
         
-    result = generate_exam_summary(text, length, exam_mode, explain_simply, language)
+    options = _summary_options(payload)
+    prompt = _prompt_options(payload)
+    difficulty = _mcq_difficulty(payload)
+    result, fingerprint, near_duplicate = await run_blocking(find_reusable_summary, text, options, prompt, db=db)
+    prompt_tokens = None
+    if result is not None:
+        result = await _with_session_mcqs(result, near_duplicate, difficulty, options["use_cache"], db=db)
+    else:
+        notes, prompt_tokens = await _prompt_notes(text, prompt)
+        result = await summarize_document_async(notes, **options, difficulty=difficulty)
     if not result:
         raise HTTPException(status_code=500, detail="AI processing failed")
     
-    # Persist session - Use AI-detected topic if available, otherwise fallback to request topic
-    final_topic = result.get("topic", topic)
-    save_study_session(final_topic, text, result)
+    # The session keeps the full notes, whatever was sent to the model
+    session_id = await _persist_summary(text, topic, result, db=db, fingerprint=fingerprint, difficulty=difficulty)
     
-    return result
+    response = {**result, "sessionId": session_id}
+    if near_duplicate is not None:
+        response["nearDuplicate"] = near_duplicate
+    if prompt_tokens is not None:
+        response["promptTokens"] = prompt_tokens
+    return response
+
+@app.post("/summarize/stream")
+async def summarize_stream(payload: dict):
+    """Same as /summarize, but streams each concept and schedule day (and MCQ) as an SSE event."""
+    text = _notes_text(payload)
+    topic = payload.get("topic", "Extracted Material")
+    if not text:
+        raise HTTPException(status_code=400, detail="No text provided")
+    # Validated before the stream starts, so bad options still get a 400
+    options = _summary_options(payload)
+    prompt = _prompt_options(payload)
+
+    async def events():
+        started = time.perf_counter()
+        first_concept = None
+        session_id = None
+        difficulty = _mcq_difficulty(payload)
+        prompt_tokens = None
+        reused, fingerprint, near_duplicate = await run_blocking(find_reusable_summary, text, options, prompt)
+        if reused is not None:
+            stream = _reused_summary_events(await _with_session_mcqs(reused, near_duplicate, difficulty, options["use_cache"]))
+        else:
+            notes, prompt_tokens = await _prompt_notes(text, prompt)
+            stream = stream_document_summary(notes, **options, difficulty=difficulty)
+        async for event, data in stream:
+            if event == "concept" and first_concept is None:
+                first_concept = time.perf_counter() - started
+            if event == "summary":
+                session_id = await _persist_summary(text, topic, data, fingerprint=fingerprint, difficulty=difficulty)
+            yield _sse(event, data)
+        done = {
+            "sessionId": session_id,
+            "timeToFirstConceptMs": round(first_concept * 1000, 1) if first_concept is not None else None,
+            "totalMs": round((time.perf_counter() - started) * 1000, 1),
+        }
+        if near_duplicate is not None:
+            done["nearDuplicate"] = near_duplicate
+        if prompt_tokens is not None:
+            done["promptTokens"] = prompt_tokens
+        yield _sse("done", done)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _batch_tasks(tasks):
+    tasks = [task.strip() for task in tasks if task.strip()]
+    if not tasks or any(task not in BATCH_TASKS for task in tasks):
+        raise HTTPException(status_code=400, detail=f"tasks must be a subset of {', '.join(BATCH_TASKS)}")
+    return tasks
+
+def _check_batch_size(count):
+    if not count:
+        raise HTTPException(status_code=400, detail="No items provided")
+    if count > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A job holds at most {BATCH_MAX_ITEMS} items")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(payload: dict, db: Session = Depends(get_db)):
+    """Queues summaries and/or MCQs for many texts: {"items": [{"name", "text"}], "tasks": [...], ...}."""
+    items = payload.get("items") or []
+    _check_batch_size(len(items))
+    if any(not isinstance(item, dict) or not item.get("text") for item in items):
+        raise HTTPException(status_code=400, detail="Every item needs a text")
+    tasks = _batch_tasks(payload.get("tasks") or BATCH_TASKS)
+    job_id = await run_blocking(
+        create_job,
+        [{"name": item.get("name") or f"Item {i + 1}", "kind": "text", "text": item["text"]} for i, item in enumerate(items)],
+        _summary_options(payload), tasks, payload.get("difficulty", "medium"), db=db
+    )
+    notify_workers()
+    return await run_blocking(get_job, job_id, False, db=db)
+
+@app.post("/jobs/files", status_code=202)
+async def submit_file_job(files: list[UploadFile] = File(...), tasks: str = Form(",".join(BATCH_TASKS)),
+                          difficulty: str = Form("medium"), language: str = Form("English"), length: int = Form(50),
+                          examMode: bool = Form(True), explainSimply: bool = Form(False), db: Session = Depends(get_db)):
+    """Same as /jobs for PDF/DOCX uploads; files are parsed by the workers."""
+    _check_batch_size(len(files))
+    tasks = _batch_tasks(tasks.split(","))
+    kinds = [os.path.splitext(file.filename.lower())[1].lstrip(".") for file in files]
+    if any(kind not in ("pdf", "docx") for kind in kinds):
+        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload PDF or DOCX.")
+
+    os.makedirs(BATCH_UPLOAD_DIR, exist_ok=True)
+    items = []
+    try:
+        for file, kind in zip(files, kinds):
+            path = await spool_upload(file, suffix=f".{kind}", directory=BATCH_UPLOAD_DIR)
+            items.append({"name": file.filename, "kind": kind, "source_path": path})
+    except FileLimitError as e:
+        for item in items:
+            os.unlink(item["source_path"])
+        raise HTTPException(status_code=413, detail=f"{file.filename}: {e}")
+
+    options = _summary_options({"language": language, "length": length, "examMode": examMode, "explainSimply": explainSimply})
+    job_id = await run_blocking(create_job, items, options, tasks, difficulty, db=db)
+    notify_workers()
+    return await run_blocking(get_job, job_id, False, db=db)
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: int, db: Session = Depends(get_db)):
+    job = await run_blocking(get_job, job_id, db=db)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job_endpoint(job_id: int, db: Session = Depends(get_db)):
+    if not await run_blocking(cancel_job, job_id, db=db):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await run_blocking(get_job, job_id, False, db=db)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: int, interval: float = Query(1.0, ge=0.2, le=30)):
+    """Streams an `item` event whenever an item changes state, then `done` with the final job."""
+    job = await run_blocking(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        nonlocal job
+        seen = {}
+        while True:
+            for item in job["items"]:
+                state = (item["status"], item["attempts"])
+                if seen.get(item["id"]) != state:
+                    seen[item["id"]] = state
+                    yield _sse("item", item)
+            if job["status"] != "running":
+                yield _sse("done", {key: value for key, value in job.items() if key != "items"})
+                return
+            await asyncio.sleep(interval)
+            job = await run_blocking(get_job, job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.post("/rephrase")
 async def rephrase(payload: dict):
     text = payload.get("text", "")
     style = payload.get("style", "Academic")
+    use_cache = not payload.get("bypassCache", False)
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
     
-    from server.utils.ai_engine import rephrase_text
-    rephrased = rephrase_text(text, style)
+    rephrased = await rephrase_text_async(text, style, use_cache=use_cache)
     return {"rephrased": rephrased}
 
 @app.post("/save-quiz")
-async def save_quiz(payload: dict):
-    session_id = payload.get("session_id")
-    score = payload.get("score")
-    total = payload.get("total")
+async def save_quiz(payload: dict, db: Session = Depends(get_db)):
+    # Results without a session would be counted against whichever session has the id
+    session_id = _int_option(payload, "session_id", None)
+    if session_id is None:
+        raise HTTPException(status_code=400, detail="session_id is required")
+    score = _int_option(payload, "score", None, minimum=0)
+    total = _int_option(payload, "total", None)
+    if score is None or total is None:
+        raise HTTPException(status_code=400, detail="score and total are required")
+    if score > total:
+        raise HTTPException(status_code=400, detail="score must not exceed total")
     weak_topics = payload.get("weak_topics", [])
-    save_quiz_result(session_id, score, total, weak_topics)
-    return {"status": "saved"}
+    await run_blocking(save_quiz_result, session_id, score, total, weak_topics, db=db)
+    # Optional per-question answers reschedule the questions' review cards
+    answers = payload.get("answers") or []
+    reviewed = await run_blocking(record_answers, session_id, answers, db=db) if answers else 0
+    return {"status": "saved", "reviewed": reviewed}
+
+@app.get("/review/due")
+async def review_due(limit: int = Query(20, ge=1, le=200), sessionId: int = None, db: Session = Depends(get_db)):
+    return await run_blocking(due_cards, limit, sessionId, db=db)
+
+@app.post("/review/answers")
+async def review_answers(payload: dict, db: Session = Depends(get_db)):
+    answers = payload.get("answers")
+    if not isinstance(answers, list) or not answers:
+        raise HTTPException(status_code=400, detail="No answers provided")
+    reviewed = await run_blocking(record_answers, payload.get("sessionId"), answers, db=db)
+    return {"reviewed": reviewed}
 
 @app.post("/generate-mcqs")
 async def generate_mcqs(payload: dict):
-    text = payload.get("text", "")
+    text = _notes_text(payload)
     difficulty = payload.get("difficulty", "medium")
-    print(f"Generating MCQs for text length: {len(text)}")
+    use_cache = not payload.get("bypassCache", False)
+    session_id = _int_option(payload, "sessionId", None)
+    if session_id is not None:
+        return await _generate_session_mcqs(session_id, difficulty, use_cache)
+    logger.info("Generating MCQs", extra={"text_length": len(text), "difficulty": difficulty})
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
         
-    questions = generate_study_questions(text, difficulty)
-    print(f"Generated {len(questions)} questions")
-    return {"mcqs": questions}
+    notes, prompt_tokens = await _prompt_notes(text, _prompt_options(payload))
+    questions = await generate_study_questions_async(notes, difficulty, use_cache=use_cache)
+    logger.info("Generated MCQs", extra={"count": len(questions)})
+    return {"mcqs": questions, "promptTokens": prompt_tokens}
+
+async def _generate_session_mcqs(session_id, difficulty, use_cache):
+    """
+    MCQs for a stored session: served from storage when this difficulty was
+    generated before, else generated from the session's summary and stored.
+    bypassCache generates (and stores) a fresh set.
+    """
+    try:
+        result = await session_mcqs_async(session_id, difficulty, use_cache)
+    except Exception as e:
+        logger.error("Session MCQ error: %s", e)
+        raise HTTPException(status_code=502, detail="AI processing failed")
+    if result is None:
+        raise HTTPException(status_code=404, detail="Study session not found")
+    mcqs, stored = result
+    return {"mcqs": mcqs, "sessionId": session_id, "fromStorage": stored}
+
+@app.post("/generate-mcqs/stream")
+async def generate_mcqs_stream(payload: dict):
+    """Streams each MCQ as an SSE event, ending with the full list."""
+    text = _notes_text(payload)
+    difficulty = payload.get("difficulty", "medium")
+    use_cache = not payload.get("bypassCache", False)
+    if not text:
+        raise HTTPException(status_code=400, detail="No text provided")
+    prompt = _prompt_options(payload)
+
+    async def events():
+        notes, prompt_tokens = await _prompt_notes(text, prompt)
+        async for event, data in stream_study_questions(notes, difficulty, use_cache=use_cache):
+            yield _sse(event, data)
+        yield _sse("done", {"promptTokens": prompt_tokens})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 # --- PORT UNIFICATION: SERVE FRONTEND ---
 
-# Mount static files from 'dist' directory
-if os.path.exists("dist"):
-    app.mount("/assets", StaticFiles(directory="dist/assets"), name="assets")
-
-    # Catch-all route to serve index.html for React routing
-    @app.get("/{full_path:path}")
-    async def serve_frontend(full_path: str):
-        # Prevent shadowing API routes by checking if path starts with known API prefixes if needed
-        # but here we'll just serve index.html as a fallback
-        index_path = os.path.join("dist", "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
-        return {"error": "Frontend build not found. Run 'npm run build' first."}
+async def _frontend_response(request, asset):
+    encoding = choose_encoding(asset, request.headers.get("accept-encoding"))
+    if encoding and encoding not in asset.variants:
+        # Not precompressed by the build: compress once off the event loop, then serve from memory
+        await run_blocking(asset_variant, asset, encoding)
+    status, headers, body = build_response(asset, request.headers, head=request.method == "HEAD")
+    return Response(body, status_code=status, headers=headers, media_type=asset.media_type)
+
+# Serve the 'dist' build from memory (see server/utils/static_assets.py)
+if frontend_available():
+    @app.api_route("/assets/{path:path}", methods=["GET", "HEAD"])
+    async def serve_asset(path: str, request: Request):
+        asset = get_asset(f"assets/{path}")
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Asset not found")
+        return await _frontend_response(request, asset)
+
+    # Catch-all route: files at the root of the build (favicon, etc.), else index.html for React routing
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def serve_frontend(full_path: str, request: Request):
+        asset = get_asset(full_path) or get_asset("index.html")
+        if asset is None:
+            return {"error": "Frontend build not found. Run 'npm run build' first."}
+        return await _frontend_response(request, asset)
 else:
     @app.get("/")
     async def root_fallback():
@@ -1,63 +1,322 @@
 import os
 import json
-from openai import OpenAI
-
-# Initialize client (Groq or OpenAI)
-groq_key = os.getenv("GROQ_API_KEY")
-openai_key = os.getenv("OPEN_AI_API_KEY")
-
-if groq_key:
-    api_key = groq_key
-    base_url = "https://api.groq.com/openai/v1"
-    model_name = "llama-3.1-8b-instant" # Modern, fast
-elif openai_key:
-    api_key = openai_key
-    base_url = "https://api.openai.com/v1"
-    model_name = "gpt-3.5-turbo"
+import random
+import asyncio
+import logging
+import itertools
+from collections import Counter
+import httpx
+import time
+from server.utils.metrics import timed, record_stage, record_llm_usage, LLM_RETRIES
+from server.utils.rate_limit import get_rate_limiter
+from server.utils.llm_router import PROVIDERS, route, hedged, routing_key
+from server.utils.chunker import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# The first configured provider is the primary. Calls go through the router,
+# which may pick another provider or the large model, so cache keys name the
+# whole routing configuration instead of one model
+if PROVIDERS:
+    api_key = PROVIDERS[0].api_key
+    model_name = PROVIDERS[0].model
 else:
     api_key = "simulated_key"
-    base_url = None
     model_name = "simulated"
+ROUTING_KEY = routing_key()
+
+# Network tuning for the LLM providers
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", 60))
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", 10))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", 16))
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", 32))
+# Retries of 429, 5xx and connection errors, with exponential backoff (seconds)
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", 3))
+AI_RETRY_BACKOFF = float(os.getenv("AI_RETRY_BACKOFF", 0.5))
+AI_RETRY_MAX_DELAY = 60.0
+
+# The openai package is slow to import; it is loaded by the first LLM call
+def retryable_errors():
+    """openai errors worth retrying: 429, 5xx and connection failures."""
+    from openai import RateLimitError, InternalServerError, APIConnectionError
+    return (RateLimitError, InternalServerError, APIConnectionError)
+
+# The async clients (one per provider) share one pooled httpx client; it is
+# created lazily so the connection pool binds to the running event loop.
+_http_client = None
+_async_clients = {}
+_async_semaphore = None
+_async_loop = None
+
+def get_async_client(provider=None):
+    global _http_client, _async_semaphore, _async_loop
+    provider = provider or PROVIDERS[0]
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _async_loop is not loop:
+        _async_loop = loop
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=AI_MAX_CONNECTIONS, max_keepalive_connections=AI_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(AI_TIMEOUT, connect=AI_CONNECT_TIMEOUT),
+        )
+        _async_clients.clear()
+        _async_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+    async_client = _async_clients.get(provider.name)
+    if async_client is None:
+        from openai import AsyncOpenAI
+        # Retries are handled in _complete_async so they go through the router and rate limiter
+        async_client = _async_clients[provider.name] = AsyncOpenAI(
+            api_key=provider.api_key, base_url=provider.base_url, timeout=provider.timeout or AI_TIMEOUT,
+            http_client=_http_client, max_retries=0,
+        )
+    return async_client
+
+async def close_async_client():
+    global _http_client, _async_semaphore
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _async_clients.clear()
+    _async_semaphore = None
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retry `attempt`: the provider's Retry-After, else backoff with jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), AI_RETRY_MAX_DELAY)
+    except ValueError:
+        pass
+    return min(AI_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5), AI_RETRY_MAX_DELAY)
 
-client = OpenAI(api_key=api_key, base_url=base_url) if api_key != "simulated_key" else None
+async def _before_retry(error, attempt, model):
+    """Waits out a failed attempt, or re-raises `error` when it must not be retried."""
+    from openai import RateLimitError, InternalServerError
+    if not isinstance(error, retryable_errors()) or attempt >= AI_MAX_RETRIES:
+        raise error
+    delay = _retry_delay(error, attempt)
+    reason = "rate_limited" if isinstance(error, RateLimitError) else "server_error" if isinstance(error, InternalServerError) else "connection"
+    LLM_RETRIES.inc(model=model, reason=reason)
+    logger.warning("LLM call failed (%s), retry %d/%d in %.1fs", reason, attempt + 1, AI_MAX_RETRIES, delay)
+    await asyncio.sleep(delay)
 
-from server.utils.intelligence import calculate_exam_weights, get_importance_badge
+def _request_tokens(request):
+    return estimate_tokens("".join(message.get("content") or "" for message in request["messages"]))
 
-def generate_exam_summary(text, length=50, exam_mode=True, explain_simply=False, language="English"):
+async def _provider_completion(provider, request):
+    """One completion on one provider, within its rate limit and AI_MAX_CONCURRENCY."""
+    from openai import RateLimitError
+    limiter = get_rate_limiter(provider.base_url)
+    await limiter.acquire()
+    async_client = get_async_client(provider)
+    try:
+        async with _async_semaphore:
+            return await async_client.chat.completions.create(**request)
+    except RateLimitError as e:
+        # Hold back every caller of this provider, not just this one
+        limiter.pause(_retry_delay(e, 0))
+        raise
+
+async def _complete_async(**request):
     """
-    Generates an intelligence-augmented summary with dependency mapping and scheduling.
+    Runs one chat completion through the provider router: the model is picked
+    by prompt size, a slow provider is hedged and a failing one falls over to
+    the next. Once every provider failed with a 429, 5xx or connection error,
+    the call is retried with backoff.
     """
-    weights = calculate_exam_weights(text)
-    
-    if api_key == "simulated_key":
-        # Simplified simulation for Phase 4 fields
-        return {
-            "topic": "Advanced Material",
-            "language": language,
-            "concepts": [
-                {"title": "Core Foundations", "content": "Detailed deep-dive into basic principles...", "importance": "HOT"},
-                {"title": "Advanced Applications", "content": "Complex implementations of the core logic...", "importance": "WARM"}
-            ],
-            "dependencies": [["Core Foundations", "Advanced Applications"]],
-            "studySchedule": [
-                {"day": 1, "task": "Master Core Foundations", "goal": "90% retention"},
-                {"day": 2, "task": "Explore Advanced Applications", "goal": "Hands-on implementation"},
-                {"day": 3, "task": "Final Review & Quiz", "goal": "Exam readiness"}
-            ],
-            "definitions": {"Concept A": "Definition A"},
-            "formulas": ["Logic Gate X -> Y"],
-            "tips": ["Focus on the first principles first."],
-            "mnemonics": [],
-            "examFocus": []
-        }
+    tokens = _request_tokens(request)
+    for attempt in itertools.count():
+        try:
+            with timed("llm"):
+                response, _, model = await hedged(
+                    route(tokens), lambda provider, model: _provider_completion(provider, {**request, "model": model}),
+                    "complete", retryable_errors(),
+                )
+            break
+        except Exception as e:
+            await _before_retry(e, attempt, request["model"])
+    record_llm_usage(model, response.usage)
+    return response
+
+from server.utils.intelligence import calculate_exam_weights, assign_importance, assign_importance_badges
+from server.utils.cache import make_cache_key, cache_lookup, cache_store
+from server.utils.executor import run_blocking
+from server.utils.json_stream import JSONArrayItemStream
+from server.utils.chunker import chunk_text, DEFAULT_CHUNK_TOKENS
+
+# Chunks of a long document summarized concurrently (per request)
+SUMMARY_PARALLELISM = int(os.getenv("SUMMARY_PARALLELISM", 4))
+# Highest-weighted TF-IDF terms listed in the summary prompt
+PROMPT_KEY_TERMS = 15
+
+# Top-level arrays forwarded element-by-element while a completion streams
+SUMMARY_STREAM_EVENTS = {"concepts": "concept", "studySchedule": "schedule"}
+STUDY_PACK_STREAM_EVENTS = {**SUMMARY_STREAM_EVENTS, "mcqs": "mcq"}
+MCQ_STREAM_EVENTS = {"mcqs": "mcq", "questions": "mcq"}
+
+async def _open_stream(provider, request):
+    """
+    Starts a streamed completion on one provider and reads it up to the first
+    content, so hedging races on time to first token. Returns (stream, chunks
+    read so far, semaphore); the stream holds a concurrency slot until
+    _close_stream.
+    """
+    from openai import RateLimitError
+    limiter = get_rate_limiter(provider.base_url)
+    await limiter.acquire()
+    async_client = get_async_client(provider)
+    semaphore = _async_semaphore
+    await semaphore.acquire()
+    try:
+        stream = await async_client.chat.completions.create(**request, stream=True, stream_options={"include_usage": True})
+        head = []
+        try:
+            while not head or not (head[-1].choices and head[-1].choices[0].delta.content):
+                head.append(await stream.__anext__())
+        except StopAsyncIteration:
+            pass
+        except BaseException:
+            await stream.close()
+            raise
+        return stream, head, semaphore
+    except BaseException as e:
+        semaphore.release()
+        if isinstance(e, RateLimitError):
+            limiter.pause(_retry_delay(e, 0))
+        raise
+
+async def _close_stream(opened):
+    stream, _, semaphore = opened
+    semaphore.release()
+    await stream.close()
+
+async def _stream_completion(request, events, parser):
+    """Streams one completion, yielding (event, item) as watched array elements close."""
+    tokens = _request_tokens(request)
+    for attempt in itertools.count():
+        # Only the waits on the provider count as the llm stage, not the
+        # time our consumer spends between reads
+        upstream = [0.0]
+        try:
+            started = time.perf_counter()
+            try:
+                opened, provider, model = await hedged(
+                    route(tokens), lambda provider, model: _open_stream(provider, {**request, "model": model}),
+                    "first_token", retryable_errors(), discard=_close_stream,
+                )
+            finally:
+                upstream[0] += time.perf_counter() - started
+            stream, head, _ = opened
+            try:
+                async for chunk in _stream_chunks(head, stream, upstream):
+                    # The usage block arrives in a final chunk without choices
+                    if chunk.usage is not None:
+                        record_llm_usage(model, chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        for key, item in parser.feed(delta):
+                            yield events[key], item
+            except retryable_errors() as e:
+                provider.record_failure(e)
+                raise
+            finally:
+                await _close_stream(opened)
+            return
+        except Exception as e:
+            # Once part of the reply went out, a retry would repeat it
+            if parser.received:
+                raise
+            await _before_retry(e, attempt, request["model"])
+        finally:
+            record_stage("llm", upstream[0])
+
+async def _stream_chunks(head, stream, upstream):
+    """The chunks read while opening the stream, then the rest; adds the time spent awaiting the stream to upstream[0]."""
+    for chunk in head:
+        yield chunk
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            upstream[0] += time.perf_counter() - started
+        yield chunk
+
+def _replay_events(result, events):
+    """Turns an already complete result (cache hit, simulation) into stream events."""
+    for key, event in events.items():
+        items = result.get(key) if isinstance(result, dict) else None
+        for item in items or []:
+            yield event, item
+
+def summary_events(result):
+    """Stream events of an already complete summary (e.g. a reused one)."""
+    return _replay_events(result, STUDY_PACK_STREAM_EVENTS)
+
+def _simulated_summary(language):
+    # Simplified simulation for Phase 4 fields
+    return {
+        "topic": "Advanced Material",
+        "language": language,
+        "concepts": [
+            {"title": "Core Foundations", "content": "Detailed deep-dive into basic principles...", "importance": "HOT"},
+            {"title": "Advanced Applications", "content": "Complex implementations of the core logic...", "importance": "WARM"}
+        ],
+        "dependencies": [["Core Foundations", "Advanced Applications"]],
+        "studySchedule": [
+            {"day": 1, "task": "Master Core Foundations", "goal": "90% retention"},
+            {"day": 2, "task": "Explore Advanced Applications", "goal": "Hands-on implementation"},
+            {"day": 3, "task": "Final Review & Quiz", "goal": "Exam readiness"}
+        ],
+        "definitions": {"Concept A": "Definition A"},
+        "formulas": ["Logic Gate X -> Y"],
+        "tips": ["Focus on the first principles first."],
+        "mnemonics": [],
+        "examFocus": []
+    }
+
+def _summary_cache_key(text, length, exam_mode, explain_simply, language, difficulty=None):
+    # Summaries with MCQs (difficulty set) are cached apart from plain summaries
+    extra = {"mcq_difficulty": difficulty} if difficulty else {}
+    return make_cache_key(
+        "summary", text,
+        length=length, exam_mode=exam_mode, explain_simply=explain_simply,
+        language=language, model=ROUTING_KEY, **extra
+    )
 
+def summary_options_key(length, exam_mode, explain_simply, language, token_budget=None):
+    """
+    Identifies the summary options (and model) a stored session is
+    interchangeable under. token_budget is set when the notes were condensed
+    to that budget before summarizing, so condensed and full summaries never mix.
+    """
+    # Left out when not condensed, so sessions saved before pre-compression keep their key
+    extra = {"condensed_to": token_budget} if token_budget else {}
+    return make_cache_key(
+        "summary-options", "",
+        length=length, exam_mode=exam_mode, explain_simply=explain_simply,
+        language=language, model=ROUTING_KEY, **extra
+    )
+
+def _summary_request(text, length, exam_mode, explain_simply, language, weights=None, difficulty=None):
+    # Key terms shift as the corpus grows, so they steer the prompt but are
+    # deliberately not part of the cache key
     simplify_prompt = "Explain like I'm five. Use extremely simple analogies and avoid jargon." if explain_simply else "Maintain academic precision but optimize for exam recall."
-    
+    key_terms = list(weights or {})[:PROMPT_KEY_TERMS]
+    key_terms_prompt = f"KEY TERMS (ranked by TF-IDF against previously studied notes, make sure the concepts cover them): {', '.join(key_terms)}" if key_terms else ""
+    # With a difficulty the same completion also writes the quiz, so the notes are only sent once
+    mcqs_prompt = f"- mcqs: 5 Multiple Choice Questions at {difficulty} difficulty (Beginner = basic facts, Expert = deep inference and application), as objects with 'question', 'options' (4 strings) and 'correct' (index)" if difficulty else ""
+
     prompt = f"""
-    Act as a professional study assistant. 
+    Act as a professional study assistant.
     RESPONSE LANGUAGE: {language}
     PEDAGOGY STRATEGY: {simplify_prompt}
-    
+    {key_terms_prompt}
+
     Structure the output as JSON with:
     - topic: Main subject
     - language: {language}
@@ -69,94 +328,435 @@ def generate_exam_summary(text, length=50, exam_mode=True, explain_simply=False,
     - tips: 3-5 high-value tips
     - mnemonics: Memory aids
     - examFocus: Weighted focus areas
-    
+    {mcqs_prompt}
+
     {text}
     """
-    
+    return {
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": f"You are a professional study assistant. Always respond in valid JSON. Language: {language}"},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"}
+    }
+
+def _valid_mcqs(items):
+    return [item for item in items or [] if isinstance(item, dict) and item.get("question")]
+
+async def _ensure_mcqs(result, difficulty, use_cache):
+    """
+    Makes sure a summary requested with MCQs carries them, generating them
+    from the summary if the model left them out. A failed generation leaves
+    "mcqs" empty rather than failing the summary.
+    """
+    if difficulty and result is not None:
+        mcqs = _valid_mcqs(result.get("mcqs"))
+        if not mcqs:
+            try:
+                mcqs = await generate_questions_from_summary_async(result, difficulty, use_cache, fallback=False)
+            except Exception:
+                mcqs = []
+        result["mcqs"] = mcqs
+    return result
+
+def _cacheable(result, difficulty):
+    # A summary whose MCQs failed is not cached, so the next request retries them
+    return not difficulty or bool(result.get("mcqs"))
+
+async def generate_exam_summary_async(text, length=50, exam_mode=True, explain_simply=False, language="English",
+                                      use_cache=True, difficulty=None):
+    """
+    Generates an intelligence-augmented summary with dependency mapping and
+    scheduling. Responses are cached by content; pass use_cache=False to force
+    a fresh call. With a difficulty, the summary and its MCQs ("mcqs") come from one completion.
+    """
+    if api_key == "simulated_key":
+        result = _simulated_summary(language)
+        return {**result, "mcqs": _simulated_questions(difficulty)} if difficulty else result
+
+    cache_key = _summary_cache_key(text, length, exam_mode, explain_simply, language, difficulty)
+    cached = await run_blocking(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        return cached
+
+    weights = await run_blocking(calculate_exam_weights, text)
     try:
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": f"You are a professional study assistant. Always respond in valid JSON. Language: {language}"},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        return json.loads(response.choices[0].message.content)
+        response = await _complete_async(**_summary_request(text, length, exam_mode, explain_simply, language, weights, difficulty))
+        result = assign_importance_badges(json.loads(response.choices[0].message.content), weights)
     except Exception as e:
-        print(f"AI Summary Error: {e}")
+        logger.error("AI summary error: %s", e)
         return None
+    result = await _ensure_mcqs(result, difficulty, use_cache)
+    if _cacheable(result, difficulty):
+        await run_blocking(cache_store, cache_key, result)
+    return result
 
-def rephrase_text(text, style="Academic"):
+async def stream_exam_summary(text, length=50, exam_mode=True, explain_simply=False, language="English",
+                              use_cache=True, difficulty=None):
     """
-    Paraphrases text to be plagiarism-safe and style-specific.
+    Streaming variant of generate_exam_summary_async. Yields ("concept" | "schedule", item)
+    as soon as each entry is complete (and ("mcq", question) with a difficulty),
+    then ("summary", result) or ("error", message).
     """
+    events = STUDY_PACK_STREAM_EVENTS if difficulty else SUMMARY_STREAM_EVENTS
     if api_key == "simulated_key":
-        return f"[Rephrased in {style} style]: {text[:100]}..."
+        result = _simulated_summary(language)
+        if difficulty:
+            result["mcqs"] = _simulated_questions(difficulty)
+        for event in _replay_events(result, events):
+            yield event
+        yield "summary", result
+        return
+
+    cache_key = _summary_cache_key(text, length, exam_mode, explain_simply, language, difficulty)
+    cached = await run_blocking(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        for event in _replay_events(cached, events):
+            yield event
+        yield "summary", cached
+        return
+
+    weights = await run_blocking(calculate_exam_weights, text)
+    parser = JSONArrayItemStream(events)
+    try:
+        request = _summary_request(text, length, exam_mode, explain_simply, language, weights, difficulty)
+        async for event, item in _stream_completion(request, events, parser):
+            yield event, assign_importance(item, weights) if event == "concept" else item
+        result = assign_importance_badges(json.loads(parser.text), weights)
+    except Exception as e:
+        logger.error("AI summary error: %s", e)
+        yield "error", "AI processing failed"
+        return
+    if difficulty and not _valid_mcqs(result.get("mcqs")):
+        result = await _ensure_mcqs(result, difficulty, use_cache)
+        for mcq in result["mcqs"]:
+            yield "mcq", mcq
+    if _cacheable(result, difficulty):
+        await run_blocking(cache_store, cache_key, result)
+    yield "summary", result
+
+IMPORTANCE_RANK = {"HOT": 2, "WARM": 1, "COLD": 0}
+
+def _normalize_title(title):
+    return " ".join(str(title or "").lower().split())
 
+def _dedupe(items):
+    seen, unique = set(), []
+    for item in items:
+        key = json.dumps(item, sort_keys=True, ensure_ascii=False)
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+def merge_chunk_summaries(results, language="English"):
+    """
+    Reduce step of the chunked pipeline: folds per-chunk summaries into the
+    single-summary schema. Concepts are merged by normalized title, dependency
+    pairs are re-pointed at the merged titles and schedule days renumbered.
+    """
+    topics = [r["topic"] for r in results if r.get("topic")]
+    merged = {
+        "topic": Counter(topics).most_common(1)[0][0] if topics else "Extracted Material",
+        "language": language,
+        "concepts": [],
+        "dependencies": [],
+        "studySchedule": [],
+        "definitions": {},
+        "formulas": [],
+        "tips": [],
+        "mnemonics": [],
+        "examFocus": []
+    }
+
+    concepts = {}
+    for result in results:
+        for concept in result.get("concepts") or []:
+            if not isinstance(concept, dict):
+                continue
+            key = _normalize_title(concept.get("title"))
+            existing = concepts.get(key)
+            if existing is None:
+                concepts[key] = dict(concept)
+                continue
+            content = concept.get("content")
+            if content and content not in existing.get("content", ""):
+                existing["content"] = f"{existing.get('content', '')}\n\n{content}".strip()
+            if IMPORTANCE_RANK.get(concept.get("importance"), -1) > IMPORTANCE_RANK.get(existing.get("importance"), -1):
+                existing["importance"] = concept["importance"]
+    merged["concepts"] = list(concepts.values())
+
+    def canonical(title):
+        concept = concepts.get(_normalize_title(title))
+        return concept.get("title", title) if concept else title
+
+    for result in results:
+        for pair in result.get("dependencies") or []:
+            if isinstance(pair, (list, tuple)) and len(pair) == 2:
+                before, after = canonical(pair[0]), canonical(pair[1])
+                if _normalize_title(before) != _normalize_title(after):
+                    merged["dependencies"].append([before, after])
+        for day in result.get("studySchedule") or []:
+            if isinstance(day, dict):
+                merged["studySchedule"].append({**day, "day": len(merged["studySchedule"]) + 1})
+        definitions = result.get("definitions")
+        if isinstance(definitions, dict):
+            for term, definition in definitions.items():
+                merged["definitions"].setdefault(term, definition)
+        for field in ("formulas", "tips", "mnemonics", "examFocus"):
+            values = result.get(field)
+            if isinstance(values, list):
+                merged[field].extend(values)
+
+    merged["dependencies"] = _dedupe(merged["dependencies"])
+    for field in ("formulas", "tips", "mnemonics", "examFocus"):
+        merged[field] = _dedupe(merged[field])
+    return merged
+
+def _map_chunks(chunks, parallelism, **options):
+    """Starts one summary task per chunk; at most `parallelism` run at a time."""
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+
+    async def summarize_chunk(index, chunk):
+        async with semaphore:
+            return index, await generate_exam_summary_async(chunk, **options)
+
+    return [asyncio.create_task(summarize_chunk(i, chunk)) for i, chunk in enumerate(chunks)]
+
+async def summarize_document_async(text, length=50, exam_mode=True, explain_simply=False, language="English",
+                                   use_cache=True, chunk_tokens=DEFAULT_CHUNK_TOKENS, parallelism=SUMMARY_PARALLELISM,
+                                   difficulty=None):
+    """
+    Summarizes notes of any size. Text that fits in one chunk takes the normal
+    single-prompt path; longer text is split on page/heading boundaries,
+    summarized chunk by chunk (each chunk cached on its own) and merged.
+    With a difficulty the result also carries "mcqs": written in the same
+    completion for one chunk, generated from the merged summary otherwise.
+    """
+    options = dict(length=length, exam_mode=exam_mode, explain_simply=explain_simply, language=language, use_cache=use_cache)
+    chunks = await run_blocking(chunk_text, text, chunk_tokens)
+    if len(chunks) <= 1:
+        return await generate_exam_summary_async(chunks[0] if chunks else text, **options, difficulty=difficulty)
+
+    results = sorted(await asyncio.gather(*_map_chunks(chunks, parallelism, **options)), key=lambda r: r[0])
+    summaries = [summary for _, summary in results if summary]
+    if not summaries:
+        return None
+    return await _ensure_mcqs(merge_chunk_summaries(summaries, language), difficulty, use_cache)
+
+async def stream_document_summary(text, length=50, exam_mode=True, explain_simply=False, language="English",
+                                  use_cache=True, chunk_tokens=DEFAULT_CHUNK_TOKENS, parallelism=SUMMARY_PARALLELISM,
+                                  difficulty=None):
+    """
+    Streaming counterpart of summarize_document_async. Long documents emit the
+    concepts of each chunk as that chunk finishes, then the merged summary.
+    """
+    options = dict(length=length, exam_mode=exam_mode, explain_simply=explain_simply, language=language, use_cache=use_cache)
+    chunks = await run_blocking(chunk_text, text, chunk_tokens)
+    if len(chunks) <= 1:
+        async for event in stream_exam_summary(chunks[0] if chunks else text, **options, difficulty=difficulty):
+            yield event
+        return
+
+    results = [None] * len(chunks)
+    for task in asyncio.as_completed(_map_chunks(chunks, parallelism, **options)):
+        index, summary = await task
+        results[index] = summary
+        for concept in (summary or {}).get("concepts") or []:
+            yield "concept", concept
+
+    summaries = [summary for summary in results if summary]
+    if not summaries:
+        yield "error", "AI processing failed"
+        return
+    merged = await _ensure_mcqs(merge_chunk_summaries(summaries, language), difficulty, use_cache)
+    for mcq in (merged.get("mcqs") or []) if difficulty else []:
+        yield "mcq", mcq
+    yield "summary", merged
+
+def _rephrase_request(text, style):
     prompt = f"Paraphrase the following text in a '{style}' style. Ensure it is plagiarism-safe but retains all technical accuracy and core meaning.\n\n{text}"
-    
+    return {
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": "You are an expert academic editor."},
+            {"role": "user", "content": prompt}
+        ]
+    }
+
+async def rephrase_text_async(text, style="Academic", use_cache=True):
+    """Paraphrases text to be plagiarism-safe and style-specific."""
+    if api_key == "simulated_key":
+        return f"[Rephrased in {style} style]: {text[:100]}..."
+
+    cache_key = make_cache_key("rephrase", text, style=style, model=ROUTING_KEY)
+    cached = await run_blocking(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        return cached
+
     try:
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": "You are an expert academic editor."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        response = await _complete_async(**_rephrase_request(text, style))
+        rephrased = response.choices[0].message.content
+        await run_blocking(cache_store, cache_key, rephrased)
+        return rephrased
     except Exception as e:
         return f"Rephrase Error: {e}"
 
-def generate_study_questions(text, difficulty="medium"):
-    """Generates MCQs and study questions with adaptive difficulty."""
-    if api_key == "simulated_key":
-        return [
-            {"question": f"Sample {difficulty.capitalize()} Question?", "options": ["A", "B", "C", "D"], "correct": 0}
-        ]
+def _simulated_questions(difficulty):
+    return [
+        {"question": f"Sample {difficulty.capitalize()} Question?", "options": ["A", "B", "C", "D"], "correct": 0}
+    ]
 
+def _mcq_request(text, difficulty):
     prompt = f"""
     Generate 5 high-quality Multiple Choice Questions (MCQs) based on this text.
     DIFFICULTY LEVEL: {difficulty} (Beginner = basic facts, Expert = deep inference and application)
-    
+
     Return as JSON: {{"mcqs": [{{"question": "", "options": ["", "", "", ""], "correct": index}}]}}
-    
+
     CONTENT:
     {text}
     """
+    return {
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": "You are a professional study assistant. Always respond in valid JSON format."},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"}
+    }
+
+def summary_study_text(summary):
+    """
+    Condenses a stored summary into the text MCQs are generated from: topic,
+    concepts, definitions and formulas. Much shorter than the raw notes.
+    """
+    summary = summary if isinstance(summary, dict) else {}
+    lines = [f"TOPIC: {summary.get('topic', '')}"]
+    for concept in summary.get("concepts") or []:
+        if isinstance(concept, dict):
+            lines.append(f"{concept.get('title', '')}: {concept.get('content', '')}")
+    definitions = summary.get("definitions")
+    if isinstance(definitions, dict) and definitions:
+        lines.append("DEFINITIONS:")
+        lines.extend(f"- {term}: {meaning}" for term, meaning in definitions.items())
+    formulas = [str(formula) for formula in summary.get("formulas") or []]
+    if formulas:
+        lines.append("FORMULAS:")
+        lines.extend(f"- {formula}" for formula in formulas)
+    return "\n".join(lines)
+
+async def generate_questions_from_summary_async(summary, difficulty="medium", use_cache=True, fallback=True):
+    """MCQs generated from a summary instead of the raw notes (cached like any MCQ request)."""
+    return await generate_study_questions_async(summary_study_text(summary), difficulty, use_cache=use_cache, fallback=fallback)
+
+async def session_mcqs_async(session_id, difficulty="medium", use_cache=True, summary=None, db=None):
+    """
+    MCQs of a stored session at one difficulty: the stored set, or (when there
+    is none or use_cache is off) a new set generated from the session's
+    summary and stored. Returns (mcqs, served_from_storage), or None for an
+    unknown session. Raises when generation fails.
+    """
+    from server.utils.database import get_session_quiz, save_session_quiz, get_session_summary
+    if use_cache:
+        stored = await run_blocking(get_session_quiz, session_id, difficulty, db=db)
+        if stored:
+            return stored, True
+    if summary is None:
+        summary = await run_blocking(get_session_summary, session_id, db=db)
+        if summary is None:
+            return None
+    mcqs = await generate_questions_from_summary_async(summary, difficulty, use_cache, fallback=False)
+    await run_blocking(save_session_quiz, session_id, difficulty, mcqs, db=db)
+    return mcqs, False
+
+def _extract_mcqs(raw_content):
+    logger.debug("Raw MCQ content", extra={"preview": raw_content[:500]})
+    data = json.loads(raw_content)
+
+    # Robust retrieval of the questions list
+    mcqs = []
+    if isinstance(data, list):
+        mcqs = data
+    elif isinstance(data, dict):
+        if "mcqs" in data:
+            mcqs = data["mcqs"]
+        elif "questions" in data:
+            mcqs = data["questions"]
+        else:
+            # Try to find any list in the dict
+            for val in data.values():
+                if isinstance(val, list) and len(val) > 0 and isinstance(val[0], dict) and "question" in val[0]:
+                    mcqs = val
+                    break
+
+    logger.debug("Extracted MCQs", extra={"count": len(mcqs)})
+    return mcqs
 
+def _empty_mcqs_fallback():
+    return [{"question": "AI failed to generate specific questions. Review your notes directly.", "options": ["Understood", "Try again", "N/A", "N/A"], "correct": 0}]
+
+def _error_mcqs_fallback(text):
+    # Final fallback - Simulation style but better than nothing
+    return [{"question": f"Key Topic: {text[:50]}...?", "options": ["Found in text", "Not in text", "Partially", "None"], "correct": 0}]
+
+async def stream_study_questions(text, difficulty="medium", use_cache=True):
+    """
+    Streaming variant of generate_study_questions_async. Yields ("mcq", question) for each
+    finished question, then ("mcqs", full_list) with the same fallbacks as the blocking path.
+    """
+    if api_key == "simulated_key":
+        mcqs = _simulated_questions(difficulty)
+        for mcq in mcqs:
+            yield "mcq", mcq
+        yield "mcqs", mcqs
+        return
+
+    cache_key = make_cache_key("mcqs", text, difficulty=difficulty, model=ROUTING_KEY)
+    cached = await run_blocking(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        for mcq in cached:
+            yield "mcq", mcq
+        yield "mcqs", cached
+        return
+
+    parser = JSONArrayItemStream(MCQ_STREAM_EVENTS)
     try:
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": "You are a professional study assistant. Always respond in valid JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        raw_content = response.choices[0].message.content
-        print(f"RAW MCQ CONTENT: {raw_content[:500]}...") 
-        data = json.loads(raw_content)
-        
-        # Robust retrieval of the questions list
-        mcqs = []
-        if isinstance(data, list):
-            mcqs = data
-        elif isinstance(data, dict):
-            if "mcqs" in data:
-                mcqs = data["mcqs"]
-            elif "questions" in data:
-                mcqs = data["questions"]
-            else:
-                # Try to find any list in the dict
-                for val in data.values():
-                    if isinstance(val, list) and len(val) > 0 and isinstance(val[0], dict) and "question" in val[0]:
-                        mcqs = val
-                        break
-        
-        print(f"Final MCQs count: {len(mcqs)}")
-        return mcqs if mcqs else [{"question": "AI failed to generate specific questions. Review your notes directly.", "options": ["Understood", "Try again", "N/A", "N/A"], "correct": 0}]
+        async for event in _stream_completion(_mcq_request(text, difficulty), MCQ_STREAM_EVENTS, parser):
+            yield event
+        mcqs = _extract_mcqs(parser.text)
+    except Exception as e:
+        logger.error("AI MCQ error: %s", e)
+        yield "mcqs", _error_mcqs_fallback(text)
+        return
+    if mcqs:
+        await run_blocking(cache_store, cache_key, mcqs)
+    yield "mcqs", mcqs if mcqs else _empty_mcqs_fallback()
+
+async def generate_study_questions_async(text, difficulty="medium", use_cache=True, fallback=True):
+    """
+    Generates MCQs with adaptive difficulty. With fallback=False,
+    errors and empty replies raise instead of returning placeholder questions.
+    """
+    if api_key == "simulated_key":
+        return _simulated_questions(difficulty)
+
+    cache_key = make_cache_key("mcqs", text, difficulty=difficulty, model=ROUTING_KEY)
+    cached = await run_blocking(cache_lookup, cache_key, use_cache)
+    if cached is not None:
+        return cached
+
+    try:
+        response = await _complete_async(**_mcq_request(text, difficulty))
+        mcqs = _extract_mcqs(response.choices[0].message.content)
+        if mcqs:
+            await run_blocking(cache_store, cache_key, mcqs)
+        elif not fallback:
+            raise ValueError("The model returned no questions")
+        return mcqs if mcqs else _empty_mcqs_fallback()
     except Exception as e:
-        print(f"AI MCQ Error: {e}")
-        # Final fallback - Simulation style but better than nothing
-        return [{"question": f"Key Topic: {text[:50]}...?", "options": ["Found in text", "Not in text", "Partially", "None"], "correct": 0}]
+        logger.error("AI MCQ error: %s", e)
+        if not fallback:
+            raise
+        return _error_mcqs_fallback(text)
@@ -1,54 +1,106 @@
-import pandas as pd
-from server.utils.database import SessionLocal, QuizResult, StudySession
+import sys
+import datetime
+from sqlalchemy import func
+from server.utils.database import init_db, session_scope, TopicStat, WeakTopicStat, AnalyticsTotals, QuizWeakTopic, rebuild_quiz_aggregates
 
-def get_performance_analytics():
+TREND_BUCKETS = {
+    # bucket: (SQLite strftime format, PostgreSQL to_char format)
+    "day": ("%Y-%m-%d", "YYYY-MM-DD"),
+    # Grouped by the Monday starting the week, then labelled as ISO weeks in Python,
+    # so both backends agree (SQLite's %W weeks differ at year boundaries)
+    "week": ("%Y-%m-%d", "YYYY-MM-DD"),
+    "month": ("%Y-%m", "YYYY-MM"),
+}
+
+def _iso_week(monday):
+    year, week, _ = datetime.date.fromisoformat(monday).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def get_performance_analytics(db=None):
     """
-    Uses pandas to analyze quiz results and identify weak topics.
+    Reads the quiz aggregates maintained by save_quiz_result to report mastery
+    and weak topics. Cost grows with the number of topics, not quiz results.
     """
-    db = SessionLocal()
-    # Join QuizResult with StudySession to get topic names
-    results = db.query(QuizResult, StudySession.topic)\
-        .join(StudySession, QuizResult.session_id == StudySession.id)\
-        .all()
-    
-    if not results:
-        db.close()
-        return {"mastery": 0, "weak_topics": [], "total_sessions": 0, "topic_breakdown": []}
-
-    # Load results into a pandas DataFrame
-    df = pd.DataFrame([
-        {
-            "id": r[0].id,
-            "session_id": r[0].session_id,
-            "topic": r[1] or "Unknown Topic",
-            "score": r[0].score,
-            "total": r[0].total,
-            "weak_topics": r[0].weak_topics.split(",") if r[0].weak_topics else []
-        } for r in results
-    ])
-
-    # Calculate overall mastery percentage
-    df['percentage'] = (df['score'] / df['total']) * 100
-    avg_mastery = df['percentage'].mean()
-
-    # Identify weak topics (flatten list and count frequencies)
-    all_weak_topics = [topic for sublist in df['weak_topics'] for topic in sublist if topic]
-    weak_topic_counts = pd.Series(all_weak_topics).value_counts().to_dict() if all_weak_topics else {}
-    
-    # Sort weak topics by frequency
-    sorted_weak_topics = sorted(weak_topic_counts.items(), key=lambda x: x[1], reverse=True)
-    
-    # Calculate Per-Topic Mastery
-    topic_stats = df.groupby('topic')['percentage'].mean().reset_index()
-    topic_breakdown = [
-        {"topic": row['topic'], "mastery": round(row['percentage'], 1)}
-        for _, row in topic_stats.iterrows()
-    ]
-
-    db.close()
-    return {
-        "mastery": round(avg_mastery, 2),
-        "weak_topics": [topic for topic, count in sorted_weak_topics[:5]],
-        "total_sessions": len(df['session_id'].unique()),
-        "topic_breakdown": topic_breakdown
-    }
+    with session_scope(db) as db:
+        totals = db.get(AnalyticsTotals, 1)
+        if totals is None or not totals.quiz_count:
+            return {"mastery": 0, "weak_topics": [], "total_sessions": 0, "topic_breakdown": []}
+
+        weak_topics = db.query(WeakTopicStat.topic)\
+            .filter(WeakTopicStat.count > 0)\
+            .order_by(WeakTopicStat.count.desc(), WeakTopicStat.topic)\
+            .limit(5).all()
+
+        # Per-topic mastery from running sums
+        topic_breakdown = [
+            {"topic": row.topic, "mastery": round(row.percentage_sum / row.quiz_count, 1)}
+            for row in db.query(TopicStat).filter(TopicStat.quiz_count > 0).order_by(TopicStat.topic)
+        ]
+
+        return {
+            "mastery": round(totals.percentage_sum / totals.quiz_count, 2),
+            "weak_topics": [row.topic for row in weak_topics],
+            "total_sessions": totals.session_count,
+            "topic_breakdown": topic_breakdown
+        }
+
+def _in_window(query, since=None, until=None):
+    if since is not None:
+        query = query.filter(QuizWeakTopic.created_at >= since)
+    if until is not None:
+        query = query.filter(QuizWeakTopic.created_at < until)
+    return query
+
+def get_top_weak_topics(since=None, until=None, limit=10, db=None):
+    """Most frequently flagged weak topics in [since, until), via the created_at index."""
+    with session_scope(db) as db:
+        count = func.count(QuizWeakTopic.id).label("count")
+        rows = _in_window(db.query(QuizWeakTopic.topic, count), since, until)\
+            .group_by(QuizWeakTopic.topic)\
+            .order_by(count.desc(), QuizWeakTopic.topic)\
+            .limit(limit).all()
+        return [{"topic": row.topic, "count": row.count} for row in rows]
+
+def get_session_weak_topics(session_id, db=None):
+    """Weak topics flagged across all quizzes taken for one study session."""
+    with session_scope(db) as db:
+        count = func.count(QuizWeakTopic.id).label("count")
+        rows = db.query(QuizWeakTopic.topic, count)\
+            .filter(QuizWeakTopic.session_id == session_id)\
+            .group_by(QuizWeakTopic.topic)\
+            .order_by(count.desc(), QuizWeakTopic.topic).all()
+        return [{"topic": row.topic, "count": row.count} for row in rows]
+
+def get_topic_trend(topic, since=None, until=None, bucket="day", db=None):
+    """How often `topic` was flagged per day/week/month, via the (topic, created_at) index."""
+    sqlite_format, pg_format = TREND_BUCKETS[bucket]
+    with session_scope(db) as db:
+        if db.get_bind().dialect.name == "postgresql":
+            created_at = func.date_trunc("week", QuizWeakTopic.created_at) if bucket == "week" else QuizWeakTopic.created_at
+            period = func.to_char(created_at, pg_format)
+        elif bucket == "week":
+            # The next Sunday (or the day itself), minus six days: the week's Monday
+            period = func.strftime(sqlite_format, QuizWeakTopic.created_at, "weekday 0", "-6 days")
+        else:
+            period = func.strftime(sqlite_format, QuizWeakTopic.created_at)
+        period = period.label("period")
+        rows = _in_window(db.query(period, func.count(QuizWeakTopic.id).label("count")), since, until)\
+            .filter(QuizWeakTopic.topic == topic)\
+            .group_by(period)\
+            .order_by(period).all()
+        label = _iso_week if bucket == "week" else str
+        return [{"period": label(row.period), "count": row.count} for row in rows]
+
+def rebuild_analytics(db=None):
+    """Backfills the aggregate tables from every stored quiz result."""
+    with session_scope(db) as db:
+        rebuild_quiz_aggregates(db)
+        db.commit()
+
+if __name__ == "__main__":
+    # python -m server.utils.analytics rebuild
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m server.utils.analytics rebuild")
+    init_db()
+    rebuild_analytics()
+    print("Analytics aggregates rebuilt.")
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration (override via environment)
+CACHE_ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))  # seconds
+CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", 256))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+# Trimming goes down to this share of max_entries, so it runs once per many writes
+CACHE_TRIM_TO = 0.9
+# Same SQLite settings as the history database: the file is shared by every worker process
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 10000))
+
+def normalize_text(text):
+    """Collapses whitespace so cosmetic re-formatting still hits the cache."""
+    return " ".join((text or "").split())
+
+def make_cache_key(kind, text, **params):
+    """
+    Builds a content-addressed key from the normalized text and every
+    parameter that changes the prompt (language, difficulty, model...).
+    """
+    payload = json.dumps(
+        {"kind": kind, "text": normalize_text(text), "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-level cache for LLM responses: an in-memory LRU in front of a
+    SQLite file. Entries expire after `ttl` seconds and the disk layer is
+    trimmed to `max_entries` by least-recent access. Errors of the disk
+    layer (e.g. a lock held too long by another worker) count as a miss on
+    reads and are skipped on writes.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, memory_items=CACHE_MEMORY_ITEMS, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        if path != ":memory:":
+            self._conn.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        self._conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        self._conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0,
+                         "writes": 0, "errors": 0}
+        # Running estimate of the disk entries (replacements and other workers' writes make it
+        # drift), so the exact COUNT(*) only runs when trimming may be needed
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def _remember(self, key, created_at, value):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            try:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self._entries -= 1
+                    self.counters["evictions"] += 1
+                    row = None
+                if row is not None:
+                    self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                self._failed("read", e)
+                row = None
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            value, created_at = row
+            self._remember(key, created_at, value)
+            self.counters["hits"] += 1
+            self.counters["disk_hits"] += 1
+            return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        serialized = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, now, serialized)
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, serialized, now, now),
+                )
+                self._entries += 1
+                self.counters["writes"] += 1
+                if self._entries > self.max_entries:
+                    self._evict(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._failed("write", e)
+
+    def bypass(self):
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def _failed(self, operation, error):
+        """Logs a disk-layer error and drops the failed transaction."""
+        self.counters["errors"] += 1
+        logger.warning("LLM cache %s failed: %s", operation, error)
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, now):
+        """Drops expired entries, then the least recently used ones down to CACHE_TRIM_TO of max_entries."""
+        expired = self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = count - int(self.max_entries * CACHE_TRIM_TO) if count > self.max_entries else 0
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+        self._entries = count - overflow
+        self.counters["evictions"] += max(expired, 0) + overflow
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._entries = 0
+
+    def stats(self):
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "enabled": CACHE_ENABLED,
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Returns the process-wide cache, opening the SQLite file on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+def cache_lookup(key, use_cache=True):
+    """Returns a cached response or None. Bypassed lookups are only counted."""
+    if not CACHE_ENABLED:
+        return None
+    if not use_cache:
+        get_cache().bypass()
+        return None
+    return get_cache().get(key)
+
+def cache_store(key, value):
+    if CACHE_ENABLED and value is not None:
+        get_cache().set(key, value)
@@ -0,0 +1,93 @@
+import os
+import re
+
+# Page separator emitted by extract_text_from_pdf and preserved by clean_text
+PAGE_BREAK = "\f"
+
+# Rough chars-per-token ratio for Llama/GPT tokenizers on English prose
+CHARS_PER_TOKEN = 4
+
+DEFAULT_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 6000))
+
+HEADING_PATTERN = re.compile(
+    r"^(#{1,6}\s+\S"                                         # markdown headings
+    r"|(?i:chapter|section|unit|part|lecture|module)\s+\w+"  # "Chapter 3: ..."
+    r"|\d+(\.\d+)*\.?\s+[A-Z])"                               # "2.1 Cell Structure"
+)
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def is_heading(line):
+    line = line.strip().strip(PAGE_BREAK)
+    if not line or len(line) > 90 or line.endswith((".", ",", ";")):
+        return False
+    if line.isupper() and len(line) > 3:
+        return True
+    return bool(HEADING_PATTERN.match(line))
+
+
+def _split_sections(text):
+    """
+    Splits text into sections that start at every heading and page break.
+    Each boundary depends only on the lines around it, never on the length
+    of what came before.
+    """
+    sections, current, has_content = [], [], False
+    for line in text.split("\n"):
+        pages = line.split(PAGE_BREAK)
+        for i, part in enumerate(pages):
+            if (i > 0 or is_heading(part)) and has_content:
+                sections.append("\n".join(current))
+                current, has_content = [], False
+            if part or len(pages) == 1:
+                current.append(part)
+            has_content = has_content or bool(part.strip())
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+def _split_oversized(section, budget_chars):
+    """Breaks a section that exceeds the budget at page, then line, then hard boundaries."""
+    pieces = []
+    for page in section.split(PAGE_BREAK):
+        if len(page) <= budget_chars:
+            pieces.append(page)
+            continue
+        current = ""
+        for line in page.split("\n"):
+            while len(line) > budget_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(line[:budget_chars])
+                line = line[budget_chars:]
+            if current and len(current) + len(line) + 1 > budget_chars:
+                pieces.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            pieces.append(current)
+    return [p for p in pieces if p.strip()]
+
+
+def chunk_text(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """
+    Splits notes into chunks of at most `max_tokens` (estimated) tokens.
+
+    Text longer than one chunk gets a chunk per section (every heading and
+    page break starts one), and only a section above the budget is split
+    further, at line boundaries. Sections are never packed together, so an
+    edit inside one chapter leaves every other chunk byte-identical (and
+    therefore cached).
+    """
+    budget_chars = max(max_tokens, 1) * CHARS_PER_TOKEN
+    if len(text) <= budget_chars:
+        return [text.replace(PAGE_BREAK, "")] if text.strip() else []
+
+    chunks = []
+    for section in _split_sections(text):
+        chunks.extend([section] if len(section) <= budget_chars else _split_oversized(section, budget_chars))
+    return [c.replace(PAGE_BREAK, "").strip() for c in chunks if c.strip(PAGE_BREAK).strip()]
@@ -0,0 +1,357 @@
+import os
+import re
+import json
+import time
+import threading
+import unicodedata
+from array import array
+
+# Concept graph tuning (override via environment)
+# Seconds before a worker reads dependencies saved by other workers
+GRAPH_REFRESH = float(os.getenv("GRAPH_REFRESH", 30))
+# Ids below the highest one read are looked for again for this long: with
+# concurrent writers (PostgreSQL) a row with a lower id can commit after a
+# higher one was read. Ids that are never used (rolled back or conflicting
+# inserts) are forgotten afterwards.
+GRAPH_GAP_SECONDS = 600
+# Only ids this close below the highest one read are tracked as gaps, so a
+# jump in the sequence (PostgreSQL caches and skips ids) stays cheap
+GRAPH_GAP_WINDOW = 10000
+
+_NON_WORD = re.compile(r"[^\w]+")
+_ARTICLE = re.compile(r"^(the|a|an) ")
+
+def concept_key(name):
+    """Normalized concept name: 'The  Krebs-Cycle' and 'krebs cycle' share a node."""
+    if not isinstance(name, str):
+        return ""
+    key = _NON_WORD.sub(" ", unicodedata.normalize("NFKC", name).casefold()).strip()
+    return _ARTICLE.sub("", key)
+
+class ConceptGraph:
+    """
+    Concept dependencies merged from every session. Nodes are dense integers
+    with one array of successors and one of predecessors each. A topological
+    order is kept up to date on every insert (Pearce-Kelly: only the nodes
+    between the two endpoints in the order are visited and reordered), which
+    also detects an edge that would close a cycle; such edges are kept aside
+    instead of being added. Prerequisite closures and the layout are cached
+    until an edge invalidates them.
+    """
+
+    def __init__(self):
+        self.titles = []
+        self.index = {}
+        self.successors = []
+        self.predecessors = []
+        self.order = array("i")  # position -> node
+        self.position = array("i")  # node -> position
+        self.rejected = []  # (before, after, cycle of nodes) per refused edge
+        self.edges = 0
+        self._closures = {}
+        self._depth = None
+        self._layout = None
+
+    def add_node(self, key, title):
+        node = self.index.get(key)
+        if node is None:
+            node = self.index[key] = len(self.titles)
+            self.titles.append(title)
+            self.successors.append(array("i"))
+            self.predecessors.append(array("i"))
+            self.position.append(len(self.order))
+            self.order.append(node)
+            self._depth = self._layout = None
+        return node
+
+    def add_edge(self, before, after):
+        """Adds before -> after; returns the cycle it would close (a node list) instead when there is one."""
+        if before == after:
+            self.rejected.append((before, after, [before, before]))
+            return self.rejected[-1][2]
+        low, high = self.position[after], self.position[before]
+        if low < high:
+            # Nodes ordered after `after` but before `before` are the only ones that may move
+            forward, parent = [after], {after: None}
+            stack = [after]
+            while stack:
+                node = stack.pop()
+                for succ in self.successors[node]:
+                    if succ == before:
+                        cycle = [before]
+                        while node is not None:
+                            cycle.append(node)
+                            node = parent[node]
+                        cycle = [before] + cycle[:0:-1] + [before]
+                        self.rejected.append((before, after, cycle))
+                        return cycle
+                    if self.position[succ] < high and succ not in parent:
+                        parent[succ] = node
+                        forward.append(succ)
+                        stack.append(succ)
+            backward, seen = [before], {before}
+            stack = [before]
+            while stack:
+                node = stack.pop()
+                for pred in self.predecessors[node]:
+                    if self.position[pred] > low and pred not in seen:
+                        seen.add(pred)
+                        backward.append(pred)
+                        stack.append(pred)
+            moved = sorted(backward, key=self.position.__getitem__) + sorted(forward, key=self.position.__getitem__)
+            slots = sorted(self.position[node] for node in moved)
+            for node, slot in zip(moved, slots):
+                self.position[node] = slot
+                self.order[slot] = node
+        self.successors[before].append(after)
+        self.predecessors[after].append(before)
+        self.edges += 1
+        self._invalidate(after)
+        return None
+
+    def _invalidate(self, node):
+        # A new edge into `node` changes the closures of node and its descendants
+        self._depth = self._layout = None
+        if not self._closures:
+            return
+        stack, seen = [node], {node}
+        while stack:
+            current = stack.pop()
+            self._closures.pop(current, None)
+            for succ in self.successors[current]:
+                if succ not in seen:
+                    seen.add(succ)
+                    stack.append(succ)
+
+    def prerequisites(self, node):
+        """Every concept that must come before `node`, in learning (topological) order."""
+        closure = self._closures.get(node)
+        if closure is None:
+            seen, stack = set(), [node]
+            while stack:
+                for pred in self.predecessors[stack.pop()]:
+                    if pred not in seen:
+                        seen.add(pred)
+                        stack.append(pred)
+            closure = self._closures[node] = array("i", sorted(seen, key=self.position.__getitem__))
+        return closure
+
+    def layers(self):
+        """Layer of every node: the length of the longest prerequisite chain leading to it."""
+        if self._depth is None:
+            depth = [0] * len(self.titles)
+            for node in self.order:
+                next_depth = depth[node] + 1
+                for succ in self.successors[node]:
+                    if depth[succ] < next_depth:
+                        depth[succ] = next_depth
+            self._depth = depth
+        return self._depth
+
+    def layout(self, nodes=None):
+        """
+        Layered layout as parallel arrays (titles, layer, row within the layer)
+        plus edges as flat index pairs into them. Without `nodes` the whole
+        graph is laid out and the encoded JSON is cached until the next edge.
+        """
+        if nodes is None and self._layout is not None:
+            return self._layout
+        depth = self.layers()
+        selected = self.order if nodes is None else sorted(nodes, key=self.position.__getitem__)
+        local = {node: i for i, node in enumerate(selected)}
+        rows, counts = [], {}
+        for node in selected:
+            rows.append(counts.get(depth[node], 0))
+            counts[depth[node]] = rows[-1] + 1
+        edges = []
+        for node in selected:
+            for succ in self.successors[node]:
+                if succ in local:
+                    edges += (local[node], local[succ])
+        result = {
+            "titles": [self.titles[node] for node in selected],
+            "layer": [depth[node] for node in selected],
+            "row": rows,
+            "edges": edges,
+            "layers": max(counts) + 1 if counts else 0,
+        }
+        if nodes is None:
+            self._layout = json.dumps(result, separators=(",", ":")).encode("utf-8")
+            return self._layout
+        return result
+
+# In-memory graph of this worker. Edges are applied in the order they were
+# stored (so every worker accepts and rejects the same ones), apart from rows
+# that commit late, which are applied when they show up; edges saved by this
+# process are read at the next request, others' after GRAPH_REFRESH.
+_graph_lock = threading.RLock()
+_graph = None
+_node_ids = {}
+_last_node_id = 0
+_last_edge_id = 0
+_node_gaps = {}  # id below _last_node_id not read yet -> when it was first missed
+_edge_gaps = {}
+_loaded_at = 0.0
+_changed = False
+
+def _learning_order(nodes, edges):
+    """
+    New nodes in topological order of their strongly connected components
+    (Tarjan), members of a component by id. Edges between components then
+    already point forward when inserted; only edges on cycles move nodes.
+    """
+    successors = {row[0]: [] for row in nodes}
+    for _, before_id, after_id in edges:
+        if before_id in successors and after_id in successors:
+            successors[before_id].append(after_id)
+    index, low, stack, on_stack, components = {}, {}, [], set(), []
+    for root in successors:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, pending = work[-1]
+            for succ in pending:
+                if succ not in index:
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(successors[succ])))
+                    break
+                if succ in on_stack:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while not component or component[-1] != node:
+                        component.append(stack.pop())
+                        on_stack.discard(component[-1])
+                    components.append(sorted(component))
+    # Tarjan finds components in reverse topological order
+    rank = {node_id: i for i, node_id in enumerate(node_id for component in reversed(components) for node_id in component)}
+    return sorted(nodes, key=lambda row: rank[row[0]])
+
+def _reset():
+    global _graph, _node_ids, _last_node_id, _last_edge_id, _node_gaps, _edge_gaps
+    _graph, _node_ids, _last_node_id, _last_edge_id, _node_gaps, _edge_gaps = ConceptGraph(), {}, 0, 0, {}, {}
+
+def _unread(rows, last, gaps):
+    """The rows not read before: above the high-water mark or in its gaps."""
+    return [row for row in rows if row[0] > last or row[0] in gaps]
+
+def _advance(last, gaps, read, now, held=()):
+    """
+    The new high-water mark after reading the ids in `read`. Ids skipped below
+    it (within GRAPH_GAP_WINDOW) and the `held` rows, read but not applied
+    yet, become gaps.
+    """
+    for row_id in read:
+        gaps.pop(row_id, None)
+    top = max(read, default=last)
+    for row_id in range(max(last, top - GRAPH_GAP_WINDOW) + 1, top + 1):
+        if row_id not in read:
+            gaps[row_id] = now
+    for row_id in held:
+        gaps.setdefault(row_id, now)
+    for row_id, missed_at in list(gaps.items()):
+        if now - missed_at > GRAPH_GAP_SECONDS:
+            del gaps[row_id]
+    return max(last, top)
+
+def _catch_up():
+    global _last_node_id, _last_edge_id, _loaded_at, _changed
+    if _graph is not None and not _changed and time.monotonic() - _loaded_at <= GRAPH_REFRESH:
+        return _graph
+    from server.utils.database import load_concept_graph
+    if _graph is None:
+        _reset()
+    # Read from the oldest gap; rows read before are filtered out below
+    nodes, edges, max_edge_id = load_concept_graph(min(_node_gaps, default=_last_node_id + 1) - 1,
+                                                   min(_edge_gaps, default=_last_edge_id + 1) - 1)
+    if max_edge_id < _last_edge_id:
+        # The history was cleared by another worker
+        _reset()
+        nodes, edges, max_edge_id = load_concept_graph(0, 0)
+    nodes = _unread(nodes, _last_node_id, _node_gaps)
+    edges = _unread(edges, _last_edge_id, _edge_gaps)
+    for node_id, key, title in _learning_order(nodes, edges):
+        _node_ids[node_id] = _graph.add_node(key, title)
+    applied = set()
+    for edge_id, before_id, after_id in edges:
+        # An edge whose node has not committed yet stays a gap and is applied at a later read
+        if before_id in _node_ids and after_id in _node_ids:
+            _graph.add_edge(_node_ids[before_id], _node_ids[after_id])
+            applied.add(edge_id)
+    now = time.monotonic()
+    _last_node_id = _advance(_last_node_id, _node_gaps, {row[0] for row in nodes}, now)
+    _last_edge_id = _advance(_last_edge_id, _edge_gaps, applied, now, {row[0] for row in edges} - applied)
+    _loaded_at, _changed = now, False
+    return _graph
+
+def note_graph_changed():
+    """Called after this process stored dependencies; the next read picks them up."""
+    global _changed
+    _changed = True
+
+def reset_concept_graph():
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+def _find(graph, concept):
+    return graph.index.get(concept_key(concept))
+
+def graph_overview():
+    with _graph_lock:
+        graph = _catch_up()
+        return {"concepts": len(graph.titles), "dependencies": graph.edges, "rejected": len(graph.rejected),
+                "layers": max(graph.layers(), default=-1) + 1}
+
+def graph_layout(concept=None):
+    """
+    Encoded JSON layout of the whole graph, or a dict with the layout of one
+    concept and its prerequisites (None if the concept is unknown).
+    """
+    with _graph_lock:
+        graph = _catch_up()
+        if concept is None:
+            return graph.layout()
+        node = _find(graph, concept)
+        if node is None:
+            return None
+        return graph.layout(list(graph.prerequisites(node)) + [node])
+
+def learning_path(concept):
+    """A concept's prerequisites in an order they can be learned in, ending with it (None if unknown)."""
+    with _graph_lock:
+        graph = _catch_up()
+        node = _find(graph, concept)
+        if node is None:
+            return None
+        steps = list(graph.prerequisites(node)) + [node]
+        return {
+            "concept": graph.titles[node],
+            "prerequisites": len(steps) - 1,
+            "path": [graph.titles[step] for step in steps],
+            "directPrerequisites": [graph.titles[pred] for pred in graph.predecessors[node]],
+            "unlocks": [graph.titles[succ] for succ in graph.successors[node]],
+        }
+
+def graph_cycles(limit=50):
+    """Dependencies that were not added because they contradict earlier ones, with the cycle they would close."""
+    with _graph_lock:
+        graph = _catch_up()
+        return {
+            "total": len(graph.rejected),
+            "cycles": [
+                {"before": graph.titles[before], "after": graph.titles[after],
+                 "cycle": [graph.titles[node] for node in cycle]}
+                for before, after, cycle in graph.rejected[:limit]
+            ],
+        }
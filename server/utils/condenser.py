@@ -0,0 +1,213 @@
+import os
+import re
+import math
+import logging
+import numpy as np
+from server.utils.chunker import PAGE_BREAK, estimate_tokens, is_heading, DEFAULT_CHUNK_TOKENS
+from server.utils.metrics import Counter, timed
+
+logger = logging.getLogger(__name__)
+
+# scipy.sparse is imported by the functions that use it, as it is slow to load
+
+# Note pre-compression tuning (override via environment)
+# Default for whether notes are condensed before they are sent to the LLM;
+# requests can override it with "compress" to A/B the output. Off by default:
+# condensing is lossy and trims the whole document to one budget, so long
+# notes are no longer split into chunks (nor served from the per-chunk cache)
+PROMPT_COMPRESSION = os.getenv("PROMPT_COMPRESSION", "off").lower() not in ("0", "off", "false", "no")
+# Estimated tokens of notes sent per request; the lowest-ranked sentences are dropped beyond it
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", DEFAULT_CHUNK_TOKENS))
+# Cosine similarity (TF-IDF) above which a sentence repeats an earlier one
+DUPLICATE_SENTENCE_SIMILARITY = 0.9
+# A short line on at least this share of pages is a running header or footer
+BOILERPLATE_PAGE_SHARE = 0.5
+BOILERPLATE_MAX_CHARS = 120
+
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
+# Terms in more sentences than this are left out of the sentence graph (they
+# carry almost no IDF weight but would make it dense)
+GRAPH_MAX_TERM_SENTENCES = 200
+
+NOTE_TOKENS = Counter(
+    "study_mate_note_tokens_total", "Estimated tokens of notes before and after pre-compression.", ["stage"]
+)
+
+_WORD = re.compile(r"(?u)\b\w\w+\b")
+_DIGITS = re.compile(r"\d+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+def _line_key(line, mask_numbers=False):
+    key = " ".join(line.lower().split())
+    return _DIGITS.sub("#", key) if mask_numbers else key
+
+def _boilerplate(pages):
+    """Normalized short lines (page numbers masked) found on most pages."""
+    if len(pages) < 3:
+        return set()
+    seen = {}
+    for page in pages:
+        for key in {_line_key(line, True) for line in page if len(line.strip()) <= BOILERPLATE_MAX_CHARS}:
+            seen[key] = seen.get(key, 0) + 1
+    threshold = max(2, math.ceil(BOILERPLATE_PAGE_SHARE * len(pages)))
+    return {key for key, count in seen.items() if count >= threshold and key}
+
+def _units(text):
+    """
+    Splits cleaned notes into ("heading" | "sentence" | "break", text) units
+    with page boilerplate and repeated lines removed. Returns (units, removed line count).
+    """
+    pages = [[line.strip() for line in page.split("\n") if line.strip()] for page in text.split(PAGE_BREAK)]
+    boilerplate = _boilerplate(pages)
+
+    units, seen_lines, removed = [], set(), 0
+    for number, page in enumerate(pages):
+        if number:
+            units.append(("break", PAGE_BREAK))
+        paragraph = []
+
+        def flush():
+            if paragraph:
+                units.extend(("sentence", sentence) for sentence in _SENTENCE_END.split(" ".join(paragraph)) if sentence)
+                paragraph.clear()
+
+        for line in page:
+            key = _line_key(line)
+            if _line_key(line, True) in boilerplate or (key in seen_lines and len(key.split()) >= 3):
+                removed += 1
+                continue
+            seen_lines.add(key)
+            if is_heading(line):
+                flush()
+                units.append(("heading", line))
+            else:
+                paragraph.append(line)
+        flush()
+    return units, removed
+
+def _tfidf(sentences):
+    """L2-normalized TF-IDF rows (CSR), one per sentence, with very common terms left out."""
+    from scipy import sparse
+    vocabulary, rows, cols = {}, [], []
+    for row, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+    counts = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(sentences), len(vocabulary)))
+    counts.sum_duplicates()
+    df = np.bincount(counts.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1
+    idf[df > GRAPH_MAX_TERM_SENTENCES] = 0
+    weighted = counts.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ weighted
+
+def _textrank(similarity):
+    """PageRank over the sentence similarity graph (power iteration on a row-normalized sparse matrix)."""
+    from scipy import sparse
+    n = similarity.shape[0]
+    degree = np.asarray(similarity.sum(axis=1)).ravel()
+    dangling = degree == 0
+    degree[dangling] = 1
+    transition = (sparse.diags(1 / degree) @ similarity).T.tocsr()
+    scores = np.full(n, 1 / n)
+    for _ in range(TEXTRANK_ITERATIONS):
+        updated = (1 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * (transition @ scores + scores[dangling].sum() / n)
+        if np.abs(updated - scores).sum() < 1e-6:
+            return updated
+        scores = updated
+    return scores
+
+def condense_text(text, budget_tokens=PROMPT_TOKEN_BUDGET):
+    """
+    Local, extractive pre-compression of cleaned notes: drops running
+    headers/footers and repeated lines, then sentences that nearly repeat an
+    earlier one, and, above `budget_tokens`, the sentences TextRank scores
+    lowest. Headings and page breaks are always kept, and the rest stays in
+    document order. Returns (condensed text, stats).
+    """
+    original_tokens = estimate_tokens(text or "")
+    units, removed_lines = _units(text or "")
+    positions = [i for i, (kind, _) in enumerate(units) if kind == "sentence"]
+    keep = np.ones(len(units), dtype=bool)
+    duplicates = dropped = 0
+
+    if len(positions) > 1:
+        from scipy import sparse
+        vectors = _tfidf([units[i][1] for i in positions])
+        similarity = sparse.triu(vectors @ vectors.T, k=1).tocsr()
+        # A sentence nearly identical to an earlier one is dropped
+        _, later = (similarity >= DUPLICATE_SENTENCE_SIMILARITY).nonzero()
+        repeated = np.zeros(len(positions), dtype=bool)
+        repeated[later] = True
+        duplicates = int(repeated.sum())
+        keep[np.asarray(positions)[repeated]] = False
+
+        costs = np.array([estimate_tokens(unit[1]) + 1 for unit in units])
+        if costs[keep].sum() > budget_tokens:
+            graph = similarity + similarity.T
+            scores = _textrank(graph)
+            scores[repeated] = -1
+            fixed = costs[[i for i, (kind, _) in enumerate(units) if kind != "sentence"]].sum()
+            budget = budget_tokens - fixed
+            chosen = np.zeros(len(positions), dtype=bool)
+            for index in np.argsort(-scores, kind="stable"):
+                if repeated[index]:
+                    break
+                cost = costs[positions[index]]
+                if cost <= budget:
+                    chosen[index] = True
+                    budget -= cost
+            dropped = int((~chosen & ~repeated).sum())
+            keep[np.asarray(positions)[~chosen]] = False
+
+    lines, paragraph = [], []
+    for (kind, value), kept in zip(units, keep):
+        if kind == "sentence":
+            if kept:
+                paragraph.append(value)
+            continue
+        if paragraph:
+            lines.append(" ".join(paragraph))
+            paragraph = []
+        if kind == "heading" or (lines and lines[-1] != PAGE_BREAK):
+            lines.append(value)
+    if paragraph:
+        lines.append(" ".join(paragraph))
+    condensed = "\n".join(lines).strip(PAGE_BREAK + "\n")
+    stats = {
+        "originalTokens": original_tokens,
+        "tokens": estimate_tokens(condensed),
+        "removedLines": removed_lines,
+        "duplicateSentences": duplicates,
+        "droppedSentences": dropped,
+    }
+    return condensed, stats
+
+def prompt_settings(enabled=None, budget_tokens=None):
+    """
+    (enabled, budget) with PROMPT_COMPRESSION/PROMPT_TOKEN_BUDGET filled in
+    for None; the budget is None when notes are sent unchanged.
+    """
+    enabled = PROMPT_COMPRESSION if enabled is None else bool(enabled)
+    return enabled, (budget_tokens or PROMPT_TOKEN_BUDGET) if enabled else None
+
+def condense_notes(text, enabled=None, budget_tokens=None):
+    """
+    Notes as they should be sent to the LLM and the token report for the
+    response. enabled/budget_tokens override PROMPT_COMPRESSION/PROMPT_TOKEN_BUDGET.
+    """
+    enabled, budget_tokens = prompt_settings(enabled, budget_tokens)
+    if not enabled or not text:
+        tokens = estimate_tokens(text or "")
+        NOTE_TOKENS.inc(tokens, stage="original")
+        NOTE_TOKENS.inc(tokens, stage="sent")
+        return text, {"compressed": False, "originalTokens": tokens, "tokens": tokens}
+    with timed("condense"):
+        condensed, stats = condense_text(text, budget_tokens)
+    NOTE_TOKENS.inc(stats["originalTokens"], stage="original")
+    NOTE_TOKENS.inc(stats["tokens"], stage="sent")
+    logger.info("Condensed notes", extra=stats)
+    return condensed, {"compressed": True, **stats}
@@ -0,0 +1,30 @@
+import os
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded pool for blocking work (file parsing, SQLAlchemy, SQLite cache) so
+# the event loop stays free to serve other requests.
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+
+_executor = None
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="study-mate-blocking")
+    return _executor
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a sync function in the shared thread pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (request timings) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
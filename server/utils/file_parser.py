@@ -1,32 +1,205 @@
-import fitz  # PyMuPDF
-from docx import Document
 import io
+import os
+import tempfile
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from server.utils.chunker import PAGE_BREAK
+from server.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# PyMuPDF (fitz) and python-docx are imported where a file is parsed, so
+# workers that never parse uploads do not load them
+
+# Upload limits and extraction tuning (override via environment)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+MAX_PAGES = int(os.getenv("MAX_PAGES", 2000))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))
+PAGES_PER_TASK = int(os.getenv("PAGES_PER_TASK", 16))
+SPOOL_CHUNK_BYTES = 1024 * 1024
+DOCX_PARAGRAPHS_PER_BLOCK = 50
+
+class FileLimitError(ValueError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES or MAX_PAGES."""
+
+_parse_pool = None
+
+def get_parse_pool():
+    # PyMuPDF holds the GIL for most of its work, so pages are extracted in
+    # separate processes. "spawn" keeps workers independent of server threads.
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _parse_pool
+
+def shutdown_parse_pool(wait=False):
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=wait, cancel_futures=True)
+        _parse_pool = None
+
+async def spool_upload(upload, max_bytes=MAX_UPLOAD_BYTES, suffix="", directory=None):
+    """
+    Copies an UploadFile to a temp file (in `directory` if given) in fixed-size
+    chunks so large uploads never sit in memory. Returns the path; the caller
+    must delete it.
+    """
+    spooled = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory)
+    written = 0
+    try:
+        with spooled:
+            while True:
+                chunk = await upload.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise FileLimitError(f"File exceeds the upload limit ({max_bytes:,} bytes).")
+                spooled.write(chunk)
+    except BaseException:
+        os.unlink(spooled.name)
+        raise
+    return spooled.name
+
+def _extract_pdf_range(path, start, stop):
+    """Worker: returns the text of pages [start, stop) of the PDF at `path`."""
+    import fitz
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+def iter_pdf_pages(path, max_pages=MAX_PAGES, workers=PARSE_WORKERS):
+    """
+    Yields the text of each page of a PDF file, in order. Batches of
+    PAGES_PER_TASK pages are extracted in parallel worker processes with a
+    bounded window of batches in flight.
+    """
+    import fitz
+    with fitz.open(path) as doc:
+        page_count = doc.page_count
+        if page_count > max_pages:
+            raise FileLimitError(f"PDF has {page_count} pages; the limit is {max_pages}.")
+        if workers <= 1 or page_count <= PAGES_PER_TASK * 2:
+            for page in doc:
+                yield page.get_text()
+            return
+
+    pool = get_parse_pool()
+    ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+    pending = []
+    for start, stop in ranges[:workers * 2]:
+        pending.append(pool.submit(_extract_pdf_range, path, start, stop))
+    next_range = len(pending)
+    try:
+        while pending:
+            pages = pending.pop(0).result()
+            if next_range < len(ranges):
+                start, stop = ranges[next_range]
+                pending.append(pool.submit(_extract_pdf_range, path, start, stop))
+                next_range += 1
+            yield from pages
+    except BrokenProcessPool:
+        # A crashed worker poisons the pool; start a fresh one next time
+        shutdown_parse_pool()
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+def iter_docx_blocks(path):
+    """Yields DOCX text in blocks of paragraphs (DOCX has no fixed pages)."""
+    from docx import Document
+    doc = Document(path)
+    block = []
+    for para in doc.paragraphs:
+        block.append(para.text)
+        if len(block) >= DOCX_PARAGRAPHS_PER_BLOCK:
+            yield "\n".join(block) + "\n"
+            block = []
+    if block:
+        yield "\n".join(block) + "\n"
 
 def extract_text_from_pdf(file_bytes):
-    """Extracts text from a PDF file using PyMuPDF."""
-    text = ""
+    """Extracts text from a PDF file using PyMuPDF. Pages are separated by PAGE_BREAK."""
+    import fitz
+    pages = []
     try:
         doc = fitz.open(stream=file_bytes, filetype="pdf")
         for page in doc:
-            text += page.get_text()
+            pages.append(page.get_text() + PAGE_BREAK)
         doc.close()
     except Exception as e:
-        print(f"Error parsing PDF: {e}")
-    return text
+        logger.warning("Error parsing PDF: %s", e)
+    return "".join(pages)
 
 def extract_text_from_docx(file_bytes):
     """Extracts text from a DOCX file using python-docx."""
-    text = ""
+    from docx import Document
+    paragraphs = []
     try:
         doc = Document(io.BytesIO(file_bytes))
         for para in doc.paragraphs:
-            text += para.text + "\n"
+            paragraphs.append(para.text + "\n")
+    except Exception as e:
+        logger.warning("Error parsing DOCX: %s", e)
+    return "".join(paragraphs)
+
+def extract_text_from_path(path, kind, max_pages=MAX_PAGES):
+    """Extracts a spooled PDF or DOCX file; pages are separated by PAGE_BREAK."""
+    try:
+        with timed("parse"):
+            if kind == "pdf":
+                return PAGE_BREAK.join(iter_pdf_pages(path, max_pages)) + PAGE_BREAK
+            return "".join(iter_docx_blocks(path))
+    except FileLimitError:
+        raise
     except Exception as e:
-        print(f"Error parsing DOCX: {e}")
-    return text
+        logger.warning("Error parsing %s: %s", kind.upper(), e)
+        return ""
+
+def iter_pages(path, kind, max_pages=MAX_PAGES):
+    """Yields extracted text page by page (PDF) or block by block (DOCX)."""
+    return iter_pdf_pages(path, max_pages) if kind == "pdf" else iter_docx_blocks(path)
+
+def next_page(pages):
+    """Pulls the next page from an iter_pages() generator (None when done), timed as `parse`."""
+    with timed("parse"):
+        return next(pages, None)
 
 def clean_text(text):
     """Basic text cleaning."""
-    # Remove excessive empty lines
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    # Remove excessive empty lines, but keep page breaks for the chunker
+    lines = []
+    for line in text.split('\n'):
+        for i, part in enumerate(line.split(PAGE_BREAK)):
+            if i > 0 and lines and lines[-1] != PAGE_BREAK:
+                lines.append(PAGE_BREAK)
+            if part.strip():
+                lines.append(part.strip())
+    while lines and lines[-1] == PAGE_BREAK:
+        lines.pop()
     return "\n".join(lines)
+
+def split_page_breaks(text):
+    """
+    Cleaned text without its page-break lines, for display, and the
+    character offset at which each page starts in it.
+    """
+    lines, starts, offset = [], [0], 0
+    for line in text.split("\n"):
+        if line == PAGE_BREAK:
+            starts.append(offset)
+            continue
+        lines.append(line)
+        offset += len(line) + 1
+    return "\n".join(lines), starts
+
+def join_page_breaks(text, starts):
+    """Puts back the page-break lines split_page_breaks took out, given the page start offsets."""
+    bounds = [start for start in starts if 0 < start < len(text)] + [len(text)]
+    pages, previous = [], 0
+    for bound in bounds:
+        pages.append(text[previous:bound])
+        previous = bound
+    return (PAGE_BREAK + "\n").join(pages)
@@ -0,0 +1,110 @@
+import os
+import re
+import zlib
+import hashlib
+import numpy as np
+
+# Near-duplicate detection tuning (override via environment)
+NEAR_DUPLICATES = os.getenv("NEAR_DUPLICATES", "on").lower() not in ("0", "off", "false", "no")
+# Estimated Jaccard similarity of word shingles above which a stored summary is reused
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.9))
+
+SHINGLE_WORDS = 3
+MINHASH_PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs above ~0.8 similarity almost always share a bucket,
+# pairs below ~0.5 almost never do
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHINGLE_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+# Fixed seed: signatures are stored, so the permutations must never change
+_rng = np.random.RandomState(1)
+_perm_a = _rng.randint(1, 1 << 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_perm_b = _rng.randint(0, 1 << 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_BLOCK = 4096
+
+def _shingles(text):
+    """Distinct 32-bit hashes of the overlapping word shingles of a text."""
+    tokens = re.findall(r"\w+", (text or "").lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    # crc32 is stable across processes, unlike hash()
+    hashes = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+    width = min(SHINGLE_WORDS, len(hashes))
+    combined = hashes[:len(hashes) - width + 1].copy()
+    with np.errstate(over="ignore"):
+        for offset in range(1, width):
+            combined = combined * _SHINGLE_MULTIPLIER + hashes[offset:len(hashes) - width + 1 + offset]
+    return np.unique((combined >> np.uint64(32)) ^ (combined & _MAX_HASH))
+
+def minhash_signature(text):
+    """MinHash signature (uint32 array) of a text's word shingles, or None for empty text."""
+    shingles = _shingles(text)
+    if not len(shingles):
+        return None
+    signature = np.full(MINHASH_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(shingles), _BLOCK):
+        block = shingles[start:start + _BLOCK, None]
+        # a, b and the shingle hashes are all below 2**32, so this cannot overflow
+        permuted = ((block * _perm_a + _perm_b) % _MERSENNE_PRIME) & _MAX_HASH
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+def signature_similarity(a, b):
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+def lsh_buckets(signature, options_key):
+    """
+    One bucket id per LSH band. The options key is hashed in, so only
+    submissions summarized with compatible options can collide.
+    """
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].astype("<u4").tobytes()
+        digest = hashlib.blake2b(f"{options_key}:{band}:".encode() + rows, digest_size=8).digest()
+        # Positive signed 64-bit so it fits an INTEGER/BIGINT column
+        buckets.append(int.from_bytes(digest, "big") >> 1)
+    return buckets
+
+def signature_to_bytes(signature):
+    return signature.astype("<u4").tobytes()
+
+def signature_from_bytes(data):
+    return np.frombuffer(data, dtype="<u4")
+
+def find_reusable_summary(text, options, prompt=None, db=None):
+    """
+    Fingerprints the cleaned notes and looks for a stored session with
+    near-identical notes summarized under the same options. prompt is the
+    request's (compress, tokenBudget) pair, None for the defaults. Returns
+    (stored summary or None, fingerprint to save, nearDuplicate report);
+    all None when near-duplicate detection is off.
+    """
+    from server.utils.ai_engine import summary_options_key
+    from server.utils.database import find_near_duplicate, get_session_summary
+    from server.utils.file_parser import clean_text
+    from server.utils.condenser import prompt_settings
+
+    if not NEAR_DUPLICATES:
+        return None, None, None
+    signature = minhash_signature(clean_text(text))
+    if signature is None:
+        return None, None, {"reused": False, "similarity": None, "sessionId": None}
+    _, token_budget = prompt_settings(*(prompt or (None, None)))
+    options_key = summary_options_key(
+        options["length"], options["exam_mode"], options["explain_simply"], options["language"], token_budget
+    )
+    # bypassCache also forces a fresh summary, but the new session is still fingerprinted
+    match = find_near_duplicate(signature, options_key, db=db) if options["use_cache"] else None
+    summary = None
+    if match is not None and match[1] >= NEAR_DUPLICATE_THRESHOLD:
+        summary = get_session_summary(match[0], db=db)
+    report = {
+        "reused": summary is not None,
+        "similarity": round(match[1], 4) if match else None,
+        "sessionId": match[0] if match else None,
+    }
+    return summary, (options_key, signature), report
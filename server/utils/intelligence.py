@@ -1,50 +1,178 @@
-try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-except ImportError:
-    TfidfVectorizer = None
+import os
+import re
+import time
+import threading
+import importlib.util
+from collections import Counter
+import numpy as np
+from server.utils.metrics import timed
 
-def calculate_exam_weights(text):
+# scikit-learn takes about a second to import, so the hashers below are built
+# on first use (or by server.main.preload_modules) rather than at import
+SKLEARN_AVAILABLE = importlib.util.find_spec("sklearn") is not None
+
+# Document-frequency index tuning (override via environment)
+TERM_HASH_FEATURES = int(os.getenv("TERM_HASH_FEATURES", 2 ** 18))
+TERM_INDEX_REFRESH = float(os.getenv("TERM_INDEX_REFRESH", 300))
+EXAM_WEIGHT_TERMS = 50
+HEADER_BOOST = 1.5
+
+# Local search embeddings: hashed character n-grams, so no model or network is needed
+SEARCH_VECTORS = os.getenv("SEARCH_VECTORS", "on").lower() not in ("0", "off", "false", "no")
+EMBEDDING_DIM = int(os.getenv("SEARCH_EMBEDDING_DIM", 256))
+EMBEDDING_MAX_CHARS = 8000
+
+# Words of three or more letters; numbers and stop words are not exam terms
+TOKEN_PATTERN = r"(?u)\b[^\W\d_]{3,}\b"
+# Non-empty lines shorter than 60 characters are treated as headings
+SHORT_LINE = re.compile(r"(?m)^[^\S\n]*(\S(?:[^\n]{0,57}\S)?)[^\S\n]*$")
+
+_hashers_lock = threading.Lock()
+_hashers = None
+
+def _build_hashers():
+    from sklearn.feature_extraction.text import HashingVectorizer, CountVectorizer
+    return {
+        "analyze": CountVectorizer(stop_words="english", token_pattern=TOKEN_PATTERN).build_analyzer(),
+        # Both hashers map a term to the same bucket: one hashes whole documents,
+        # the other a list of already extracted terms.
+        "document": HashingVectorizer(
+            n_features=TERM_HASH_FEATURES, stop_words="english", token_pattern=TOKEN_PATTERN,
+            binary=True, norm=None, alternate_sign=False
+        ),
+        "term": HashingVectorizer(n_features=TERM_HASH_FEATURES, analyzer=lambda term: [term], norm=None, alternate_sign=False),
+        # Character 4-grams match word forms and typos that whole-word indexes miss;
+        # the signed hashing trick acts as a fixed random projection to EMBEDDING_DIM
+        "embed": HashingVectorizer(n_features=EMBEDDING_DIM, analyzer="char_wb", ngram_range=(4, 4), norm="l2"),
+    }
+
+def get_hashers():
+    """The scikit-learn analyzer and hashers, built once per process (None without scikit-learn)."""
+    global _hashers
+    if _hashers is None and SKLEARN_AVAILABLE:
+        with _hashers_lock:
+            if _hashers is None:
+                _hashers = _build_hashers()
+    return _hashers
+
+def _analyze(text):
+    hashers = get_hashers()
+    return hashers["analyze"](text) if hashers else re.findall(TOKEN_PATTERN, text.lower())
+
+def document_term_buckets(text):
+    """Hash buckets of the distinct terms in a document (its document-frequency contribution)."""
+    hashers = get_hashers()
+    if not hashers or not text:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(hashers["document"].transform([text]).indices).astype(np.int64)
+
+def corpus_term_buckets(texts):
+    """Per-bucket document counts for a batch of documents."""
+    hashers = get_hashers()
+    if not hashers:
+        return np.zeros(TERM_HASH_FEATURES, dtype=np.int64)
+    return np.bincount(hashers["document"].transform(texts).indices, minlength=TERM_HASH_FEATURES)
+
+def embed_texts(texts):
+    """L2-normalized float32 embeddings, one row per text (zeros without sklearn)."""
+    hashers = get_hashers()
+    if not hashers:
+        return np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    return hashers["embed"].transform([(text or "")[:EMBEDDING_MAX_CHARS] for text in texts]).toarray().astype(np.float32)
+
+# In-memory copy of the term_df table. Documents saved by this process are
+# added directly; the table is re-read every TERM_INDEX_REFRESH seconds to
+# pick up documents saved by other workers.
+_index_lock = threading.Lock()
+_df = None
+_documents = 0
+_loaded_at = 0.0
+
+def get_term_index():
+    """Returns (df array indexed by bucket, number of indexed documents)."""
+    global _df, _documents, _loaded_at
+    with _index_lock:
+        if _df is None or time.monotonic() - _loaded_at > TERM_INDEX_REFRESH:
+            from server.utils.database import load_term_index
+            buckets, counts, documents = load_term_index()
+            df = np.zeros(TERM_HASH_FEATURES, dtype=np.int64)
+            df[buckets] = counts
+            _df, _documents, _loaded_at = df, documents, time.monotonic()
+        return _df, _documents
+
+def note_indexed_document(buckets):
+    """Applies a just-committed document to the in-memory index."""
+    global _documents
+    with _index_lock:
+        if _df is not None:
+            _df[buckets] += 1
+            _documents += 1
+
+def reset_term_index():
+    global _df
+    with _index_lock:
+        _df = None
+
+def calculate_exam_weights(text, top_n=EXAM_WEIGHT_TERMS):
     """
-    Identifies high-importance terms using TF-IDF simulation or sklearn.
-    Returns a dictionary of terms and their calculated 'weight' (0-1).
+    Identifies high-importance terms with TF-IDF against every stored study
+    session (document frequencies come from the persistent term index).
+    Returns the top terms, highest first, with their 'weight' (0-1).
     """
+    with timed("tfidf"):
+        return _exam_weights(text, top_n)
+
+def _exam_weights(text, top_n):
     if not text or len(text) < 50:
         return {}
 
-    # Heuristic importance: headers, bolded-like lines, and TF-IDF
-    lines = text.split('\n')
-    weights = {}
-    
-    if TfidfVectorizer:
-        try:
-            vectorizer = TfidfVectorizer(stop_words='english', max_features=20)
-            X = vectorizer.fit_transform([text])
-            feature_names = vectorizer.get_feature_names_out()
-            scores = X.toarray()[0]
-            for i, name in enumerate(feature_names):
-                weights[name] = float(scores[i])
-        except Exception as e:
-            print(f"TF-IDF Error: {e}")
-
-    # Boost weights for header-like lines
-    for line in lines:
-        clean_line = line.strip()
-        if len(clean_line) > 0 and len(clean_line) < 60:
-            # Simple heuristic: shorter lines are likely headers
-            words = clean_line.lower().split()
-            for word in words:
-                if len(word) > 3:
-                    weights[word] = weights.get(word, 0.1) + 0.2
-                    
-    # Normalize to 0-1
-    if weights:
-        max_val = max(weights.values())
-        for k in weights:
-            weights[k] = min(weights[k] / max_val, 1.0)
-            
-    return weights
+    counts = Counter(_analyze(text))
+    if not counts:
+        return {}
+    terms = np.array(list(counts))
+    tf = np.fromiter(counts.values(), dtype=np.float64, count=len(terms))
+
+    hashers = get_hashers()
+    if hashers:
+        df, documents = get_term_index()
+        idf = np.log((1 + documents) / (1 + df[hashers["term"].transform(terms).indices])) + 1
+    else:
+        idf = 1.0
+    scores = (1 + np.log(tf)) * idf
+
+    # Boost terms that appear in header-like lines
+    headers = list(set(_analyze("\n".join(SHORT_LINE.findall(text)))))
+    if headers:
+        scores[np.isin(terms, headers)] *= HEADER_BOOST
+
+    top = np.argsort(-scores, kind="stable")[:top_n]
+    top_scores = scores[top] / scores[top[0]]
+    return {str(term): round(float(score), 4) for term, score in zip(terms[top], top_scores)}
 
 def get_importance_badge(score):
     if score > 0.7: return "HOT"
     if score > 0.4: return "WARM"
     return "COLD"
+
+def assign_importance(concept, weights):
+    """Sets a concept's 'importance' badge from the weights of its title terms, unless it has one."""
+    if weights and isinstance(concept, dict) and not concept.get("importance"):
+        score = max((weights.get(term, 0) for term in _analyze(str(concept.get("title", "")))), default=0)
+        concept["importance"] = get_importance_badge(score)
+    return concept
+
+def assign_importance_badges(summary, weights):
+    if weights and isinstance(summary, dict):
+        for concept in summary.get("concepts") or []:
+            assign_importance(concept, weights)
+    return summary
+
+if __name__ == "__main__":
+    # python -m server.utils.intelligence rebuild
+    import sys
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m server.utils.intelligence rebuild")
+    from server.utils.database import init_db, rebuild_term_index
+    init_db()
+    rebuild_term_index()
+    print("Term index rebuilt.")
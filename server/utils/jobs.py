@@ -0,0 +1,323 @@
+import os
+import json
+import asyncio
+import logging
+import datetime
+from sqlalchemy import func
+from server.utils.database import session_scope, BatchJob, BatchItem, save_study_session
+from server.utils.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Batch job tuning (override via environment)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 4))
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", 3))
+BATCH_RETRY_BACKOFF = float(os.getenv("BATCH_RETRY_BACKOFF", 30))  # seconds, doubled per attempt
+# A running item is renewed every third of its lease; if its worker dies, the
+# item is taken over once the lease runs out
+BATCH_LEASE_SECONDS = float(os.getenv("BATCH_LEASE_SECONDS", 60))
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", 2))
+BATCH_UPLOAD_DIR = os.getenv("BATCH_UPLOAD_DIR", "./batch_uploads")
+BATCH_MAX_ITEMS = 200
+
+BATCH_TASKS = ("summary", "mcqs")
+PENDING = ("queued", "running")
+
+def _now():
+    return datetime.datetime.utcnow()
+
+def create_job(items, options, tasks=BATCH_TASKS, difficulty="medium", db=None):
+    """
+    Stores a job and its items; workers pick them up from the database.
+    items: [{"name", "kind": "text" | "pdf" | "docx", "text" or "source_path"}]
+    """
+    with session_scope(db) as db:
+        job = BatchJob(options_json=json.dumps({"summary": options, "tasks": list(tasks), "difficulty": difficulty}))
+        db.add(job)
+        db.flush()
+        now = _now()
+        db.bulk_insert_mappings(BatchItem, [
+            {"job_id": job.id, "name": item.get("name"), "kind": item["kind"], "text": item.get("text"),
+             "source_path": item.get("source_path"), "status": "queued", "attempts": 0,
+             "available_at": now, "updated_at": now}
+            for item in items
+        ])
+        db.commit()
+        return job.id
+
+def claim_next_item(db=None):
+    """
+    Marks the oldest available item as running under a fresh lease and
+    returns it with its job's options, or None. The conditional update makes
+    the claim safe between workers and processes sharing the database.
+    """
+    with session_scope(db) as db:
+        while True:
+            now = _now()
+            row = db.query(BatchItem.id, BatchItem.status, BatchItem.available_at, BatchItem.attempts)\
+                .filter(BatchItem.status.in_(PENDING), BatchItem.available_at <= now)\
+                .order_by(BatchItem.available_at, BatchItem.id).first()
+            if row is None:
+                return None
+            claim = db.query(BatchItem).filter(
+                BatchItem.id == row.id, BatchItem.status == row.status, BatchItem.available_at == row.available_at
+            )
+            if row.status == "running" and row.attempts >= BATCH_MAX_ATTEMPTS:
+                # Its worker died on the last attempt
+                claimed = claim.update({"status": "failed", "error": "Worker stopped responding", "updated_at": now},
+                                       synchronize_session=False)
+                if claimed:
+                    _close_job_if_finished(db, db.get(BatchItem, row.id).job_id, now)
+                db.commit()
+                continue
+            claimed = claim.update({
+                "status": "running",
+                "attempts": BatchItem.attempts + 1,
+                "available_at": now + datetime.timedelta(seconds=BATCH_LEASE_SECONDS),
+                "updated_at": now,
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                continue
+            item, job = db.query(BatchItem, BatchJob).join(BatchJob, BatchItem.job_id == BatchJob.id)\
+                .filter(BatchItem.id == row.id).one()
+            return {
+                "id": item.id, "job_id": item.job_id, "name": item.name, "kind": item.kind, "text": item.text,
+                "source_path": item.source_path, "attempts": item.attempts, "session_id": item.session_id,
+                **json.loads(job.options_json),
+            }
+
+def renew_lease(item_id, db=None):
+    with session_scope(db) as db:
+        db.query(BatchItem).filter(BatchItem.id == item_id, BatchItem.status == "running")\
+            .update({"available_at": _now() + datetime.timedelta(seconds=BATCH_LEASE_SECONDS)}, synchronize_session=False)
+        db.commit()
+
+def record_item_session(item_id, session_id, db=None):
+    """Remembers a saved summary so a retry of the item does not summarize it again."""
+    with session_scope(db) as db:
+        db.query(BatchItem).filter(BatchItem.id == item_id).update({"session_id": session_id}, synchronize_session=False)
+        db.commit()
+
+def finish_item(item_id, mcqs=None, db=None):
+    with session_scope(db) as db:
+        now = _now()
+        item = db.get(BatchItem, item_id)
+        item.status = "done"
+        item.mcqs_json = json.dumps(mcqs) if mcqs is not None else None
+        item.error = None
+        item.updated_at = now
+        _remove_source(item)
+        _close_job_if_finished(db, item.job_id, now)
+        db.commit()
+
+def fail_item(item_id, error, db=None):
+    """Queues the item again with exponential backoff, or fails it after BATCH_MAX_ATTEMPTS."""
+    with session_scope(db) as db:
+        now = _now()
+        item = db.get(BatchItem, item_id)
+        item.error = error
+        item.updated_at = now
+        if item.attempts >= BATCH_MAX_ATTEMPTS:
+            item.status = "failed"
+            _remove_source(item)
+            _close_job_if_finished(db, item.job_id, now)
+        else:
+            item.status = "queued"
+            item.available_at = now + datetime.timedelta(seconds=BATCH_RETRY_BACKOFF * 2 ** (item.attempts - 1))
+        db.commit()
+
+def release_item(item_id, db=None):
+    """Hands an interrupted item back to the queue without counting the attempt."""
+    with session_scope(db) as db:
+        now = _now()
+        db.query(BatchItem).filter(BatchItem.id == item_id, BatchItem.status == "running").update({
+            "status": "queued", "attempts": BatchItem.attempts - 1, "available_at": now, "updated_at": now,
+        }, synchronize_session=False)
+        db.commit()
+
+def cancel_job(job_id, db=None):
+    """Cancels the job's queued items; running items finish. Returns False for unknown jobs."""
+    with session_scope(db) as db:
+        if db.get(BatchJob, job_id) is None:
+            return False
+        now = _now()
+        items = db.query(BatchItem).filter(BatchItem.job_id == job_id, BatchItem.status == "queued").all()
+        for item in items:
+            item.status = "cancelled"
+            item.updated_at = now
+            _remove_source(item)
+        _close_job_if_finished(db, job_id, now)
+        db.commit()
+        return True
+
+def _remove_source(item):
+    if item.source_path and os.path.exists(item.source_path):
+        os.unlink(item.source_path)
+
+def _close_job_if_finished(db, job_id, now):
+    db.flush()
+    pending = db.query(BatchItem.id).filter(BatchItem.job_id == job_id, BatchItem.status.in_(PENDING)).first()
+    if pending is None:
+        db.query(BatchJob).filter(BatchJob.id == job_id, BatchJob.finished_at.is_(None))\
+            .update({"finished_at": now}, synchronize_session=False)
+
+def _job_status(counts):
+    if counts["queued"] or counts["running"]:
+        return "running"
+    if counts["cancelled"]:
+        return "cancelled"
+    if not counts["failed"]:
+        return "completed"
+    return "failed" if not counts["done"] else "completed_with_errors"
+
+def get_job(job_id, include_items=True, db=None):
+    """Returns a job's progress (and its items with their results), or None."""
+    with session_scope(db) as db:
+        job = db.get(BatchJob, job_id)
+        if job is None:
+            return None
+        counts = dict.fromkeys(("queued", "running", "done", "failed", "cancelled"), 0)
+        for status, count in db.query(BatchItem.status, func.count()).filter(BatchItem.job_id == job_id).group_by(BatchItem.status):
+            counts[status] = count
+        result = {
+            "id": job.id,
+            "status": _job_status(counts),
+            "tasks": json.loads(job.options_json)["tasks"],
+            "createdAt": job.created_at.isoformat(),
+            "finishedAt": job.finished_at.isoformat() if job.finished_at else None,
+            "counts": counts,
+        }
+        if include_items:
+            result["items"] = [
+                {
+                    "id": item.id,
+                    "name": item.name,
+                    "status": item.status,
+                    "attempts": item.attempts,
+                    "sessionId": item.session_id,
+                    "mcqs": json.loads(item.mcqs_json) if item.mcqs_json else None,
+                    "error": item.error,
+                } for item in db.query(BatchItem).filter(BatchItem.job_id == job_id).order_by(BatchItem.id)
+            ]
+        return result
+
+class BatchItemError(Exception):
+    """An item failed in a way that may succeed on a later attempt."""
+
+async def _read_item_text(item):
+    from server.utils.file_parser import extract_text_from_path, clean_text
+    if item["kind"] == "text":
+        return item["text"] or ""
+    if not item["source_path"] or not os.path.exists(item["source_path"]):
+        raise BatchItemError("Uploaded file is missing")
+    return await run_blocking(lambda: clean_text(extract_text_from_path(item["source_path"], item["kind"])))
+
+async def _process_item(item):
+    """Runs the requested tasks of one item; raises to have it retried."""
+    from server.utils.ai_engine import summarize_document_async, generate_study_questions_async, session_mcqs_async
+    from server.utils.fingerprint import find_reusable_summary
+    from server.utils.condenser import condense_notes
+
+    text = await _read_item_text(item)
+    if not text.strip():
+        raise BatchItemError("No text could be extracted")
+    options = item["summary"]
+    # With both tasks, the MCQs come out of the summary call and are stored with the session
+    difficulty = item["difficulty"] if "mcqs" in item["tasks"] else None
+
+    # Only what is sent to the model is condensed; the session stores the full notes
+    notes = None
+    mcqs = None
+    session_id = item["session_id"]
+    if "summary" in item["tasks"] and session_id is None:
+        summary, fingerprint, _ = await run_blocking(find_reusable_summary, text, options)
+        if summary is None:
+            notes, _ = await run_blocking(condense_notes, text)
+            summary = await summarize_document_async(notes, **options, difficulty=difficulty)
+        if not summary:
+            raise BatchItemError("AI processing failed")
+        mcqs = summary.get("mcqs") if difficulty else None
+        summary = {key: value for key, value in summary.items() if key != "mcqs"}
+        quiz = (difficulty, mcqs) if mcqs else None
+        topic = summary.get("topic", item["name"] or "Extracted Material")
+        session_id = await run_blocking(save_study_session, topic, text, summary, fingerprint=fingerprint, quiz=quiz)
+        await run_blocking(record_item_session, item["id"], session_id)
+
+    if "mcqs" in item["tasks"] and not mcqs:
+        if session_id is not None:
+            # Reused summary, MCQs missing from the reply or a retry: serve them from the session
+            result = await session_mcqs_async(session_id, difficulty, use_cache=options["use_cache"])
+            mcqs = result[0] if result else None
+        if not mcqs:
+            if notes is None:
+                notes, _ = await run_blocking(condense_notes, text)
+            mcqs = await generate_study_questions_async(notes, item["difficulty"], use_cache=options["use_cache"], fallback=False)
+    return mcqs
+
+async def _keep_lease(item_id):
+    while True:
+        await asyncio.sleep(BATCH_LEASE_SECONDS / 3)
+        try:
+            await run_blocking(renew_lease, item_id)
+        except Exception as e:
+            logger.warning("Could not renew the lease of batch item %s: %s", item_id, e)
+
+async def _run_item(item):
+    lease = asyncio.create_task(_keep_lease(item["id"]))
+    try:
+        mcqs = await _process_item(item)
+    except asyncio.CancelledError:
+        await run_blocking(release_item, item["id"])
+        raise
+    except Exception as e:
+        logger.warning("Batch item %s failed (attempt %d): %s", item["id"], item["attempts"], e)
+        await run_blocking(fail_item, item["id"], str(e) or type(e).__name__)
+    else:
+        await run_blocking(finish_item, item["id"], mcqs)
+    finally:
+        lease.cancel()
+
+# Workers run on the server's event loop; submissions wake idle workers, which
+# otherwise poll the database every BATCH_POLL_INTERVAL seconds (retries that
+# became due, items left behind by a restart or by other processes).
+_workers = []
+_wakeup = None
+
+async def _worker():
+    while True:
+        try:
+            item = await run_blocking(claim_next_item)
+        except Exception as e:
+            logger.error("Could not claim a batch item: %s", e)
+            item = None
+        if item is not None:
+            try:
+                await _run_item(item)
+            except Exception:
+                # Recording the outcome failed; the lease is no longer renewed,
+                # so the item is claimed again once it expires
+                logger.exception("Could not record the outcome of batch item %s", item["id"])
+            continue
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), BATCH_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+def start_batch_workers(count=BATCH_WORKERS):
+    """Starts the worker pool on the running event loop (unfinished items resume)."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(count))
+
+async def stop_batch_workers():
+    """Cancels the workers; items they were running go back to the queue."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+def notify_workers():
+    if _wakeup is not None:
+        _wakeup.set()
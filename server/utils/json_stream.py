@@ -0,0 +1,100 @@
+import json
+
+class JSONArrayItemStream:
+    """
+    Incremental parser for a streamed JSON object.
+
+    Feed it completion tokens as they arrive; every time an element of one of
+    the watched top-level arrays (e.g. "concepts") is closed, it is decoded and
+    returned as a (key, item) pair. Only object/array elements are emitted.
+    Each character is scanned once, so parsing keeps up with the token stream:
+    chunks are kept in a list, and only the text of the key or element still
+    open is carried over between feeds.
+    """
+
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self.received = 0  # characters fed so far
+        self._chunks = []
+        self._span_start = None  # start of the open key or element
+        self._span = []  # its text before the current chunk
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._expect_key = False
+        self._current_key = None
+        self._in_target = False
+        self._element_start = None
+
+    @property
+    def text(self):
+        """Everything fed so far."""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def _slice(self, start, chunk, base, end):
+        """text[start:base + end] while the span starting at `start` is open."""
+        if start >= base:
+            return chunk[start - base:end]
+        return "".join(self._span)[start - self._span_start:] + chunk[:end]
+
+    def feed(self, chunk):
+        base = self.received
+        self.received += len(chunk)
+        self._chunks.append(chunk)
+        completed = []
+        for offset, ch in enumerate(chunk):
+            index = base + offset
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect_key:
+                        self._current_key = json.loads(self._slice(self._string_start, chunk, base, offset + 1))
+                        self._expect_key = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = index
+            elif ch in "{[":
+                if self._in_target and self._depth == 2 and self._element_start is None:
+                    self._element_start = index
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+                elif self._depth == 2 and ch == "[" and self._current_key in self.keys:
+                    self._in_target = True
+            elif ch in "}]":
+                self._depth -= 1
+                if self._in_target and self._depth == 2 and self._element_start is not None:
+                    raw = self._slice(self._element_start, chunk, base, offset + 1)
+                    self._element_start = None
+                    try:
+                        completed.append((self._current_key, json.loads(raw)))
+                    except ValueError:
+                        pass
+                elif self._depth == 1:
+                    self._in_target = False
+            elif ch == "," and self._depth == 1:
+                self._expect_key = True
+
+        if self._element_start is not None:
+            start = self._element_start
+        elif self._in_string and self._depth == 1 and self._expect_key:
+            start = self._string_start
+        else:
+            start = None
+        if start is None:
+            self._span = []
+        elif start >= base:
+            self._span = [chunk[start - base:]]
+        elif start == self._span_start:
+            self._span.append(chunk)
+        self._span_start = start
+        return completed
@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from server.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Provider routing tuning (override via environment)
+# Prompts above this many (estimated) tokens go to a provider's large model
+LLM_LARGE_INPUT_TOKENS = int(os.getenv("LLM_LARGE_INPUT_TOKENS", 4000))
+LLM_HEDGING = os.getenv("LLM_HEDGING", "on").lower() not in ("0", "off", "false", "no")
+# A duplicate request goes to the next provider once the first has been
+# running longer than its p95 latency (LLM_HEDGE_DELAY until enough samples)
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", 5))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 0.2))
+LLM_HEDGE_MIN_SAMPLES = 20
+# Consecutive failures that open a provider's circuit, and seconds it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+
+LATENCY_WINDOW = 200
+OUTCOME_WINDOW = 100
+
+LLM_PROVIDER_REQUESTS = Counter(
+    "study_mate_llm_provider_requests_total", "LLM requests per provider by outcome (ok, error, rejected, cancelled).",
+    ["provider", "outcome"]
+)
+LLM_HEDGES = Counter("study_mate_llm_hedges_total", "Hedged duplicate LLM requests, by the provider they went to.", ["provider"])
+LLM_BREAKER_TRIPS = Counter("study_mate_llm_breaker_trips_total", "Times a provider's circuit breaker opened.", ["provider"])
+
+class Provider:
+    """
+    One OpenAI-compatible backend with its models, recent latencies (per
+    model and call kind) and a circuit breaker. The breaker opens after
+    LLM_BREAKER_FAILURES consecutive failures; after LLM_BREAKER_COOLDOWN
+    one probe request is let through, which closes it again on success.
+    """
+
+    def __init__(self, name, base_url, api_key, model, large_model=None, max_input_tokens=None, timeout=None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.large_model = large_model or model
+        self.max_input_tokens = max_input_tokens
+        self.timeout = timeout
+        self._latencies = {}
+        self._outcomes = deque(maxlen=OUTCOME_WINDOW)
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+
+    def model_for(self, tokens):
+        return self.large_model if tokens > LLM_LARGE_INPUT_TOKENS else self.model
+
+    def fits(self, tokens):
+        return self.max_input_tokens is None or tokens <= self.max_input_tokens
+
+    def available(self):
+        """Whether a request may go out now (a half-open circuit admits one probe)."""
+        if not self._open_until:
+            return True
+        return time.monotonic() >= self._open_until and not self._probing
+
+    def begin(self):
+        # The first request after the cooldown is the probe
+        if self._open_until:
+            self._probing = True
+
+    def p95(self, model, kind):
+        samples = self._latencies.get((model, kind))
+        if not samples or len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def hedge_delay(self, model, kind):
+        p95 = self.p95(model, kind)
+        return max(p95, LLM_HEDGE_MIN_DELAY) if p95 is not None else LLM_HEDGE_DELAY
+
+    def record_success(self, model, kind, seconds):
+        self._latencies.setdefault((model, kind), deque(maxlen=LATENCY_WINDOW)).append(seconds)
+        self._outcomes.append(True)
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        LLM_PROVIDER_REQUESTS.inc(provider=self.name, outcome="ok")
+
+    def record_failure(self, error):
+        self._outcomes.append(False)
+        self._failures += 1
+        LLM_PROVIDER_REQUESTS.inc(provider=self.name, outcome="error")
+        if self._probing or self._failures >= LLM_BREAKER_FAILURES:
+            if not self._open_until or self._probing:
+                LLM_BREAKER_TRIPS.inc(provider=self.name)
+                logger.warning("Circuit of LLM provider %s opened after %d failures: %s", self.name, self._failures, error)
+            self._open_until = time.monotonic() + LLM_BREAKER_COOLDOWN
+            self._probing = False
+
+    def record_rejected(self):
+        # The provider answered (e.g. 400 for a bad request), so it is up
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        LLM_PROVIDER_REQUESTS.inc(provider=self.name, outcome="rejected")
+
+    def record_cancelled(self):
+        # A hedge loser says nothing about the provider's health
+        self._probing = False
+        LLM_PROVIDER_REQUESTS.inc(provider=self.name, outcome="cancelled")
+
+    def state(self):
+        now = time.monotonic()
+        circuit = "closed" if not self._open_until else "open" if now < self._open_until else "half_open"
+        return {
+            "name": self.name,
+            "baseUrl": self.base_url,
+            "models": {"small": self.model, "large": self.large_model},
+            "circuit": circuit,
+            "consecutiveFailures": self._failures,
+            "errorRate": round(self._outcomes.count(False) / len(self._outcomes), 3) if self._outcomes else None,
+            "p95Seconds": {
+                f"{model}:{kind}": round(self.p95(model, kind), 3)
+                for model, kind in self._latencies if self.p95(model, kind) is not None
+            },
+        }
+
+def load_providers():
+    """
+    Providers in priority order: the LLM_PROVIDERS JSON list if set
+    ([{"name", "base_url", "api_key" or "api_key_env", "model", "large_model",
+    "max_input_tokens", "timeout"}]), otherwise one per configured
+    LLM_BASE_URL / GROQ_API_KEY / OPEN_AI_API_KEY, in that order.
+    """
+    configured = os.getenv("LLM_PROVIDERS")
+    if configured:
+        providers = []
+        for entry in json.loads(configured):
+            entry = dict(entry)
+            api_key = entry.pop("api_key", None) or os.getenv(entry.pop("api_key_env", ""), "") or "local"
+            providers.append(Provider(api_key=api_key, **entry))
+        return providers
+
+    providers = []
+    if os.getenv("LLM_BASE_URL"):
+        # Any OpenAI-compatible endpoint (self-hosted models, local stub servers...)
+        providers.append(Provider(
+            "custom", os.getenv("LLM_BASE_URL"), os.getenv("LLM_API_KEY", "local"),
+            os.getenv("LLM_MODEL", "llama-3.1-8b-instant"), os.getenv("LLM_LARGE_MODEL"),
+        ))
+    if os.getenv("GROQ_API_KEY"):
+        providers.append(Provider(
+            "groq", "https://api.groq.com/openai/v1", os.getenv("GROQ_API_KEY"),
+            "llama-3.1-8b-instant", "llama-3.3-70b-versatile",
+        ))
+    if os.getenv("OPEN_AI_API_KEY"):
+        providers.append(Provider(
+            "openai", "https://api.openai.com/v1", os.getenv("OPEN_AI_API_KEY"),
+            "gpt-3.5-turbo", "gpt-4o-mini",
+        ))
+    return providers
+
+PROVIDERS = load_providers()
+
+def routing_key():
+    """
+    Identifies the routing configuration (providers, their models and the
+    size threshold between them) for cache keys: responses cached under one
+    configuration are not served once the models a prompt can reach change.
+    """
+    return json.dumps({
+        "providers": [[p.name, p.model, p.large_model, p.max_input_tokens] for p in PROVIDERS] or "simulated",
+        "large_input_tokens": LLM_LARGE_INPUT_TOKENS,
+    }, sort_keys=True)
+
+def route(tokens):
+    """
+    (provider, model) pairs to try for a prompt of `tokens`, in order: the
+    providers whose context fits it and whose circuit lets requests through.
+    If every circuit is open the fitting providers are tried anyway.
+    """
+    fitting = [provider for provider in PROVIDERS if provider.fits(tokens)] or list(PROVIDERS)
+    candidates = [provider for provider in fitting if provider.available()] or fitting
+    return [(provider, provider.model_for(tokens)) for provider in candidates]
+
+async def hedged(candidates, call, kind, retryable, discard=None):
+    """
+    Runs `call(provider, model)` on the first candidate. If it fails with a
+    `retryable` error the next candidate starts at once; if it is still
+    running after its p95 latency, a duplicate goes to the next candidate
+    (when LLM_HEDGING is on). The first success wins and the other requests
+    are cancelled; `discard` is awaited on the result of a loser that had
+    finished too. Returns (result, provider, model); raises the last error
+    when every candidate failed, or at once on a non-retryable error.
+    """
+    pending = {}
+    remaining = list(candidates)
+    last_error = None
+
+    def launch(hedge=False):
+        provider, model = remaining.pop(0)
+        if hedge:
+            LLM_HEDGES.inc(provider=provider.name)
+        provider.begin()
+        task = asyncio.ensure_future(call(provider, model))
+        pending[task] = (provider, model, time.monotonic())
+        return provider.hedge_delay(model, kind)
+
+    delay = launch()
+    try:
+        while pending:
+            timeout = delay if remaining and LLM_HEDGING else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                delay = launch(hedge=True)
+                continue
+            for task in done:
+                provider, model, started = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    provider.record_success(model, kind, time.monotonic() - started)
+                    return task.result(), provider, model
+                if not isinstance(error, retryable):
+                    provider.record_rejected()
+                    raise error
+                provider.record_failure(error)
+                logger.warning("LLM provider %s failed (%s), %d other(s) left", provider.name, type(error).__name__, len(remaining) + len(pending))
+                last_error = error
+            if remaining and not pending:
+                delay = launch()
+        raise last_error
+    finally:
+        for task, (provider, _, _) in pending.items():
+            task.cancel()
+            provider.record_cancelled()
+        if pending:
+            results = await asyncio.gather(*pending, return_exceptions=True)
+            for result in results:
+                if discard is not None and not isinstance(result, BaseException):
+                    await discard(result)
+
+def providers_state():
+    return [provider.state() for provider in PROVIDERS]
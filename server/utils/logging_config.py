@@ -0,0 +1,50 @@
+import os
+import json
+import logging
+
+# Log output for the `server.*` loggers (override via environment)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+def _extra_fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_extra_fields(record)
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable lines with `extra=` fields appended as key=value pairs."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={json.dumps(v, default=str, ensure_ascii=False)}" for k, v in fields.items())
+        return line
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Sends `server.*` logs to stderr as text or JSON lines (LOG_FORMAT=json)."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter() if fmt == "json" else KeyValueFormatter())
+    logger = logging.getLogger("server")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
@@ -0,0 +1,212 @@
+import os
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Instrumentation switches (override via environment)
+METRICS_ENABLED = os.getenv("METRICS", "on").lower() not in ("0", "off", "false", "no")
+SERVER_TIMING = os.getenv("SERVER_TIMING", "off").lower() in ("1", "on", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_registry = []
+
+# (stage, seconds) pairs recorded while serving the current request. The list
+# is shared with worker threads through the copied context in run_blocking.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _format_number(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+class Counter:
+    """Monotonic counter rendered in the Prometheus text format."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with _lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+class Histogram:
+    """Fixed-bucket histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_number(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+REQUEST_LATENCY = Histogram(
+    "study_mate_http_request_duration_seconds", "HTTP request latency, including streamed bodies.",
+    ["method", "route", "status"]
+)
+STAGE_LATENCY = Histogram(
+    "study_mate_stage_duration_seconds", "Time spent in LLM calls, file parsing, TF-IDF weighting and DB queries.",
+    ["stage"]
+)
+LLM_TOKENS = Counter("study_mate_llm_tokens_total", "Tokens reported by the LLM provider.", ["model", "type"])
+LLM_RETRIES = Counter("study_mate_llm_retries_total", "LLM calls retried after a 429, 5xx or connection error.", ["model", "reason"])
+
+def render_metrics():
+    """Returns every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def record_stage(stage, seconds):
+    STAGE_LATENCY.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+@contextmanager
+def timed(stage):
+    """Times the enclosed block as `stage` for /metrics and Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+def record_llm_usage(model, usage):
+    """Counts prompt/completion tokens from a completion's `usage` block (may be None)."""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, type="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, type="completion")
+
+def instrument_engine(engine):
+    """Records the time of every SQL statement run on `engine` as the `db` stage."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        record_stage("db", time.perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+def server_timing_header(timings, total):
+    """Sums the recorded stages into a Server-Timing header value."""
+    stages = {}
+    for stage, seconds in list(timings):
+        spent, count = stages.get(stage, (0.0, 0))
+        stages[stage] = (spent + seconds, count + 1)
+    entries = [f'{stage};dur={spent * 1000:.1f};desc="{count}x"' for stage, (spent, count) in stages.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency histograms. Streaming responses
+    are timed until their last chunk is sent. With SERVER_TIMING on, the stages
+    recorded before the response headers go out are reported in a header.
+    """
+
+    def __init__(self, app, server_timing=SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+        self._routes = None
+
+    def _route_label(self, scope):
+        if self._routes is None and "app" in scope:
+            self._routes = {}
+            for route in getattr(scope["app"], "routes", []):
+                target = getattr(route, "endpoint", None) or getattr(route, "app", None)
+                self._routes[target] = route.path
+        endpoint = scope.get("endpoint")
+        return (self._routes or {}).get(endpoint, "unmatched") if endpoint is not None else "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = []
+        token = _request_timings.set(timings)
+        status = 500
+        observed = False
+
+        def observe():
+            nonlocal observed
+            observed = True
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=self._route_label(scope), status=status
+            )
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = server_timing_header(timings, time.perf_counter() - started)
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", header.encode())]}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Record before the last chunk goes out so a scrape right after sees it
+                observe()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            if not observed:
+                observe()
@@ -0,0 +1,44 @@
+import os
+import time
+import asyncio
+
+# Requests per minute allowed per LLM provider, 0 = unlimited (override via environment)
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", 0))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", 5))
+
+class RateLimiter:
+    """
+    Async rate limiter for one provider. Each call to acquire() reserves the
+    next free slot, so waiters are served in order and no lock is needed on
+    the event loop. Up to `burst` requests may start back to back after an
+    idle period. pause() holds every caller back, e.g. after a 429.
+    """
+
+    def __init__(self, per_minute=LLM_RATE_LIMIT_RPM, burst=LLM_RATE_LIMIT_BURST):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.burst = max(1, burst)
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        start = max(now, self._paused_until)
+        if self.interval:
+            # An idle limiter accumulates at most `burst` slots
+            slot = max(self._next_slot, start - (self.burst - 1) * self.interval)
+            self._next_slot = slot + self.interval
+            start = max(start, slot)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+_limiters = {}
+
+def get_rate_limiter(provider):
+    """The shared limiter of a provider (keyed by base URL or name)."""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = _limiters[provider] = RateLimiter()
+    return limiter
@@ -0,0 +1,146 @@
+import os
+import json
+import datetime
+import numpy as np
+from sqlalchemy import bindparam, update
+from server.utils.database import session_scope, ReviewCard, ReviewAnswer, StudySession, add_review_cards, question_hash
+
+# SM-2 tuning (override via environment)
+REVIEW_MIN_EASE = float(os.getenv("REVIEW_MIN_EASE", 1.3))
+REVIEW_MAX_INTERVAL_DAYS = float(os.getenv("REVIEW_MAX_INTERVAL_DAYS", 365))
+# Minutes until a missed card comes back
+REVIEW_RELEARN_MINUTES = float(os.getenv("REVIEW_RELEARN_MINUTES", 10))
+
+# Quality (0-5) an answer is graded as when the client does not send one
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+
+def sm2(ease, interval, repetitions, lapses, quality):
+    """
+    One SM-2 step for arrays of card states. Quality >= 3 is a pass: the
+    interval goes 1, 6, then interval * ease days. A fail resets repetitions
+    and brings the card back after REVIEW_RELEARN_MINUTES. Ease moves by the
+    SM-2 formula either way, floored at REVIEW_MIN_EASE.
+    Returns (ease, interval_days, repetitions, lapses).
+    """
+    ease = np.asarray(ease, dtype=np.float64)
+    interval = np.asarray(interval, dtype=np.float64)
+    repetitions = np.asarray(repetitions, dtype=np.int64)
+    lapses = np.asarray(lapses, dtype=np.int64)
+    quality = np.clip(np.asarray(quality, dtype=np.float64), 0, 5)
+
+    passed = quality >= 3
+    miss = 5 - quality
+    new_ease = np.maximum(REVIEW_MIN_EASE, ease + 0.1 - miss * (0.08 + miss * 0.02))
+    grown = np.where(repetitions == 0, 1.0, np.where(repetitions == 1, 6.0, interval * new_ease))
+    new_interval = np.where(passed, np.minimum(grown, REVIEW_MAX_INTERVAL_DAYS), REVIEW_RELEARN_MINUTES / 1440.0)
+    new_repetitions = np.where(passed, repetitions + 1, 0)
+    new_lapses = np.where(passed, lapses, lapses + 1)
+    return new_ease, new_interval, new_repetitions, new_lapses
+
+def _quality(answer):
+    """The answer's 0-5 grade, or None when it cannot be graded (the values come from clients and the LLM)."""
+    try:
+        if answer.get("quality") is not None:
+            return int(min(5, max(0, int(answer["quality"]))))
+        if answer.get("selected") is None or answer.get("correct") is None:
+            return None
+        return QUALITY_CORRECT if int(answer["selected"]) == int(answer["correct"]) else QUALITY_WRONG
+    except (TypeError, ValueError):
+        return None
+
+def _card(row):
+    mcq = json.loads(row.mcq_json)
+    return {
+        "cardId": row.id,
+        "sessionId": row.session_id,
+        "question": mcq.get("question"),
+        "options": mcq.get("options", []),
+        "correct": mcq.get("correct"),
+        "dueAt": row.due_at.isoformat(),
+        "intervalDays": round(row.interval_days, 3),
+        "repetitions": row.repetitions,
+    }
+
+def record_answers(session_id, answers, now=None, db=None):
+    """
+    Grades answers ([{cardId or question/options/correct, selected or
+    quality}]) and reschedules their cards with one batched UPDATE. Answers
+    to questions without a card yet (quizzes saved before cards existed)
+    create it first. Returns the number of cards rescheduled.
+    """
+    now = now or datetime.datetime.utcnow()
+    graded = [(answer, _quality(answer)) for answer in answers or [] if isinstance(answer, dict)]
+    graded = [(answer, quality) for answer, quality in graded if quality is not None]
+    if not graded:
+        return 0
+    with session_scope(db) as db:
+        if session_id is not None and db.get(StudySession, session_id) is None:
+            session_id = None
+        by_hash = {question_hash(answer): answer for answer, _ in graded if "cardId" not in answer and answer.get("question")}
+        if by_hash and session_id is not None:
+            add_review_cards(db, session_id, [
+                {"question": a["question"], "options": a.get("options", []), "correct": a.get("correct")}
+                for a in by_hash.values()
+            ])
+            db.flush()
+        ids = {answer["cardId"] for answer, _ in graded if "cardId" in answer}
+        query = db.query(ReviewCard.id, ReviewCard.session_id, ReviewCard.question_hash, ReviewCard.ease,
+                         ReviewCard.interval_days, ReviewCard.repetitions, ReviewCard.lapses)
+        rows = query.filter(ReviewCard.id.in_(ids)).all() if ids else []
+        if by_hash and session_id is not None:
+            rows += query.filter(ReviewCard.session_id == session_id, ReviewCard.question_hash.in_(list(by_hash))).all()
+        card_ids = {row.id for row in rows}
+        hash_ids = {row.question_hash: row.id for row in rows if row.session_id == session_id}
+
+        # Last answer wins when a quiz repeats a card
+        qualities = {}
+        for answer, quality in graded:
+            card_id = answer.get("cardId") if "cardId" in answer else hash_ids.get(question_hash(answer))
+            if card_id in card_ids:
+                qualities[card_id] = quality
+        rows = [row for row in {row.id: row for row in rows}.values() if row.id in qualities]
+        if not rows:
+            return 0
+
+        ease, interval, repetitions, lapses = sm2(
+            [row.ease for row in rows], [row.interval_days for row in rows],
+            [row.repetitions for row in rows], [row.lapses for row in rows],
+            [qualities[row.id] for row in rows],
+        )
+        table = ReviewCard.__table__
+        db.connection().execute(
+            update(table).where(table.c.id == bindparam("card_id")).values(
+                ease=bindparam("new_ease"), interval_days=bindparam("new_interval"),
+                repetitions=bindparam("new_repetitions"), lapses=bindparam("new_lapses"),
+                due_at=bindparam("new_due_at"), last_reviewed_at=now,
+            ),
+            [
+                {"card_id": row.id, "new_ease": float(e), "new_interval": float(i), "new_repetitions": int(r),
+                 "new_lapses": int(l), "new_due_at": now + datetime.timedelta(days=float(i))}
+                for row, e, i, r, l in zip(rows, ease, interval, repetitions, lapses)
+            ],
+        )
+        db.bulk_insert_mappings(ReviewAnswer, [
+            {"card_id": row.id, "quality": qualities[row.id], "answered_at": now} for row in rows
+        ])
+        db.commit()
+        return len(rows)
+
+def due_cards(limit=20, session_id=None, now=None, db=None):
+    """
+    The next `limit` cards due by `now`, most overdue first, read from the
+    due_at index, and when the next not-yet-due card comes up.
+    """
+    now = now or datetime.datetime.utcnow()
+    with session_scope(db) as db:
+        query = db.query(ReviewCard)
+        if session_id is not None:
+            query = query.filter(ReviewCard.session_id == session_id)
+        cards = query.filter(ReviewCard.due_at <= now).order_by(ReviewCard.due_at, ReviewCard.id).limit(limit).all()
+        upcoming = query.filter(ReviewCard.due_at > now).order_by(ReviewCard.due_at, ReviewCard.id)\
+            .with_entities(ReviewCard.due_at).first()
+        return {
+            "cards": [_card(row) for row in cards],
+            "nextDueAt": upcoming.due_at.isoformat() if upcoming else None,
+        }
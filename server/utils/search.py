@@ -0,0 +1,199 @@
+import os
+import re
+import sys
+import html
+import threading
+import numpy as np
+from sqlalchemy import text, func
+from server.utils import database
+from server.utils.database import session_scope, StudySession, SessionEmbedding, ContentBlob, SEARCH_TABLE, rebuild_search_index
+from server.utils.compression import unpack_text
+from server.utils.intelligence import SEARCH_VECTORS, EMBEDDING_DIM, embed_texts
+
+SEARCH_MODES = ("keyword", "semantic", "hybrid")
+# Candidates taken from each index before the rankings are fused
+SEARCH_CANDIDATES = 100
+# Vector hits below this cosine similarity are dropped
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", 0.15))
+RRF_K = 60
+SNIPPET_TOKENS = 16
+PREVIEW_CHARS = 240
+# bm25 weights of the topic, concepts, definitions and content columns
+COLUMN_WEIGHTS = "10.0, 5.0, 3.0, 1.0"
+
+# Highlight markers used until the snippet is HTML-escaped
+_MARK_START, _MARK_END = "\x02", "\x03"
+_WORD = re.compile(r"\S+")
+
+def _terms(query):
+    return re.findall(r"\w+", query.lower())
+
+def _fts_query(terms):
+    # Every term is quoted so user input cannot inject FTS5 syntax; the last
+    # one is a prefix match so results appear while the user is still typing
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def _term_pattern(terms):
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\w*", re.IGNORECASE)
+
+def _highlight(preview, terms):
+    if not terms:
+        return preview
+    return _term_pattern(terms).sub(lambda m: f"{_MARK_START}{m.group(0)}{_MARK_END}", preview)
+
+def _snippet(notes, terms):
+    """About SNIPPET_TOKENS words of the notes around the first match, or None without a match."""
+    match = _term_pattern(terms).search(notes) if terms else None
+    if match is None:
+        return None
+    start = match.start()
+    head = list(_WORD.finditer(notes, max(0, start - 120), start))[-(SNIPPET_TOKENS // 4):]
+    tail = list(_WORD.finditer(notes, start, start + 40 * SNIPPET_TOKENS))[:SNIPPET_TOKENS - len(head)]
+    first, last = (head or tail)[0].start(), tail[-1].end()
+    snippet = " ".join(word.group(0) for word in head + tail)
+    return _highlight(("…" if _WORD.search(notes, 0, first) else "") + snippet +
+                      ("…" if _WORD.search(notes, last) else ""), terms)
+
+def _snippet_html(snippet):
+    """HTML-escapes a snippet and turns the highlight markers into <mark> tags."""
+    return html.escape(snippet).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+def _keyword_hits(db, terms, limit):
+    """[(session_id, score)] best first."""
+    if not terms:
+        return []
+    if database.search_fts_enabled:
+        rows = db.execute(text(
+            f"SELECT rowid AS id, bm25({SEARCH_TABLE}, {COLUMN_WEIGHTS}) AS rank "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :query ORDER BY rank LIMIT :limit"
+        ), {"query": _fts_query(terms), "limit": limit}).all()
+        # bm25() is lower-is-better
+        return [(row.id, -row.rank) for row in rows]
+
+    # No FTS5: unindexed substring matching on topic and notes, newest first.
+    # The notes are compressed, so they are matched after decompression.
+    hits = []
+    rows = db.query(StudySession.id, StudySession.topic, ContentBlob.data)\
+        .outerjoin(ContentBlob, StudySession.content_hash == ContentBlob.hash)\
+        .order_by(StudySession.created_at.desc(), StudySession.id.desc())\
+        .execution_options(yield_per=500)
+    for row in rows:
+        topic, notes = (row.topic or "").lower(), None
+        for term in terms:
+            if term in topic:
+                continue
+            if notes is None:
+                notes = (unpack_text(row.data) or "").lower()
+            if term not in notes:
+                break
+        else:
+            hits.append((row.id, 0.0))
+            if len(hits) >= limit:
+                break
+    return hits
+
+# In-memory copy of session_embeddings. New sessions are appended on the next
+# query; a shrinking table (history cleared) triggers a full reload.
+_vector_lock = threading.Lock()
+_vector_ids = np.empty(0, dtype=np.int64)
+_vector_matrix = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+
+def _load_vectors(db, after_id=0):
+    rows = db.query(SessionEmbedding.session_id, SessionEmbedding.vector)\
+        .filter(SessionEmbedding.session_id > after_id, SessionEmbedding.dim == EMBEDDING_DIM)\
+        .order_by(SessionEmbedding.session_id).all()
+    ids = np.fromiter((row.session_id for row in rows), dtype=np.int64, count=len(rows))
+    matrix = np.frombuffer(b"".join(row.vector for row in rows), dtype=np.float16)
+    return ids, matrix.reshape(len(rows), EMBEDDING_DIM).astype(np.float32)
+
+def get_vector_index(db):
+    """Returns (session ids, embedding matrix) in sync with session_embeddings."""
+    global _vector_ids, _vector_matrix
+    with _vector_lock:
+        count, max_id = db.query(func.count(SessionEmbedding.session_id), func.max(SessionEmbedding.session_id))\
+            .filter(SessionEmbedding.dim == EMBEDDING_DIM).one()
+        loaded_max = int(_vector_ids[-1]) if len(_vector_ids) else 0
+        if count == len(_vector_ids) and (max_id or 0) == loaded_max:
+            return _vector_ids, _vector_matrix
+        if count > len(_vector_ids) and (max_id or 0) > loaded_max:
+            ids, matrix = _load_vectors(db, loaded_max)
+            if len(_vector_ids) + len(ids) == count:
+                _vector_ids = np.concatenate([_vector_ids, ids])
+                _vector_matrix = np.concatenate([_vector_matrix, matrix])
+                return _vector_ids, _vector_matrix
+        _vector_ids, _vector_matrix = _load_vectors(db)
+        return _vector_ids, _vector_matrix
+
+def _semantic_hits(db, query, limit):
+    """[(session_id, cosine similarity)] best first, brute force over the local embeddings."""
+    ids, matrix = get_vector_index(db)
+    if not len(ids):
+        return []
+    scores = matrix @ embed_texts([query])[0]
+    k = min(limit, len(ids))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= SEARCH_MIN_SIMILARITY]
+
+def search_sessions(query, mode="hybrid", limit=10, offset=0, db=None):
+    """
+    Ranked search over past study sessions. "keyword" uses the full-text
+    index, "semantic" the local embeddings, "hybrid" fuses both rankings
+    (reciprocal rank fusion). Snippets are HTML-escaped with <mark> highlights.
+    """
+    terms = _terms(query)
+    use_vectors = SEARCH_VECTORS and mode in ("semantic", "hybrid")
+    window = max(offset + limit + 1, SEARCH_CANDIDATES if mode == "hybrid" else 0)
+
+    with session_scope(db) as db:
+        keyword = _keyword_hits(db, terms, window) if mode in ("keyword", "hybrid") else []
+        semantic = _semantic_hits(db, query, window) if use_vectors else []
+
+        if mode == "hybrid":
+            fused = {}
+            for hits in (keyword, semantic):
+                for rank, hit in enumerate(hits):
+                    fused[hit[0]] = fused.get(hit[0], 0.0) + 1.0 / (RRF_K + rank + 1)
+            ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        else:
+            ranked = keyword or semantic
+
+        page = ranked[offset:offset + limit]
+        page_ids = [session_id for session_id, _ in page]
+        sessions = {
+            row.id: row for row in db.query(
+                StudySession.id, StudySession.topic, StudySession.created_at, ContentBlob.data
+            ).outerjoin(ContentBlob, StudySession.content_hash == ContentBlob.hash).filter(StudySession.id.in_(page_ids))
+        } if page_ids else {}
+
+    keyword_ids = {hit[0] for hit in keyword}
+    semantic_ids = {hit[0] for hit in semantic}
+    items = []
+    for session_id, score in page:
+        session = sessions.get(session_id)
+        if session is None:
+            continue
+        notes = unpack_text(session.data) or ""
+        snippet = _snippet(notes, terms)
+        if snippet is None:
+            preview = " ".join(notes[:PREVIEW_CHARS + 1].split())
+            snippet = _highlight(preview[:PREVIEW_CHARS] + ("…" if len(preview) > PREVIEW_CHARS else ""), terms)
+        items.append({
+            "id": session.id,
+            "topic": session.topic,
+            "date": session.created_at.isoformat(),
+            "score": round(score, 4),
+            "snippet": _snippet_html(snippet),
+            "matchedBy": [name for name, ids in (("keyword", keyword_ids), ("semantic", semantic_ids)) if session_id in ids],
+        })
+    return {"items": items, "nextOffset": offset + limit if len(ranked) > offset + limit else None}
+
+if __name__ == "__main__":
+    # python -m server.utils.search rebuild
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m server.utils.search rebuild")
+    database.init_db()
+    rebuild_search_index()
+    print("Search index rebuilt.")
@@ -0,0 +1,224 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Frontend build served with port unification (override via environment)
+FRONTEND_DIST = os.getenv("FRONTEND_DIST", "dist")
+# Smaller files and already compressed formats are always sent as they are
+STATIC_COMPRESS_MIN_BYTES = int(os.getenv("STATIC_COMPRESS_MIN_BYTES", 1024))
+BROTLI_QUALITY = 11
+GZIP_LEVEL = 9
+
+# Hashed bundles never change under the same URL; everything else is revalidated with its ETag
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+_COMPRESSIBLE = re.compile(r"^(text/|application/(javascript|json|xml|manifest\+json|wasm)|image/svg\+xml)")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+class StaticAsset:
+    """One file of the build, held in memory with its compressed variants."""
+
+    def __init__(self, data, media_type, immutable):
+        self.data = data
+        self.media_type = media_type
+        self.cache_control = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        self.etag = '"%s"' % hashlib.blake2b(data, digest_size=12).hexdigest()
+        self.compressible = len(data) >= STATIC_COMPRESS_MIN_BYTES and bool(_COMPRESSIBLE.match(media_type))
+        self.variants = {}  # encoding -> bytes, from the build or compressed on first request
+
+    def variant_etag(self, encoding):
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _manifest_files(dist):
+    """Files Vite wrote with a content hash in their name, from .vite/manifest.json."""
+    path = os.path.join(dist, ".vite", "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    files = set()
+    for chunk in manifest.values():
+        files.add(chunk["file"])
+        files.update(chunk.get("css", []))
+        files.update(chunk.get("assets", []))
+    return files
+
+# The loaded build: relative path -> StaticAsset
+_assets_lock = threading.Lock()
+_compress_lock = threading.Lock()
+_assets = None
+
+def load_frontend(dist=None):
+    """
+    Reads the build into memory. Files listed in the Vite manifest (or, without
+    one, everything under assets/) are content-hashed and cached as immutable.
+    .br/.gz files written next to a file by the build are used as its variants.
+    """
+    global _assets
+    dist = dist or FRONTEND_DIST
+    hashed = _manifest_files(dist)
+    assets, variants = {}, {}
+    for root, dirs, files in os.walk(dist):
+        dirs[:] = [name for name in dirs if name != ".vite"]
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, dist).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            encoding = next((encoding for encoding, suffix in _ENCODINGS if relative.endswith(suffix)), None)
+            if encoding:
+                variants[relative] = (encoding, data)
+                continue
+            media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            immutable = relative in hashed if hashed is not None else relative.startswith("assets/")
+            assets[relative] = StaticAsset(data, media_type, immutable)
+    for relative, (encoding, data) in variants.items():
+        asset = assets.get(relative[:-len(dict(_ENCODINGS)[encoding])])
+        if asset is not None and asset.compressible:
+            asset.variants[encoding] = data
+    with _assets_lock:
+        _assets = assets
+    logger.info("Loaded frontend build", extra={"files": len(assets), "bytes": sum(len(a.data) for a in assets.values())})
+    return assets
+
+def frontend_available():
+    return os.path.isdir(FRONTEND_DIST)
+
+def get_asset(path):
+    """The build file at `path` (relative, no leading slash), or None. Only files found at load are served."""
+    assets = _assets
+    if assets is None:
+        with _assets_lock:
+            assets = _assets
+        if assets is None:
+            assets = load_frontend()
+    return assets.get(path)
+
+def _accepted_encodings(header):
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return {name for name, quality in accepted.items() if quality > 0}
+
+def choose_encoding(asset, accept_encoding):
+    """Best encoding the client accepts for this asset (None for the file as it is)."""
+    if not asset.compressible:
+        return None
+    accepted = _accepted_encodings(accept_encoding)
+    for encoding, _ in _ENCODINGS:
+        if encoding in accepted and (encoding in asset.variants or encoding != "br" or brotli is not None):
+            return encoding
+    return None
+
+def asset_variant(asset, encoding):
+    """The body for `encoding`, compressing (once per process) if the build did not provide it."""
+    if encoding is None:
+        return asset.data
+    data = asset.variants.get(encoding)
+    if data is None:
+        with _compress_lock:
+            data = asset.variants.get(encoding)
+            if data is None:
+                data = asset.variants[encoding] = _compress(asset.data, encoding)
+    return data
+
+def _etag_matches(header, asset):
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or bool(tags & {asset.variant_etag(encoding) for encoding in (None, "br", "gzip")})
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single byte range, "unsatisfiable", or None to send the whole file."""
+    match = _RANGE.match((header or "").strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(0, size - length), size - 1
+    start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+def build_response(asset, headers, head=False):
+    """
+    (status, response headers, body) for a GET/HEAD of `asset` given the
+    request headers: 304 for a matching If-None-Match, 206/416 for a byte
+    range of the uncompressed file, else the best encoded variant.
+    """
+    response_headers = {"cache-control": asset.cache_control, "accept-ranges": "bytes"}
+    if asset.compressible:
+        response_headers["vary"] = "Accept-Encoding"
+    byte_range = None
+    if headers.get("range") and (not headers.get("if-range") or headers["if-range"] == asset.etag):
+        byte_range = parse_range(headers["range"], len(asset.data))
+    encoding = None if byte_range else choose_encoding(asset, headers.get("accept-encoding"))
+    response_headers["etag"] = asset.variant_etag(encoding)
+
+    if headers.get("if-none-match") and _etag_matches(headers["if-none-match"], asset):
+        return 304, response_headers, b""
+    if byte_range == "unsatisfiable":
+        response_headers["content-range"] = f"bytes */{len(asset.data)}"
+        return 416, response_headers, b""
+    if byte_range:
+        start, end = byte_range
+        response_headers["content-range"] = f"bytes {start}-{end}/{len(asset.data)}"
+        response_headers["content-length"] = str(end - start + 1)
+        return 206, response_headers, b"" if head else asset.data[start:end + 1]
+    body = asset_variant(asset, encoding)
+    if encoding:
+        response_headers["content-encoding"] = encoding
+    response_headers["content-length"] = str(len(body))
+    return 200, response_headers, b"" if head else body
+
+def precompress(dist=None):
+    """Writes .br (if brotli is installed) and .gz files next to every compressible file of the build."""
+    written = 0
+    for relative, asset in load_frontend(dist).items():
+        if not asset.compressible:
+            continue
+        for encoding, suffix in _ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            data = asset_variant(asset, encoding)
+            if len(data) < len(asset.data):
+                with open(os.path.join(dist or FRONTEND_DIST, relative + suffix), "wb") as f:
+                    f.write(data)
+                written += 1
+    return written
+
+if __name__ == "__main__":
+    # python -m server.utils.static_assets compress [dist]
+    import sys
+    if sys.argv[1:2] != ["compress"]:
+        sys.exit("usage: python -m server.utils.static_assets compress [dist]")
+    count = precompress(sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Wrote {count} compressed files{'' if brotli else ' (gzip only: pip install brotli for .br)'}.")
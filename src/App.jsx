@@ -4,6 +4,8 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || 'https://probable-funicular
 
 function App() {
   const [content, setContent] = useState('')
+  // Page offsets of an uploaded file's text, sent back so the server can chunk by page
+  const [pageStarts, setPageStarts] = useState(null)
   const [summary, setSummary] = useState(null)
   const [activeTab, setActiveTab] = useState('home')
   const [subject, setSubject] = useState('General')
@@ -17,6 +19,7 @@ function App() {
   const [progress, setProgress] = useState(0)
   const [difficulty, setDifficulty] = useState('medium')
   const [history, setHistory] = useState([])
+  const [historyCursor, setHistoryCursor] = useState(null)
   const [stats, setStats] = useState(null)
   const [language, setLanguage] = useState('English')
   const [isRephrasing, setIsRephrasing] = useState(false)
@@ -32,14 +35,44 @@ function App() {
   }
 
   // If `VITE_API_URL` is not set, use relative paths so Vite's dev server proxy forwards requests.
-  const fetchHistory = async () => {
+  const fetchHistory = async (cursor = null) => {
     try {
-      const res = await fetch(`${API_BASE_URL}/history`)
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+      const res = await fetch(`${API_BASE_URL}/history${query}`)
       const data = await res.json()
-      setHistory(data)
+      setHistory(prev => cursor ? [...prev, ...data.items] : data.items)
+      setHistoryCursor(data.nextCursor)
     } catch (e) { console.error(e) }
   }
 
+  const openHistorySession = async (id) => {
+    try {
+      const res = await fetch(`${API_BASE_URL}/history/${id}`)
+      const data = await res.json()
+      // sessionId links quiz results and regenerated questions to this session
+      const stored = data.quizzes?.[difficulty]
+      setSummary({ ...data.summary, id: data.id, sessionId: data.id, mcqs: stored || [] })
+      setMcqAnswers({})
+      setActiveTab('summarize')
+      // Served from the session's stored quiz when one exists for this difficulty
+      if (!stored) loadSessionMcqs(data.id, false).catch(e => console.error(e))
+    } catch (e) { console.error(e) }
+  }
+
+  const loadSessionMcqs = async (sessionId, fresh) => {
+    const res = await fetch(`${API_BASE_URL}/generate-mcqs`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ sessionId, difficulty, bypassCache: fresh })
+    })
+    if (!res.ok) throw new Error(`Could not load questions (${res.status})`)
+    const data = await res.json()
+    if (data.mcqs && data.mcqs.length > 0) {
+      setSummary(prev => (prev?.sessionId === sessionId ? { ...prev, mcqs: data.mcqs } : prev))
+      setMcqAnswers({})
+    }
+  }
+
   useEffect(() => {
     if (activeTab === 'history') fetchHistory()
     if (activeTab === 'stats') fetchStats()
@@ -57,12 +90,14 @@ function App() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           text: content,
+          pageStarts: pageStarts,
           length: summaryLength,
           examMode: examMode,
           explainSimply: explainSimply,
           topic: subject || 'New Study Session',
           difficulty: difficulty,
-          language: language
+          language: language,
+          includeMcqs: true // MCQs come back with the summary in one LLM call
         })
       });
 
@@ -70,23 +105,8 @@ function App() {
       const summaryData = await summRes.json();
       console.log("Summary Data Received:", summaryData);
 
-      // Fetch MCQs separately so it doesn't block the summary if it fails
-      let mcqs = [];
-      try {
-        const mcqRes = await fetch(`${API_BASE_URL}/generate-mcqs`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ text: content, difficulty })
-        });
-        if (mcqRes.ok) {
-          const mcqData = await mcqRes.json();
-          console.log("MCQ Data Received:", mcqData);
-          mcqs = mcqData.mcqs || [];
-        }
-      } catch (me) { console.error("MCQ Error:", me); }
-
       if (summaryData) {
-        setSummary({ ...summaryData, mcqs });
+        setSummary({ ...summaryData, mcqs: summaryData.mcqs || [] });
         setActiveTab('summarize');
         setMcqAnswers({});
         console.log("Summary state updated successfully");
@@ -136,6 +156,7 @@ function App() {
 
       const data = await response.json()
       setContent(data.text)
+      setPageStarts(data.pageStarts || null)
       setLoading(false)
     } catch (error) {
       console.error("Upload Error:", error)
@@ -154,18 +175,30 @@ function App() {
       const score = Object.entries(newAnswers).reduce((acc, [idx, ans]) =>
         acc + (ans === summary.mcqs[idx].correct ? 1 : 0), 0)
 
+      if (!summary.sessionId) {
+        alert("This quiz is not linked to a saved study session, so the result was not saved.")
+        return
+      }
       try {
-        await fetch(`${API_BASE_URL}/save-quiz`, {
+        const res = await fetch(`${API_BASE_URL}/save-quiz`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({
-            session_id: summary.id || 1, // session_id would come from backend
+            session_id: summary.sessionId,
             score: score,
             total: summary.mcqs.length,
-            weak_topics: score < summary.mcqs.length ? [subject || 'General'] : []
+            weak_topics: score < summary.mcqs.length ? [subject || 'General'] : [],
+            // Per-question answers feed the spaced-repetition review queue
+            answers: summary.mcqs.map((m, idx) => ({
+              question: m.question, options: m.options, correct: m.correct, selected: newAnswers[idx]
+            }))
           })
         })
-      } catch (e) { console.error("Failed to save quiz", e) }
+        if (!res.ok) throw new Error(`save-quiz returned ${res.status}`)
+      } catch (e) {
+        console.error("Failed to save quiz", e)
+        alert("Failed to save your quiz result.")
+      }
     }
   }
 
@@ -182,6 +215,7 @@ function App() {
       try {
         await fetch(`${API_BASE_URL}/history`, { method: 'DELETE' });
         setHistory([]);
+        setHistoryCursor(null);
       } catch (e) { console.error("Failed to clear history", e); }
     }
   };
@@ -193,25 +227,30 @@ function App() {
   const handleRegenerateMcqs = async () => {
     setRegeneratingMcqs(true);
     try {
-      // Use original content if available, otherwise try to reconstruct context from summary
+      // Saved sessions regenerate from their stored summary; otherwise use the notes
       const context = content || (summary && summary.concepts ? summary.concepts.map(c => c.content).join("\n") : "");
 
-      if (!context) {
+      if (!summary?.sessionId && !context) {
         alert("No context available to regenerate questions.");
         setRegeneratingMcqs(false);
         return;
       }
 
-      const res = await fetch(`${API_BASE_URL}/generate-mcqs`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text: context, difficulty: 'medium' })
-      });
+      if (summary?.sessionId) {
+        // The user asked for new questions, so skip the stored quiz
+        await loadSessionMcqs(summary.sessionId, true);
+      } else {
+        const res = await fetch(`${API_BASE_URL}/generate-mcqs`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ text: context, difficulty: 'medium' })
+        });
 
-      const data = await res.json();
-      if (data.mcqs && data.mcqs.length > 0) {
-        setSummary(prev => ({ ...prev, mcqs: data.mcqs }));
-        setMcqAnswers({});
+        const data = await res.json();
+        if (data.mcqs && data.mcqs.length > 0) {
+          setSummary(prev => ({ ...prev, mcqs: data.mcqs }));
+          setMcqAnswers({});
+        }
       }
     } catch (e) {
       console.error("Failed to regenerate MCQs", e);
@@ -275,7 +314,7 @@ function App() {
                   placeholder="Paste your notes here or describe what you want to learn..."
                   rows="10"
                   value={content}
-                  onChange={(e) => setContent(e.target.value)}
+                  onChange={(e) => { setContent(e.target.value); setPageStarts(null) }}
                   style={{ background: 'transparent', border: 'none', fontSize: '1.1rem', padding: '0', color: 'white' }}
                 />
                 <div style={{ display: 'flex', justifyContent: 'space-between', marginTop: '25px', color: 'var(--text-secondary)', fontSize: '0.85rem', borderTop: '1px solid var(--border-glass)', paddingTop: '20px' }}>
@@ -384,7 +423,7 @@ function App() {
                       <button
                         className="btn-glow"
                         style={{ padding: '8px 20px', fontSize: '0.85rem', background: 'transparent', border: '1px solid var(--accent-blue)', color: 'var(--accent-blue)', cursor: 'pointer', borderRadius: '8px' }}
-                        onClick={() => { setSummary(h.summary); setActiveTab('summarize'); }}
+                        onClick={() => openHistorySession(h.id)}
                       >
                         Review Notes
                       </button>
@@ -392,6 +431,15 @@ function App() {
                   )) : (
                     <p style={{ color: 'var(--text-secondary)' }}>No study history found. Start your first session!</p>
                   )}
+                  {historyCursor && (
+                    <button
+                      className="btn-glow"
+                      style={{ padding: '8px 20px', fontSize: '0.85rem', background: 'transparent', border: '1px solid var(--accent-blue)', color: 'var(--accent-blue)', cursor: 'pointer', borderRadius: '8px' }}
+                      onClick={() => fetchHistory(historyCursor)}
+                    >
+                      Load More
+                    </button>
+                  )}
                 </div>
               </div>
             ) : activeTab === 'stats' ? (
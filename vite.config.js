@@ -4,6 +4,10 @@ import react from '@vitejs/plugin-react'
 // https://vite.dev/config/
 export default defineConfig({
   plugins: [react()],
+  build: {
+    // dist/.vite/manifest.json lists the content-hashed files the server may cache as immutable
+    manifest: true,
+  },
   server: {
     host: '0.0.0.0',
     port: 5173,